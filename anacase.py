@@ -10,16 +10,17 @@
  using python computer vision (opencv).
 
 
- usage: ./anacase.py
+ usage: ./anacase.py [-config anacase.ini] [-logger anacase.log] [-headless]
 
 """
 
 import argparse as ap
+import logging
+import sys
 
 import config
 import logger
 import manager
-import netifaces
 
 # DEFAULT FILE NAMES
 _configfile_ = 'anacase.ini'
@@ -32,20 +33,24 @@ def get_start_arguments():
     warning: no logger yet!
     """
     # default values
-    defaults = {'config_file': _configfile_, 'log_file': _logfile_}
+    defaults = {'config_file': _configfile_, 'log_file': _logfile_, 'headless': False}
     # get args
     parser = ap.ArgumentParser(description='anacase - bag case sample python software')
     parser.add_argument('-config', metavar='config_file', help='configuration file')
     parser.add_argument('-logger', metavar='log_file', help='logger file')
+    parser.add_argument('-headless', action='store_true', help='run without display')
     args = parser.parse_args()
     if args.config:
         defaults['config_file'] = args.config
     if args.logger:
         defaults['log_file'] = args.logger
+    if args.headless:
+        defaults['headless'] = True
     return defaults
 
 
 def get_mac_address(port):
+    import netifaces  # imported only here, not needed before config is read
     try:
         mac = netifaces.ifaddresses(port)[netifaces.AF_LINK]
         # get last 4 digits of mac addr for 'port' interface
@@ -54,23 +59,53 @@ def get_mac_address(port):
         return '----'
 
 
+def get_lanes(names, settings):
+    """ [(section, typed keys)] for each lane section, default single lane on [CAMERA] """
+    lanes = []
+    for name in (val.strip() for val in names.split(',')):
+        if name:
+            if name not in settings:
+                sys.exit('lane section [{}] not found. Aborting!'.format(name))
+            lanes.append((name, settings[name]))
+    return lanes or None
+
+
 def main():
     """ MAIN APP """
     master_config = get_start_arguments()
-    logger.setup(master_config['log_file'], 'w')
+    logger.setup(master_config['log_file'])
     config.init(master_config['config_file'])
-    config.set_section('GLOBAL')
-    _version = config.key['version']
-    _port = config.key['port']
-    logger.level(config.key['log_level'])
-    app = manager.App(camera_data=config.set_section('CAMERA'),
-                      display_data=config.set_section('DISPLAY'),
-                      led_data=config.set_section('LED'),
-                      buzzer_data=config.set_section('BUZZER'),
-                      random_data=config.set_section('STATS'),
+    try:
+        settings = config.validate()  # all values checked and typed once, before starting anything
+    except ValueError as ex:
+        logging.critical(ex)
+        sys.exit('{}. Aborting!'.format(ex))
+    global_data = settings['GLOBAL']
+    _version = global_data['version']
+    _port = global_data['port']
+    _headless = master_config['headless'] or global_data.get('headless', False)
+    _lanes = global_data.get('lanes', '')
+    _watcher = None
+    if global_data.get('config_reload', False):  # tuning keys applied without restart
+        _watcher = config.Watcher(master_config['config_file'], global_data.get('config_interval', 2.0))
+    logger.setup(master_config['log_file'], **logger.options(global_data))
+    logger.level(global_data['log_level'])
+    app = manager.App(camera_data=settings['CAMERA'],
+                      display_data=settings['DISPLAY'],
+                      led_data=settings['LED'],
+                      buzzer_data=settings['BUZZER'],
+                      random_data=settings['STATS'],
                       version=_version,
-                      port=get_mac_address(_port)
+                      port=get_mac_address(_port),
+                      headless=_headless,
+                      metrics_data=settings.get('METRICS'),
+                      lanes_data=get_lanes(_lanes, settings),
+                      archive_data=settings.get('ARCHIVE'),
+                      report_data=settings.get('REPORT'),
+                      config_watcher=_watcher
                       )
+    if _watcher:
+        _watcher.start()
     while app.run():
         pass
     app.close()
@@ -0,0 +1,126 @@
+"""Snapshot archive: jpeg encode and write bag frames on worker threads, oldest files evicted over quota"""
+
+import collections
+import datetime
+import logging
+import os
+import queue
+import threading
+
+import cv2
+
+log = logging.getLogger(__name__)
+
+
+class Archive:
+    """ Bounded queue of frames, written by a pool of workers, never blocks the caller """
+
+    def __init__(self, folder, quota_mb=500, workers=1, queue_size=16, quality=85):
+        self._folder = folder
+        self._quota = int(quota_mb * 1024 * 1024)
+        self._quality = quality
+        os.makedirs(folder, exist_ok=True)
+        self._files = collections.deque()  # (path, size) oldest first
+        self._used = 0
+        self._lock = threading.Lock()
+        self._scan()
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(queue_size)
+        self._workers = [threading.Thread(target=self._work, name='archive-{}'.format(n), daemon=True)
+                         for n in range(workers)]
+        for worker in self._workers:
+            worker.start()
+        log.info('archive on "{}" using {:.1f} of {} MB'.format(folder, self._used / 1048576, quota_mb))
+
+    def _scan(self):
+        files = []
+        for entry in os.scandir(self._folder):
+            if entry.is_file() and entry.name.endswith('.jpg'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        for _, path, size in sorted(files):
+            self._files.append((path, size))
+            self._used += size
+
+    def submit(self, frame, lane, kind, counter, copied=False):
+        """ queue a copy of frame (frame itself when copied: caller never changes it), False when queue is full """
+        if frame is None:
+            return False
+        name = '{}_{}_{}_{:06d}.jpg'.format(datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f'),
+                                            lane.lower(), kind, counter)
+        try:
+            self._queue.put_nowait((name, frame if copied else frame.copy()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            log.warning('archive queue full, snapshot {} dropped'.format(name))
+            return False
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            name, frame = job
+            try:
+                ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self._quality])
+                if not ok:
+                    raise ValueError('jpeg encode failed')
+                path = os.path.join(self._folder, name)
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(data.tobytes())
+                os.replace(path + '.tmp', path)  # never leave half written snapshots
+                self._add(path, len(data))
+            except (OSError, ValueError, cv2.error) as ex:
+                log.error('error archiving snapshot {} {}'.format(name, ex))
+
+    def _add(self, path, size):
+        with self._lock:
+            self._files.append((path, size))
+            self._used += size
+            self.written += 1
+            while self._used > self._quota and len(self._files) > 1:
+                old, old_size = self._files.popleft()
+                self._used -= old_size
+                try:
+                    os.remove(old)
+                except OSError as ex:
+                    log.warning('error evicting snapshot {} {}'.format(old, ex))
+
+    @property
+    def used(self):
+        """ bytes on archive """
+        return self._used
+
+    def close(self):
+        """ write queued snapshots and stop workers """
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5.0)
+
+
+def from_config(archive_data):
+    """ Archive from typed [ARCHIVE] section, None when disabled """
+    if not archive_data or not archive_data.get('enabled', False):
+        return None
+    return Archive(archive_data.get('folder', 'snapshots'),
+                   archive_data.get('quota_mb', 500),
+                   archive_data.get('workers', 1),
+                   archive_data.get('queue_size', 16),
+                   archive_data.get('jpeg_quality', 85))
+
+
+if __name__ == '__main__':
+    # simple explore test
+    import numpy as np
+    import time
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG)
+    archive = Archive('snapshots', quota_mb=1, workers=2)
+    for n in range(50):
+        archive.submit(np.random.randint(0, 255, (480, 800, 3), np.uint8), 'CAMERA', 'selected', n)
+        time.sleep(0.01)
+    archive.close()
+    print('written {} dropped {} used {}'.format(archive.written, archive.dropped, archive.used))
@@ -0,0 +1,101 @@
+"""Background models for motion detect: static reference, running average or MOG2"""
+
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+import buffers
+import config
+
+_log = logging.getLogger(__name__)
+
+MODELS = config.BACKGROUND_MODELS
+
+
+class Background:
+    """ Reference of the empty scene, updated with a bounded cost per frame """
+
+    def __init__(self, model='static', learning_rate=0.0, median_frames=0, buffer_pool=False):
+        if model not in MODELS:
+            raise ValueError('invalid background model "{}"'.format(model))
+        self.model = model
+        self.learning_rate = learning_rate  # 0: fixed average, opencv automatic rate with mog2
+        self._median_frames = median_frames
+        self._reference = None  # uint8 reference image
+        self._average = None  # float32 accumulator (average model)
+        self._mog2 = None
+        self._samples = None  # frames collected for median recalibration
+        self._median = None  # median computed on background thread
+        self._lock = threading.Lock()
+        self._pool = buffers.BufferPool(buffer_pool)  # delta, thresh and mask outputs reused every frame
+
+    def recalibrate(self):
+        """ start a new reference, median of next frames when configured """
+        self._mog2 = None
+        if self._reference is None or self._median_frames <= 1:
+            self._reference = None
+            self._average = None
+        else:
+            self._samples = []
+            _log.debug('collecting {} frames for median background'.format(self._median_frames))
+
+    def _collect(self, gray_frame):
+        self._samples.append(gray_frame.copy())
+        if len(self._samples) >= self._median_frames:
+            samples, self._samples = self._samples, None
+            threading.Thread(target=self._compute_median, args=(samples,), name='background-median',
+                             daemon=True).start()
+
+    def _compute_median(self, samples):
+        median = np.median(np.stack(samples), axis=0).astype(np.uint8)
+        with self._lock:
+            self._median = median
+        _log.debug('median background ready from {} frames'.format(len(samples)))
+
+    def _update_reference(self, gray_frame):
+        with self._lock:
+            median, self._median = self._median, None
+        if median is not None and median.shape == gray_frame.shape:
+            self._reference = median
+            self._average = None
+        if self._reference is None:
+            self._reference = gray_frame.copy()
+            if self._median_frames > 1:  # refine first frame with a median
+                self._samples = []
+        if self._samples is not None:
+            self._collect(gray_frame)
+
+    def apply(self, gray_frame, threshold_value):
+        """ return (frame_delta, frame_thresh) for gray_frame and learn from it """
+        if self.model == 'mog2':
+            if self._mog2 is None:
+                self._mog2 = cv2.createBackgroundSubtractorMOG2(detectShadows=True)
+            frame_delta = self._mog2.apply(gray_frame, self._pool.get('delta', gray_frame.shape),
+                                           learningRate=self.learning_rate or -1)
+            frame_thresh = cv2.threshold(frame_delta, 254, 255, cv2.THRESH_BINARY,
+                                         dst=self._pool.get('thresh', gray_frame.shape))[1]  # drop shadows (127)
+            return frame_delta, frame_thresh
+        self._update_reference(gray_frame)
+        if self.model == 'average':
+            if self._average is None:
+                self._average = self._reference.astype(np.float32)
+            else:
+                self._reference = cv2.convertScaleAbs(self._average, dst=self._pool.get('reference', gray_frame.shape))
+        frame_delta = cv2.absdiff(self._reference, gray_frame, dst=self._pool.get('delta', gray_frame.shape))
+        frame_thresh = cv2.threshold(frame_delta, threshold_value, 255, cv2.THRESH_BINARY,
+                                     dst=self._pool.get('thresh', gray_frame.shape))[1]
+        if self.model == 'average' and self.learning_rate > 0:
+            # learn only where nothing was detected, objects don't fade into the background
+            cv2.accumulateWeighted(gray_frame, self._average, self.learning_rate,
+                                   cv2.bitwise_not(frame_thresh, dst=self._pool.get('mask', gray_frame.shape)))
+        return frame_delta, frame_thresh
+
+
+def from_config(camera_data):
+    """ background parameters from typed [CAMERA] section """
+    return {'model': camera_data.get('background_model', 'static'),
+            'learning_rate': camera_data.get('background_learning_rate', 0.0),
+            'median_frames': camera_data.get('background_median_frames', 0),
+            'buffer_pool': camera_data.get('buffer_pool', False)}
@@ -0,0 +1,90 @@
+"""Benchmark per-frame image allocations with and without the buffer pool (camera pipeline and compositor)
+
+ usage: python3 benchmarks/frame_buffers.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import camera  # noqa: E402
+import compositor  # noqa: E402
+
+FRAMES = 200
+WIDTH, HEIGHT = 1280, 720
+CAMERA_DATA = {'camera_id': 0, 'camera_width': WIDTH, 'camera_height': HEIGHT, 'camera_fps': 30,
+               'camera_delay': 0, 'camera_resize_width': 800, 'camera_resize_height': 480,
+               'min_detect_area': 3000, 'gaussian_blur_value': 21, 'threshold_value': 60,
+               'process_scale': 0.5, 'background_model': 'average', 'background_learning_rate': 0.002}
+
+
+def belt_video(path):
+    """ synthetic belt: noisy background, a bag crossing every 50 frames """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (WIDTH, HEIGHT))
+    background = np.random.randint(60, 90, (HEIGHT, WIDTH, 3), np.uint8)
+    for n in range(FRAMES + 10):
+        frame = background.copy()
+        y = (n % 50) * 20
+        cv2.rectangle(frame, (500, y - 150), (800, y), (200, 180, 160), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def measure(step, frames):
+    """ (ms per frame, transient peak KB per frame, KB allocated and kept per frame) """
+    for _ in range(10):  # warm up, pool buffers allocated here
+        step()
+    start = time.perf_counter()
+    for _ in range(frames):
+        step()
+    elapsed = (time.perf_counter() - start) / frames
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    peaks = 0
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        step()
+        peaks += tracemalloc.get_traced_memory()[1] - current
+    kept = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return elapsed * 1e3, peaks / frames / 1024, kept / frames / 1024
+
+
+def bench_camera(video, pool):
+    cam = camera.Camera(dict(CAMERA_DATA, buffer_pool=pool), video)
+    try:
+        return measure(lambda: cam.objects, FRAMES // 2 - 10)
+    finally:
+        cam.close()
+
+
+def bench_compositor(pool):
+    comp = compositor.Compositor(800, 480, os.path.join(ROOT, 'background.png'), pool)
+    live = np.random.randint(0, 255, (480, 800, 3), np.uint8)
+    return measure(lambda: comp.compose(live), 500)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        video = os.path.join(folder, 'belt.avi')
+        belt_video(video)
+        print('{:>12} {:>6} {:>12} {:>18} {:>14}'.format('', 'pool', 'frame (ms)', 'allocated (KB)', 'kept (KB)'))
+        for pool in (False, True):
+            print('{:>12} {:>6} {:12.3f} {:18.1f} {:14.2f}'.format('camera', 'yes' if pool else 'no',
+                                                                 *bench_camera(video, pool)))
+        for pool in (False, True):
+            print('{:>12} {:>6} {:12.3f} {:18.1f} {:14.2f}'.format('compositor', 'yes' if pool else 'no',
+                                                                 *bench_compositor(pool)))
+
+
+if __name__ == '__main__':
+    main()
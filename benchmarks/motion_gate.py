@@ -0,0 +1,75 @@
+"""Benchmark the motion gate on a synthetic belt: bag count, frames skipping detection and time per frame
+
+ usage: python3 benchmarks/motion_gate.py [video]   (synthetic belt video when none given)
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import lane  # noqa: E402
+
+FRAMES = 600
+BAG_EVERY = 60  # frames between bags, a bag crosses the image in 24 frames: idle belt in between
+WIDTH, HEIGHT = 800, 480
+CAMERA_DATA = {'camera_id': 0, 'camera_width': WIDTH, 'camera_height': HEIGHT, 'camera_fps': 20,
+               'camera_delay': 0, 'camera_resize_width': WIDTH, 'camera_resize_height': HEIGHT,
+               'min_detect_area': 3000, 'gaussian_blur_value': 21, 'threshold_value': 60,
+               'background_model': 'static'}
+DISPLAY_DATA = {'beam_position': [220, 220, 480, 280], 'beam_dead_zone': 2, 'time_min_delta': 1.0}
+
+
+def belt_video(path):
+    """ noisy belt, a bag entering from the top every BAG_EVERY frames, return number of bags """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 20, (WIDTH, HEIGHT))
+    rng = np.random.default_rng(1)
+    background = rng.integers(60, 90, (HEIGHT, WIDTH, 3), np.uint8)
+    for n in range(FRAMES):
+        frame = background.copy()
+        if n >= BAG_EVERY // 2:
+            y = ((n - BAG_EVERY // 2) % BAG_EVERY) * 24
+            cv2.rectangle(frame, (280, y - 120), (420, y), (200, 180, 160), -1)
+        writer.write(frame)
+    writer.release()
+    return (FRAMES - BAG_EVERY // 2 - 15) // BAG_EVERY + 1  # bags reaching the beam
+
+
+def bench(video, gate):
+    """ (bags counted, % frames gated, ms per frame) """
+    camera_data = dict(CAMERA_DATA, motion_gate=gate)
+    ln = lane.Lane('CAMERA', camera_data, DISPLAY_DATA, {'percentage_sample': 10, 'loop_sample': 9999}, video)
+    frames = gated = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            ln.step()
+            frames += 1
+            gated += ln.cam._gated
+    except EOFError:
+        pass
+    elapsed = time.perf_counter() - start
+    ln.close()
+    return ln.stats.counter, 100.0 * gated / frames, elapsed / frames * 1e3
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        if len(sys.argv) > 1:
+            video, expected = sys.argv[1], '-'
+        else:
+            video = os.path.join(folder, 'belt.avi')
+            expected = belt_video(video)
+        print('{:>6} {:>9} {:>9} {:>11} {:>12}'.format('gate', 'expected', 'counted', 'gated (%)', 'frame (ms)'))
+        for gate in (False, True):
+            print('{:>6} {:>9} {:>9} {:11.1f} {:12.3f}'.format('yes' if gate else 'no', expected,
+                                                               *bench(video, gate)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark Stats random sample: cycle reset and per-frame cost for large loop_sample
+
+ usage: python3 benchmarks/stats_sample.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import stats  # noqa: E402
+
+PERCENTAGE = 10
+FRAMES = 100000
+
+
+def legacy_sample(loop_sample, total):
+    """ list based sample used before SampleSet (rejection + linear search + sort) """
+    case_random = []
+    while len(case_random) < total:
+        luck = random.randrange(loop_sample) + 1
+        if luck not in case_random:
+            case_random.append(luck)
+        case_random.sort()
+    return case_random
+
+
+def bench(loop_sample):
+    """ (sample build on its thread, reset with next sample ready, is_selected) seconds """
+    total = int(loop_sample * PERCENTAGE / 100)
+    build = min(timeit.repeat(lambda: stats.SampleSet(loop_sample, total), number=1, repeat=3))
+    st = stats.Stats({'percentage_sample': PERCENTAGE, 'loop_sample': loop_sample})
+    reset = min(timeit.repeat(st.reset, setup=lambda: st._next_thread.join(), number=1, repeat=3))
+    frame = min(timeit.repeat('st.counter = random.randrange(st.loop_sample); st.is_selected()',
+                              globals={'st': st, 'random': random}, number=FRAMES, repeat=3)) / FRAMES
+    return build, reset, frame
+
+
+def main():
+    print('{:>10} {:>14} {:>14} {:>16} {:>18}'.format('loop', 'build (ms)', 'reset (ms)', 'frame (us)',
+                                                      'legacy reset (ms)'))
+    for loop_sample in (10 ** 4, 10 ** 6, 10 ** 7):
+        build, reset, frame = bench(loop_sample)
+        if loop_sample <= 10 ** 4:
+            total = int(loop_sample * PERCENTAGE / 100)
+            legacy = '{:18.1f}'.format(timeit.timeit(lambda: legacy_sample(loop_sample, total), number=1) * 1e3)
+        else:
+            legacy = '{:>18}'.format('-')
+        print('{:10d} {:14.1f} {:14.1f} {:16.3f} {}'.format(loop_sample, build * 1e3, reset * 1e3, frame * 1e6,
+                                                            legacy))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Preallocated image buffers reused every frame (dst= outputs of the OpenCV calls)"""
+
+import logging
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class BufferPool:
+    """ Named arrays allocated once, reallocated only when shape or type changes
+
+    disabled pool returns None, OpenCV then allocates a new output (dst=None)
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._buffers = {}
+        self._rings = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        """ buffer owned by the caller, overwritten on next get """
+        if not self.enabled:
+            return None
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = self._buffers[name] = np.empty(shape, dtype)
+            log.debug('buffer "{}" allocated {} {}'.format(name, tuple(shape), np.dtype(dtype).name))
+        return buffer
+
+    def next(self, name, shape, count=3, dtype=np.uint8):
+        """ next buffer of a ring, for images published to other threads (valid for count - 1 more frames) """
+        if not self.enabled:
+            return None
+        index, buffers = self._rings.get(name, (0, []))
+        if not buffers or buffers[0].shape != tuple(shape) or buffers[0].dtype != dtype:
+            buffers = [np.empty(shape, dtype) for _ in range(count)]
+            log.debug('buffer ring "{}" allocated {} x {}'.format(name, count, tuple(shape)))
+        index = (index + 1) % len(buffers)
+        self._rings[name] = (index, buffers)
+        return buffers[index]
+
+    @property
+    def nbytes(self):
+        """ memory held by the pool """
+        return sum(buffer.nbytes for buffer in self._buffers.values()) + \
+            sum(buffer.nbytes for _, buffers in self._rings.values() for buffer in buffers)
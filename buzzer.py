@@ -1,5 +1,6 @@
 import logging
-import datetime
+import threading
+import time
 from platform import machine
 from time import sleep
 
@@ -8,55 +9,66 @@ log = logging.getLogger(__name__)
 RASPI = ["armv7l"]
 BUZZER_PIN = 13
 
-if machine() in RASPI:
-    import RPi.GPIO as Io
-
 
 class Buzzer:
+    """ Buzzer on/off, stopped by the scheduler thread or by polling stop_buzzer() """
 
-    def __init__(self, buzzer_param):
+    def __init__(self, buzzer_param, gpio=True, scheduler=None):
         self._alarm = None
-        self.timeout = float(buzzer_param['timeout'])
-        self.buzzer_datetime = datetime.datetime.now()
-        if machine() in RASPI:
-            log.info('activate buzzer module on platform {}'.format(machine()))
+        self.timeout = buzzer_param['timeout']
+        self._buzzer_off = time.monotonic()  # deadline
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._machine = machine()
+        self._gpio = gpio and self._machine in RASPI
+        if self._gpio:
+            log.info('activate buzzer module on platform {}'.format(self._machine))
+            import RPi.GPIO as Io  # imported only when used
+            self._io = Io
             Io.setmode(Io.BCM)
             Io.setup(BUZZER_PIN, Io.OUT)
             self._buzzer = Io.PWM(BUZZER_PIN, 100)
             self.activate_buzzer()
         else:
-            log.warning('no support for buzzer on platform {}'.format(machine()))
+            log.warning('no support for buzzer on platform {} (gpio={})'.format(self._machine, gpio))
 
     def activate_buzzer(self):
-        if not self._alarm:
-            log.debug('buzzer activated')
-            self._alarm = True
-            self.buzzer_datetime = datetime.datetime.now()
-            if machine() in RASPI:
-                self._buzzer.start(50)
-            else:
-                pass
+        with self._lock:
+            if not self._alarm:
+                log.debug('buzzer activated')
+                self._alarm = True
+                self._buzzer_off = time.monotonic() + self.timeout
+                if self._gpio:
+                    if self._scheduler:
+                        self._scheduler.post(self._buzzer.start, 50)
+                    else:
+                        self._buzzer.start(50)
+                if self._scheduler:
+                    self._scheduler.call_at(self._buzzer_off, self._stop)
+
+    def _stop(self):
+        with self._lock:
+            if self._alarm:
+                log.debug('buzzer stopped')
+                self._alarm = False
+                if self._gpio:
+                    self._buzzer.stop()
 
     def stop_buzzer(self):
-        timeout = self.buzzer_datetime + datetime.timedelta(seconds=self.timeout)
-        if self._alarm and (timeout < datetime.datetime.now()):
-            log.debug('buzzer stopped')
-            self._alarm = False
-            if machine() in RASPI:
-                self._buzzer.stop()
-            else:
-                pass
+        """ stop after timeout (polled when there is no scheduler) """
+        if not self._scheduler and self._alarm and self._buzzer_off < time.monotonic():
+            self._stop()
 
     def __del__(self):
-        if machine() in RASPI:
-            Io.cleanup()
+        if self._gpio:
+            self._io.cleanup()
 
 
 if __name__ == "__main__":
     # simple explore test
     logging.basicConfig()
     logging.getLogger().setLevel(logging.DEBUG)
-    buzzer_data = {'timeout': '2.0'}
+    buzzer_data = {'timeout': 2.0}
     b = Buzzer(buzzer_data)
     b.activate_buzzer()
     for n in range(1, 2000):  # 2s test
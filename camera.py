@@ -1,103 +1,458 @@
-from time import sleep
+import collections
+import threading
+import time
 import cv2
 import logging
+import numpy as np
 import sys
 
+import background
+import buffers
+import detector
+import timing
+
 _log = logging.getLogger(__name__)
 
 
+class MotionGate:
+    """ Mean absolute difference of a 1/8 scale region against a slow reference, opens the full detection """
+
+    def __init__(self, threshold=4.0, hold=5, refresh=25, factor=8, learning_rate=0.05):
+        self.threshold = threshold
+        self._hold_frames = hold  # frames kept open after motion
+        self._refresh = refresh  # full detection at least every n frames, background model keeps learning
+        self._factor = factor
+        self._learning_rate = learning_rate
+        self._region = None  # (slice y, slice x) on processed image, None for full image
+        self._reference = None  # float32 small image
+        self._hold = 0
+        self._idle = 0
+        self.level = 0.0  # last mean abs diff
+
+    def set_region(self, x1, y1, x2, y2):
+        self._region = (slice(y1, y2), slice(x1, x2))
+        self._reference = None
+
+    def reset(self):
+        self._reference = None
+
+    def check(self, gray_frame):
+        """ True when full detection must run on this frame """
+        region = gray_frame[self._region] if self._region else gray_frame
+        small = cv2.resize(region, (max(1, region.shape[1] // self._factor), max(1, region.shape[0] // self._factor)),
+                           interpolation=cv2.INTER_AREA).astype(np.float32)
+        if self._reference is None or self._reference.shape != small.shape:
+            self._reference = small
+            self._hold = self._hold_frames
+            run = True
+        else:
+            self.level = float(cv2.mean(cv2.absdiff(small, self._reference))[0])
+            if self.level > self.threshold:
+                self._hold = self._hold_frames
+                run = True
+            else:
+                cv2.accumulateWeighted(small, self._reference, self._learning_rate)  # follow light changes
+                run = self._hold > 0
+                self._hold = max(0, self._hold - 1)
+        self._idle += 1
+        if run or self._idle >= self._refresh:
+            self._idle = 0
+            return True
+        return False
+
+
+class FrameGrabber(threading.Thread):
+    """ Read frames from V4L on its own thread, keep only the newest ones """
+
+    def __init__(self, capture, size, first_frame=None):
+        super().__init__(name='frame-grabber', daemon=True)
+        self._cam = capture
+        self._ring = collections.deque(maxlen=size)  # oldest frame is dropped when full
+        self._running = threading.Event()
+        self._seq = 0
+        self._release = False  # capture released by the thread when stop gave up waiting on read
+        self._released = False
+        self._lock = threading.Lock()
+        self.failed = False
+        if first_frame is not None:
+            self._ring.append((self._seq, time.time(), first_frame))
+
+    def run(self):
+        self._running.set()
+        _log.debug('frame grabber started')
+        while self._running.is_set():
+            (grabbed, frame) = self._cam.read()
+            if not grabbed:  # error in camera
+                _log.critical('error reading frame from camera on grabber thread')
+                self.failed = True
+                break
+            self._seq += 1
+            self._ring.append((self._seq, time.time(), frame))
+        if self._release:
+            self._release_capture()
+        _log.debug('frame grabber stopped')
+
+    def _release_capture(self):
+        with self._lock:
+            if not self._released:
+                self._released = True
+                self._cam.release()
+
+    def latest(self):
+        """ return newest (seq, timestamp, frame) without blocking """
+        try:
+            return self._ring[-1]
+        except IndexError:
+            return None
+
+    def stop(self, release=False):
+        """ stop reading, release capture only once no read is in progress (by the thread if still reading) """
+        self._release = release
+        self._running.clear()
+        if self.is_alive():
+            self.join(timeout=1.0)
+        if self.is_alive():
+            _log.warning('frame grabber still reading, capture released when read returns')
+            return False
+        if release:
+            self._release_capture()
+        return True
+
+
 class Camera:
     """ Camera setup and motion detect """
 
-    def __init__(self, camera_data):
+    def __init__(self, camera_data, source=None, timings=None, warmup_thread=False):
         self.cam = None
+        self._cam = None
+        self._timings = timings or timing.Timings(enabled=False)
+        self._source = source  # video file or image sequence instead of v4l device
         self.frame = None
         self.frame_delta = None
         self.frame_thresh = None
-        self.first_frame = None
+        self._background = None
+        self._recalibrate = False
+        self.frame_seq = -1
+        self.frame_time = None  # capture time, video time (from open) when reading a source file
+        self._source_start = None
+        self._source_fps = None
+        self.new_frame = False
         self._gray_frame = None
+        self.detection_seq = -1
+        self._grabber = None
+        self._worker = None
+        self._gate = None
+        self._gated = False
+        self._gated_seq = -1
+        self._gate_box = None
+        self._process_size = None
+        self.ready = threading.Event()  # capture open, warmup done, first frame read
+        self._failed = None
+        self._closing = threading.Event()
+        self._warmup = None
+        self._release_lock = threading.Lock()
+        self._released = False
         try:
-            camera_id = int(camera_data['camera_id'])
-            width = int(camera_data['camera_width'])
-            height = int(camera_data['camera_height'])
-            fps = int(camera_data['camera_fps'])
-            camera_delay = int(camera_data['camera_delay'])
-            self._resize_width = int(camera_data['camera_resize_width'])
-            self._resize_height = int(camera_data['camera_resize_height'])
-            self._min_detect_area = int(camera_data['min_detect_area'])
-            self._gaussian_blur_value = int(camera_data['gaussian_blur_value'])
-            self._threshold_value = int(camera_data['threshold_value'])
+            camera_id = camera_data['camera_id']
+            width = camera_data['camera_width']
+            height = camera_data['camera_height']
+            fps = camera_data['camera_fps']
+            camera_delay = camera_data['camera_delay']
+            self._resize_width = camera_data['camera_resize_width']
+            self._resize_height = camera_data['camera_resize_height']
+            self._min_detect_area = camera_data['min_detect_area']
+            self._gaussian_blur_value = camera_data['gaussian_blur_value']
+            self._threshold_value = camera_data['threshold_value']
+            threaded = camera_data.get('camera_threaded', False)
+            buffer_size = camera_data.get('camera_buffer_size', 4)
+            detect_process = camera_data.get('detect_process', False)
+            # x1, y1, x2, y2 on display coordinates, empty for full frame
+            self._roi = camera_data.get('process_roi') or [0, 0, self._resize_width, self._resize_height]
+            self._scale = camera_data.get('process_scale', 1.0)
+            if camera_data.get('motion_gate', False):
+                self._gate = MotionGate(camera_data.get('motion_gate_threshold', 4.0),
+                                        camera_data.get('motion_gate_hold', 5),
+                                        camera_data.get('motion_gate_refresh', 25))
+                self._gate_margin = camera_data.get('motion_gate_margin', 60)
+            self._buffers = buffers.BufferPool(camera_data.get('buffer_pool', False))
+            background_data = background.from_config(camera_data)
+            self._background = background.Background(**background_data)
             _log.info('starting v4l on camera id "{}"'.format(camera_id))
         except ValueError as ex:
             msg = 'error reading camera_data {}. Aborting!'.format(ex)
             _log.error(msg)
             sys.exit(msg)
+        open_args = (camera_id, width, height, fps, camera_delay, threaded, buffer_size, detect_process,
+                     background_data)
+        if warmup_thread:  # App goes on with display, gpio and stats while the sensor warms up
+            self._warmup = threading.Thread(target=self._open_thread, args=open_args, name='camera-warmup',
+                                            daemon=True)
+            self._warmup.start()
+        else:
+            self._open(*open_args)
+
+    def _open_thread(self, *args):
         try:
-            self._cam = cv2.VideoCapture(camera_id)
-            self._cam.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            self._cam.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-            self._cam.set(cv2.CAP_PROP_FPS, fps)
-            _log.debug('resize camera sensor to {}x{}'.format(width, height))
-            sleep(camera_delay)
+            self._open(*args)
+        except SystemExit as ex:
+            self._failed = str(ex)
+        except Exception as ex:  # never leave App waiting for a camera that will not be ready
+            _log.critical('camera warmup failed {}'.format(ex))
+            self._failed = 'camera warmup failed {}. Aborting!'.format(ex)
+        finally:
+            if self._closing.is_set():  # close() did not wait for warmup, release what was opened here
+                self._release()
+
+    def _open(self, camera_id, width, height, fps, camera_delay, threaded, buffer_size, detect_process,
+              background_data):
+        """ open capture, warmup, read first frame and start grabber / detection process """
+        start = time.perf_counter()
+        source = self._source
+        try:
+            if source is None:
+                self._cam = cv2.VideoCapture(camera_id)
+                self._cam.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                self._cam.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+                self._cam.set(cv2.CAP_PROP_FPS, fps)
+                _log.debug('resize camera sensor to {}x{}'.format(width, height))
+                if self._closing.wait(camera_delay):
+                    return
+            else:
+                self._cam = cv2.VideoCapture(source)
+                self._source_start = time.time()
+                self._source_fps = self._cam.get(cv2.CAP_PROP_FPS) or fps
+                _log.info('reading frames from "{}" at {} fps'.format(source, self._source_fps))
             (grabbed, frame) = self._cam.read()
             if not grabbed:  # error in camera
                 msg = 'error reading frame on camera id "{}. Aborting!"'.format(camera_id)
                 _log.critical(msg)
                 sys.exit(msg)
+            self._capture_shape = frame.shape
+            self._set_processing(frame.shape[1], frame.shape[0])
+            if threaded:
+                self._grabber = FrameGrabber(self._cam, buffer_size, frame)
+                self._grabber.start()
+                _log.info('threaded capture with a ring of {} frames'.format(buffer_size))
         except AttributeError as ex:
             msg = 'critical setup camera id {} - {}. Aborting!'.format(camera_id, ex)
             _log.critical(msg)
             sys.exit(msg)
+        if detect_process:
+            try:
+                self._worker = detector.DetectorWorker(self._process_size[::-1], self._threshold_value,
+                                                       self._process_min_area, background_data,
+                                                       dilate_iterations=self._process_dilate)
+            except RuntimeError as ex:
+                _log.error('detection process not available ({}), detecting on main process'.format(ex))
+        if self._gate_box:
+            self.gate_region(self._gate_box)
+        self.ready.set()
+        _log.info('camera id "{}" ready in {:.2f}s'.format(camera_id, time.perf_counter() - start))
+
+    def _set_processing(self, capture_width, capture_height):
+        """ processing region on capture coordinates and size of the processed image """
+        x1, y1, x2, y2 = self._roi
+        fx = capture_width / self._resize_width
+        fy = capture_height / self._resize_height
+        self._capture_roi = (slice(int(y1 * fy), int(y2 * fy)), slice(int(x1 * fx), int(x2 * fx)))
+        self._offset = np.array([x1, y1], dtype=np.int32)
+        self._set_tuning()
+        # set last: gate_region (App thread) takes a processing size as the region being ready
+        self._process_size = (max(1, int((x2 - x1) * self._scale)), max(1, int((y2 - y1) * self._scale)))
+        _log.info('processing region {} at {}x{}'.format(self._roi, *self._process_size))
+
+    def _set_tuning(self):
+        """ blur, min area and dilate on processed image scale """
+        self._process_blur = max(1, int(self._gaussian_blur_value * self._scale)) | 1  # must be odd
+        self._process_min_area = self._min_detect_area * self._scale ** 2
+        self._process_dilate = max(1, int(round(2 * self._scale)))
+
+    def tune(self, name, value):
+        """ change a tuning value (config.TUNABLE camera keys) while running """
+        if name == 'threshold_value':
+            self._threshold_value = value
+        elif name == 'min_detect_area':
+            self._min_detect_area = value
+        elif name == 'gaussian_blur_value':
+            self._gaussian_blur_value = value
+        elif name == 'background_learning_rate':
+            self._background.learning_rate = value
+        elif name == 'motion_gate_threshold':
+            if self._gate:
+                self._gate.threshold = value
+        else:
+            raise ValueError('camera key "{}" is not tunable'.format(name))
+        self._set_tuning()
+        if self._worker:
+            self._worker.tune(self._threshold_value, self._process_min_area, self._background.learning_rate,
+                              self._process_dilate)
+
+    def _to_display(self, objects):
+        """ objects from processed image to display coordinates (new array) """
+        values = objects.view(np.int32).reshape(len(objects), len(objects.dtype.names)).astype(np.float32)
+        if self._scale != 1:
+            values[:, 0] /= self._scale ** 2  # area
+            values[:, 1:] /= self._scale
+        values[:, 1:5] += np.tile(self._offset, 2)  # cx, cy, x, y
+        return values.astype(np.int32).view(detector.OBJECT_DTYPE).reshape(-1)
+
+    def gate_region(self, box):
+        """ motion gate on display box (x1, y1, x2, y2, ex: beam position) plus margin """
+        if not self._gate:
+            return
+        self._gate_box = box
+        if self._process_size is None:  # applied when camera is open
+            return
+        margin = self._gate_margin
+        x1 = int((min(box[0], box[2]) - margin - self._offset[0]) * self._scale)
+        y1 = int((min(box[1], box[3]) - margin - self._offset[1]) * self._scale)
+        x2 = int((max(box[0], box[2]) + margin - self._offset[0]) * self._scale)
+        y2 = int((max(box[1], box[3]) + margin - self._offset[1]) * self._scale)
+        width, height = self._process_size
+        x1, x2 = max(0, min(x1, width - 1)), max(1, min(x2, width))
+        y1, y2 = max(0, min(y1, height - 1)), max(1, min(y2, height))
+        self._gate.set_region(x1, y1, max(x2, x1 + 1), max(y2, y1 + 1))
+        _log.info('motion gate on processed region {}'.format((x1, y1, x2, y2)))
 
     def calibrate(self):
-        """Get image, resize, gray, blur"""
+        """Get image, crop processing region, gray, resize, blur"""
         # get new image
-        (grabbed, self.frame) = self._cam.read()
-        # test reading camera
-        if not grabbed:
-            _log.critical('error reading frame from camera')
-            sys.exit('abnormal program termination!')
-        self.frame = cv2.resize(self.frame, (self._resize_width, self._resize_height))
-        self._gray_frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
-        self._gray_frame = cv2.GaussianBlur(self._gray_frame, (self._gaussian_blur_value, self._gaussian_blur_value), 0)
-        if self.first_frame is None:
-            self.first_frame = self._gray_frame
+        with self._timings.stage('read'):
+            if self._grabber:
+                if self._grabber.failed:
+                    sys.exit('abnormal program termination!')
+                (seq, self.frame_time, frame) = self._grabber.latest()
+            else:
+                (grabbed, frame) = self._cam.read(self._buffers.get('capture', self._capture_shape))
+                # test reading camera
+                if not grabbed:
+                    if self._source is not None:
+                        raise EOFError('end of "{}"'.format(self._source))
+                    _log.critical('error reading frame from camera')
+                    sys.exit('abnormal program termination!')
+                seq = self.frame_seq + 1
+                self.frame_time = time.time() if self._source is None else self._source_time(seq)
+        self.new_frame = seq != self.frame_seq
+        self.frame_seq = seq
+        if not self.new_frame:  # grabber has no newer frame, last processed images still current
+            return
+        with self._timings.stage('preprocess'):
+            pool = self._buffers
+            crop = frame[self._capture_roi]
+            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY, dst=pool.get('gray', crop.shape[:2]))
+            process_shape = self._process_size[::-1]
+            gray = cv2.resize(gray, self._process_size, dst=pool.get('process', process_shape),
+                              interpolation=cv2.INTER_AREA)
+            self._gray_frame = cv2.GaussianBlur(gray, (self._process_blur, self._process_blur), 0,
+                                                dst=pool.get('blur', process_shape))
+            # display frame replaced only when complete, read by App while lane threads capture,
+            # pooled on a ring: readers keeping it longer than a frame keep a copy
+            self.frame = cv2.resize(frame, (self._resize_width, self._resize_height),
+                                    dst=pool.next('display', (self._resize_height, self._resize_width, 3)))
+
+    def _source_time(self, seq):
+        """ frame timestamp from video position, replayed frames keep their recorded spacing """
+        msec = self._cam.get(cv2.CAP_PROP_POS_MSEC)
+        if msec <= 0 and seq:  # image sequence or container without timestamps
+            msec = seq * 1000.0 / self._source_fps
+        return self._source_start + msec / 1000.0
+
+    def recalibrate(self):
+        """ new background reference (built from next frames) """
+        self._recalibrate = True
+        _log.debug('camera recalibration requested')
 
     @property
     def objects(self):
-        """ Compute the absolute difference between the current frame and first frame and find contours """
+        """ Read next frame and detect moving objects, detector.OBJECT_DTYPE array on display coordinates
+        empty when the grabber has no new frame, with the detection process: empty while no new detection has
+        finished (results are never repeated)
+        """
+        if not self.ready.is_set():
+            if self._failed:
+                sys.exit(self._failed)
+            self.new_frame = False
+            return detector.NO_OBJECTS
         self.calibrate()
-        self.frame_delta = cv2.absdiff(self.first_frame, self._gray_frame)
-        self.frame_thresh = cv2.threshold(self.frame_delta, self._threshold_value, 255, cv2.THRESH_BINARY)[1]
-        self.frame_thresh = cv2.dilate(self.frame_thresh, None, iterations=2)
-        im2, contours, hierarchy = cv2.findContours(self.frame_thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        for obj in contours:
-            if cv2.contourArea(obj) > self._min_detect_area:
-                yield obj
+        if not self.new_frame and not self._worker:  # same frame again: detected already, keep background pace
+            return detector.NO_OBJECTS
+        if self._gate:
+            with self._timings.stage('gate'):
+                if self._recalibrate:
+                    self._gate.reset()  # opens the gate, recalibration happens on next detection
+                if self.new_frame:
+                    self._gated = not self._gate.check(self._gray_frame)
+        if self._gated:  # nothing moving: no detection, empty result for this frame
+            if self._worker:
+                self._worker.poll()  # free slots, results older than gated frame are ignored
+            self._gated_seq = self.frame_seq
+            self.detection_seq = self.frame_seq
+            objects = detector.NO_OBJECTS
+        elif self._worker:
+            with self._timings.stage('detect_submit'):
+                if self.new_frame:
+                    self._worker.submit(self._gray_frame, self.frame_seq, self._recalibrate)
+                    self._recalibrate = False
+                objects = self._worker.poll()
+            if objects is not None and self._worker.seq > self._gated_seq:
+                self.detection_seq = self._worker.seq
+            else:
+                objects = detector.NO_OBJECTS
+        else:
+            if self._recalibrate:
+                self._background.recalibrate()
+                self._recalibrate = False
+            with self._timings.stage('detect'):
+                self.frame_delta, self.frame_thresh, objects = detector.detect(self._background, self._gray_frame,
+                                                                                self._threshold_value,
+                                                                                self._process_min_area,
+                                                                                self._buffers, self._process_dilate)
+            self.detection_seq = self.frame_seq
+        return self._to_display(objects)
 
     def close(self):
-        self._cam.release()
+        self._closing.set()
+        if self._warmup:
+            self._warmup.join(timeout=5.0)
+            if self._warmup.is_alive():  # still opening: warmup thread releases when it ends
+                _log.warning('camera still warming up, released when warmup ends')
+                return
+        self._release()
         _log.debug('closing camera')
 
+    def _release(self):
+        """ stop detection process and grabber, release capture, once (close or warmup thread) """
+        with self._release_lock:
+            if self._released:
+                return
+            self._released = True
+        if self._worker:
+            self._worker.close()
+        if self._grabber:
+            self._grabber.stop(release=True)
+        elif self._cam is not None:
+            self._cam.release()
+
 
 def main():
     logging.basicConfig()
     logging.getLogger().setLevel(logging.DEBUG)
     camera_data = {'camera_id': 0, 'camera_delay': 2, 'camera_width': 800, 'camera_height': 600,
                    'gaussian_blur_value': 21, 'min_detect_area': 3000, 'threshold_value': 60,
-                   'camera_resize_width': 800, 'camera_resize_height': 480, 'camera_fps': 1}
+                   'camera_resize_width': 800, 'camera_resize_height': 480, 'camera_fps': 1,
+                   'camera_threaded': True}
     cam = Camera(camera_data)
     cam.calibrate()
     while True:
 
-        for _ in cam.objects:
-            pass
+        print(cam.objects)
         key = cv2.waitKey(1) & 0xFF
         if key == ord("q"):  # if the `q` key is pressed
             break
         cv2.imshow('CAMERA VIEW', cam.frame)
-        cv2.imshow('CAMERA DELTA', cam.frame_delta)
-        cv2.imshow('CAMERA THRESH', cam.frame_thresh)
+        if cam.frame_delta is not None:  # not available with detect_process (computed on worker)
+            cv2.imshow('CAMERA DELTA', cam.frame_delta)
+            cv2.imshow('CAMERA THRESH', cam.frame_thresh)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,210 @@
+"""Overlay composition with preloaded assets, cached layers and text sprites"""
+
+import collections
+import logging
+
+import cv2
+import numpy as np
+
+import buffers
+
+log = logging.getLogger(__name__)
+
+
+class Sprite:
+    """ Rasterised text placed at offset from the text origin: color image, pixels painted by putText and
+    layer mask (drawn with value 1, thinner than the painted pixels)
+    """
+
+    __slots__ = ('image', 'paint', 'mask', 'dx', 'dy')
+
+    def __init__(self, text, font, scale, color, thickness):
+        (width, height), baseline = cv2.getTextSize(text, font, scale, thickness)
+        pad = thickness + 2
+        shape = (height + baseline + 2 * pad, width + 2 * pad)
+        image = np.zeros(shape + (3,), dtype=np.uint8)
+        paint = np.zeros(shape, dtype=np.uint8)
+        mask = np.zeros(shape, dtype=np.uint8)
+        cv2.putText(image, text, (pad, pad + height), font, scale, color, thickness)
+        cv2.putText(paint, text, (pad, pad + height), font, scale, 255, thickness)
+        cv2.putText(mask, text, (pad, pad + height), font, scale, 1, thickness)
+        x, y, w, h = cv2.boundingRect(paint)  # keep only the drawn pixels
+        self.image = image[y:y + h, x:x + w].copy()
+        self.paint = paint[y:y + h, x:x + w] > 0
+        self.mask = mask[y:y + h, x:x + w].copy()
+        self.dx = x - pad
+        self.dy = y - pad - height
+
+
+class TextSprites:
+    """ LRU cache of rasterised text by (text, font, scale, color, thickness) """
+
+    def __init__(self, max_size=512):
+        self._max_size = max_size
+        self._sprites = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, font, scale, color, thickness=1):
+        key = (text, font, scale, tuple(color) if isinstance(color, (list, tuple)) else color, thickness)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            self.misses += 1
+            sprite = self._sprites[key] = Sprite(text, font, scale, color, thickness)
+            if len(self._sprites) > self._max_size:
+                self._sprites.popitem(last=False)  # least recently used
+        else:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+        return sprite
+
+    def __len__(self):
+        return len(self._sprites)
+
+
+class Layer:
+    """ Overlay drawn once on a transparent canvas and re-applied while its content key is unchanged """
+
+    def __init__(self, width, height, roi=None, sprites=None):
+        self.image = np.zeros((height, width, 3), dtype=np.uint8)
+        self._mask = np.zeros((height, width), dtype=np.uint8)
+        x1, y1, x2, y2 = roi if roi else (0, 0, width, height)
+        self._roi = (slice(y1, y2), slice(x1, x2))
+        self._box = self._roi  # drawn pixels bounding box, computed on apply
+        self._sprites = sprites
+        self._fields = dict()  # name: (text, drawn box) of put_field texts
+        self.key = None
+
+    def changed(self, key):
+        return key != self.key
+
+    def clear(self, key=None):
+        """ erase layer content, key identifies what will be drawn next """
+        self.image[self._roi] = 0
+        self._mask[self._roi] = 0
+        self._box = None
+        self._fields.clear()
+        self.key = key
+
+    def put_text(self, text, org, font, scale, color, thickness=1):
+        """ draw text, blitted from the sprite cache when the layer has one; returns drawn box (x1, y1, x2, y2) """
+        self._box = None
+        sprite = self._sprites.get(text, font, scale, color, thickness) if self._sprites is not None else None
+        if sprite is None:
+            cv2.putText(self.image, text, org, font, scale, color, thickness)
+            cv2.putText(self._mask, text, org, font, scale, 1, thickness)
+            (width, height), baseline = cv2.getTextSize(text, font, scale, thickness)
+            x1, y1 = org[0] - thickness - 2, org[1] - height - thickness - 2
+            x2, y2 = org[0] + width + thickness + 2, org[1] + baseline + thickness + 2
+        else:
+            x1, y1 = org[0] + sprite.dx, org[1] + sprite.dy
+            x2, y2 = x1 + sprite.mask.shape[1], y1 + sprite.mask.shape[0]
+        # clip to layer
+        sx1, sy1 = max(0, -x1), max(0, -y1)
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(self._mask.shape[1], x2), min(self._mask.shape[0], y2)
+        if sprite is not None and x2 > x1 and y2 > y1:
+            crop = (slice(sy1, sy1 + y2 - y1), slice(sx1, sx1 + x2 - x1))
+            box = (slice(y1, y2), slice(x1, x2))
+            np.copyto(self.image[box], sprite.image[crop], where=sprite.paint[crop][..., None])
+            np.bitwise_or(self._mask[box], sprite.mask[crop], out=self._mask[box])
+        return x1, y1, x2, y2
+
+    def put_field(self, name, text, org, styles):
+        """ text redrawn only when changed, styles drawn in order (font, scale, color, thickness)
+        ex: shadow then foreground; fields of a layer must not overlap
+        """
+        field = self._fields.get(name)
+        if field is not None:
+            if field[0] == text:
+                return
+            x1, y1, x2, y2 = field[1]
+            self.image[y1:y2, x1:x2] = 0
+            self._mask[y1:y2, x1:x2] = 0
+        boxes = [self.put_text(text, org, *style) for style in styles]
+        self._fields[name] = (text, (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                                     max(b[2] for b in boxes), max(b[3] for b in boxes)))
+
+    def apply(self, frame):
+        """ copy drawn pixels over frame (only inside their bounding box) """
+        if self._box is None:
+            x, y, w, h = cv2.boundingRect(self._mask)
+            self._box = (slice(y, y + h), slice(x, x + w))
+        mask = self._mask[self._box].view(np.bool_)[..., None]
+        np.copyto(frame[self._box], self.image[self._box], where=mask)
+        return frame
+
+
+class Compositor:
+    """ Decode image assets once and build display frames from cached layers """
+
+    def __init__(self, width, height, background_file, buffer_pool=False):
+        self._width = width
+        self._height = height
+        self._assets = dict()
+        self._static = []
+        self._base = None
+        self.sprites = TextSprites()
+        self._buffers = buffers.BufferPool(buffer_pool)  # composed frames reused (ring, displayed one frame)
+        self._background = self.image(background_file)
+        if self._background is None:
+            self._background = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def image(self, file_name):
+        """ decoded image from cache, None if file can't be read """
+        if file_name not in self._assets:
+            img = cv2.imread(file_name, cv2.IMREAD_ANYCOLOR)
+            if img is None:
+                log.error('error loading image "{}"'.format(file_name))
+            elif img.shape[:2] != (self._height, self._width):
+                img = cv2.resize(img, (self._width, self._height))
+            self._assets[file_name] = img
+            log.debug('image "{}" loaded on cache'.format(file_name))
+        return self._assets[file_name]
+
+    def layer(self, roi=None, static=False):
+        """ new layer; static layers are blended once into the base frame, drawn before the first compose """
+        layer = Layer(self._width, self._height, roi, self.sprites)
+        if static:
+            self._static.append(layer)
+            self._base = None
+        return layer
+
+    def compose(self, live=None):
+        """ new frame from background + static layers, live image added under static layers """
+        if live is None:
+            if self._base is None:
+                self._base = self._background.copy()
+                for layer in self._static:
+                    layer.apply(self._base)
+            frame = self._buffers.next('frame', self._base.shape, 2)
+            if frame is None:
+                return self._base.copy()
+            np.copyto(frame, self._base)
+            return frame
+        frame = cv2.add(self._background, live, dst=self._buffers.next('frame', self._background.shape, 2))
+        for layer in self._static:
+            layer.apply(frame)
+        return frame
+
+
+def main():
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG)
+    comp = Compositor(800, 480, 'background.png')
+    labels = comp.layer(static=True)
+    labels.clear('labels')
+    labels.put_text('compositor', (50, 412), cv2.FONT_HERSHEY_PLAIN, 1, (238, 255, 170), 1)
+    data = comp.layer(roi=(0, 380, 800, 480))
+    frame = None
+    for n in range(100):
+        if data.changed(n // 10):
+            data.clear(n // 10)
+            data.put_text('{:04d}'.format(n // 10), (50, 446), cv2.FONT_HERSHEY_DUPLEX, 1.2, (255, 255, 255), 1)
+        frame = data.apply(comp.compose())
+    cv2.imshow('COMPOSITOR', frame)
+    cv2.waitKey(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,9 @@
 
 import configparser
 import logging
+import os
+import queue
+import threading
 
 
 _log = logging.getLogger(__name__)
@@ -20,6 +23,198 @@ def init(config_file_name):
         _log.info('success reading config file "{}"'.format(config_file_name))
 
 
+def as_bool(value):
+    """convert ini flags (yes/no, true/false, on/off, 1/0) to bool"""
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ('yes', 'true', 'on', '1'):
+        return True
+    if str(value).strip().lower() in ('no', 'false', 'off', '0', ''):
+        return False
+    raise ValueError('invalid boolean value "{}"'.format(value))
+
+
+def int_list(value):
+    """'1, 2, 3' -> [1, 2, 3], empty -> []"""
+    return [int(val) for val in str(value).split(',') if val.strip()]
+
+
+def box(value):
+    """'x1, y1, x2, y2' -> [x1, y1, x2, y2]"""
+    values = int_list(value)
+    if len(values) != 4:
+        raise ValueError('expected x1, y1, x2, y2')
+    return values
+
+
+def optional_box(value):
+    return box(value) if str(value).strip() else []
+
+
+def clock_list(value):
+    """'06:00, 14:00, 22:00' -> [(6, 0), (14, 0), (22, 0)] sorted"""
+    times = []
+    for val in str(value).split(','):
+        if val.strip():
+            hour, minute = (int(part) for part in val.split(':'))
+            if not (0 <= hour < 24 and 0 <= minute < 60):
+                raise ValueError('expected hh:mm')
+            times.append((hour, minute))
+    return sorted(times)
+
+
+def percentage(value):
+    value = int(value)
+    if not 0 <= value <= 100:
+        raise ValueError('expected 0..100')
+    return value
+
+
+def scale(value):
+    """ fraction of a size, 0 < value <= 1 """
+    value = float(value)
+    if not 0 < value <= 1:
+        raise ValueError('expected 0 < value <= 1')
+    return value
+
+
+def choice(*values):
+    """ parser accepting only one of values """
+    def parse_choice(value):
+        value = str(value).strip()
+        if value not in values:
+            raise ValueError('expected one of {}'.format(', '.join(values)))
+        return value
+    return parse_choice
+
+
+BACKGROUND_MODELS = ('static', 'average', 'mog2')
+
+
+# key parsers by section, lane sections accept CAMERA, DISPLAY and STATS keys
+SCHEMA = {
+    'GLOBAL': {'log_level': str, 'version': str, 'port': str, 'headless': as_bool, 'lanes': str,
+               'log_queue': as_bool, 'log_rotate': choice('', 'size', 'time'), 'log_max_bytes': int,
+               'log_backup_count': int, 'log_when': str, 'log_json': as_bool, 'config_reload': as_bool,
+               'config_interval': float},
+    'STATS': {'percentage_sample': percentage, 'loop_sample': int, 'windows': int_list, 'window_bucket': int,
+              'store_file': str, 'store_interval': float},
+    'CAMERA': {'camera_id': int, 'camera_delay': int, 'camera_width': int, 'camera_height': int,
+               'camera_resize_width': int, 'camera_resize_height': int, 'camera_fps': int,
+               'camera_threaded': as_bool, 'camera_buffer_size': int, 'detect_process': as_bool,
+               'process_roi': optional_box, 'process_scale': scale, 'gaussian_blur_value': int,
+               'threshold_value': int, 'min_detect_area': int, 'background_model': choice(*BACKGROUND_MODELS),
+               'background_learning_rate': float, 'background_median_frames': int, 'motion_gate': as_bool,
+               'motion_gate_threshold': float, 'motion_gate_hold': int, 'motion_gate_refresh': int,
+               'motion_gate_margin': int, 'buffer_pool': as_bool, 'detect_fps': float},
+    'DISPLAY': {'image_width': int, 'image_height': int, 'window_title': str, 'beam_position': box,
+                'beam_dead_zone': int, 'time_min_delta': float, 'tracker': as_bool, 'track_max_distance': int,
+                'track_max_missed': int, 'bag_select': float, 'image_template': str, 'image_bag': str,
+                'diagnostics': as_bool, 'timing_samples': int, 'timing_file': str, 'timing_interval': float,
+                'display_fps': float},
+    'LED': {'red_gpio': int, 'green_gpio': int, 'green_timeout': float, 'red_timeout': float},
+    'BUZZER': {'timeout': float},
+    'METRICS': {'enabled': as_bool, 'bind': str, 'port': int, 'interval': float},
+    'ARCHIVE': {'enabled': as_bool, 'counted': as_bool, 'folder': str, 'quota_mb': float, 'workers': int,
+                'queue_size': int, 'jpeg_quality': percentage},
+    'REPORT': {'enabled': as_bool, 'folder': str, 'format': choice('csv', 'parquet'), 'shifts': clock_list,
+               'interval': float},
+}
+LANE_SCHEMA = dict(SCHEMA['CAMERA'], **dict(SCHEMA['DISPLAY'], **SCHEMA['STATS']))
+
+# keys applied to a running App by Watcher, no restart
+TUNABLE = {'threshold_value', 'min_detect_area', 'gaussian_blur_value', 'background_learning_rate',
+           'motion_gate_threshold', 'beam_position', 'beam_dead_zone', 'time_min_delta', 'track_max_distance',
+           'track_max_missed'}
+
+
+def parse(section, data):
+    """typed copy of section data (ini strings), ValueError listing every invalid key"""
+    schema = SCHEMA.get(section, LANE_SCHEMA)  # other sections are lanes (maybe not in use)
+    errors = []
+    typed = {}
+    for name, value in data.items():
+        if name not in schema:
+            _log.warning('unknown key "{}" on [{}]'.format(name, section))
+            continue
+        try:
+            typed[name] = schema[name](value)
+        except ValueError as ex:
+            errors.append('[{}] {} = "{}" ({})'.format(section, name, value, ex))
+    if errors:
+        raise ValueError('; '.join(errors))
+    return typed
+
+
+def validate(parser=None):
+    """typed {section: {key: value}} of whole config, ValueError listing every invalid key"""
+    parser = parser or _config
+    lanes = [val.strip() for val in parser.get('GLOBAL', 'lanes', fallback='').split(',') if val.strip()]
+    errors = []
+    typed = {}
+    for section in parser.sections():
+        try:
+            typed[section] = parse(section, dict(parser.items(section)))
+        except ValueError as ex:
+            errors.append(str(ex))
+    for lane in lanes:
+        if lane not in typed:
+            errors.append('lane section [{}] not found'.format(lane))
+    if errors:
+        raise ValueError('invalid configuration: {}'.format('; '.join(errors)))
+    return typed
+
+
+class Watcher(threading.Thread):
+    """Poll config file, queue (section, key, value) for each changed TUNABLE key"""
+
+    def __init__(self, file_name, interval=2.0):
+        super().__init__(name='config-watcher', daemon=True)
+        self.changes = queue.Queue()
+        self._file_name = file_name
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._mtime = os.stat(file_name).st_mtime
+        self._values = self._tunables(self._read())
+
+    def _read(self):
+        parser = configparser.RawConfigParser()
+        if not parser.read(self._file_name):
+            raise ValueError('invalid configuration file "{}"'.format(self._file_name))
+        return validate(parser)
+
+    @staticmethod
+    def _tunables(typed):
+        return dict(((section, name), value) for section, values in typed.items()
+                    for name, value in values.items() if name in TUNABLE)
+
+    def poll(self):
+        """check file once, return number of changes queued"""
+        try:
+            mtime = os.stat(self._file_name).st_mtime
+            if mtime == self._mtime:
+                return 0
+            self._mtime = mtime
+            values = self._tunables(self._read())
+        except (OSError, ValueError, configparser.Error) as ex:
+            _log.error('config change ignored: {}'.format(ex))
+            return 0
+        changed = [(section, name, value) for (section, name), value in sorted(values.items())
+                   if self._values.get((section, name)) != value]
+        self._values = values
+        for change in changed:
+            _log.info('config change [{}] {} = {}'.format(*change))
+            self.changes.put(change)
+        return len(changed)
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            self.poll()
+
+    def stop(self):
+        self._stopped.set()
+
+
 def set_section(section):
     try:
         global key
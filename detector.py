@@ -0,0 +1,181 @@
+"""Detection worker process, frames are passed by shared memory instead of pickling"""
+
+import logging
+import multiprocessing
+import queue
+
+import cv2
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+import background
+import buffers
+
+_log = logging.getLogger(__name__)
+
+# one row per detected object: pixel area, centroid and bounding box
+OBJECT_DTYPE = np.dtype([('area', np.int32), ('cx', np.int32), ('cy', np.int32),
+                         ('x', np.int32), ('y', np.int32), ('w', np.int32), ('h', np.int32)])
+NO_OBJECTS = np.zeros(0, OBJECT_DTYPE)
+_NO_POOL = buffers.BufferPool(enabled=False)
+
+
+def detect(background, gray_frame, threshold_value, min_detect_area, pool=None, dilate_iterations=2):
+    """ Difference against the background model, threshold, dilate and keep objects bigger than min area
+    pool: buffers.BufferPool for the dilate and labels outputs
+    dilate_iterations: 2 at display scale, fewer on downscaled images (same grown distance in display pixels)
+    """
+    pool = pool or _NO_POOL
+    frame_delta, frame_thresh = background.apply(gray_frame, threshold_value)
+    frame_thresh = cv2.dilate(frame_thresh, None, dst=pool.get('dilate', frame_thresh.shape),
+                              iterations=dilate_iterations)
+    # fill holes (outer contours only, as findContours RETR_EXTERNAL did): flood the background from a padded
+    # corner, what it can't reach and isn't foreground is a hole
+    height, width = frame_thresh.shape
+    padded = cv2.copyMakeBorder(frame_thresh, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0,
+                                dst=pool.get('padded', (height + 2, width + 2)))
+    cv2.floodFill(padded, None, (0, 0), 255)
+    holes = cv2.bitwise_not(padded[1:-1, 1:-1], dst=pool.get('holes', frame_thresh.shape))
+    frame_thresh = cv2.bitwise_or(frame_thresh, holes, dst=frame_thresh)
+    if frame_thresh.size < 4 * 65535:  # 16 bit labels can't overflow
+        label_type, labels = cv2.CV_16U, pool.get('labels', frame_thresh.shape, np.uint16)
+    else:
+        label_type, labels = cv2.CV_32S, pool.get('labels', frame_thresh.shape, np.int32)
+    count, _, stats, centroids = cv2.connectedComponentsWithStats(frame_thresh, labels, connectivity=8,
+                                                                  ltype=label_type)
+    keep = np.flatnonzero(stats[1:, cv2.CC_STAT_AREA] > min_detect_area) + 1  # label 0 is background
+    objects = np.empty(len(keep), OBJECT_DTYPE)
+    objects['area'] = stats[keep, cv2.CC_STAT_AREA]
+    objects['cx'] = centroids[keep, 0]
+    objects['cy'] = centroids[keep, 1]
+    objects['x'] = stats[keep, cv2.CC_STAT_LEFT]
+    objects['y'] = stats[keep, cv2.CC_STAT_TOP]
+    objects['w'] = stats[keep, cv2.CC_STAT_WIDTH]
+    objects['h'] = stats[keep, cv2.CC_STAT_HEIGHT]
+    return frame_delta, frame_thresh, objects
+
+
+def _detect_loop(slot_names, shape, threshold_value, min_detect_area, dilate_iterations, background_data, jobs,
+                 results):
+    """ worker process: run the detection pipeline on frames found in the shared slots """
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    frames = [np.ndarray(shape, dtype=np.uint8, buffer=slot.buf) for slot in slots]
+    model = background.Background(**background_data)
+    pool = buffers.BufferPool(background_data.get('buffer_pool', False))
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:  # close requested
+                break
+            slot, seq, reset, tuning = job
+            if tuning:
+                threshold_value, min_detect_area, dilate_iterations, model.learning_rate = tuning
+            if reset:
+                model.recalibrate()
+            objects = detect(model, frames[slot], threshold_value, min_detect_area, pool, dilate_iterations)[2]
+            results.put((slot, seq, objects))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del frames
+        for slot in slots:
+            slot.close()
+
+
+class DetectorWorker:
+    """ Run Camera detection on a separate process, return only the objects found (OBJECT_DTYPE) """
+
+    def __init__(self, shape, threshold_value, min_detect_area, background_data=None, slots=3, dilate_iterations=2):
+        if shared_memory is None:
+            raise RuntimeError('multiprocessing.shared_memory requires python 3.8')
+        size = int(np.prod(shape))
+        self._slots = [shared_memory.SharedMemory(create=True, size=size) for _ in range(slots)]
+        self._frames = [np.ndarray(shape, dtype=np.uint8, buffer=slot.buf) for slot in self._slots]
+        self._free = list(range(slots))
+        self._reset = False
+        self._tuning = None
+        self._jobs = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_detect_loop, name='anacase-detector', daemon=True,
+                                                args=([slot.name for slot in self._slots], shape, threshold_value,
+                                                      min_detect_area, dilate_iterations, background_data or {},
+                                                      self._jobs, self._results))
+        self._process.start()
+        self.seq = -1
+        self.objects = NO_OBJECTS
+        self._fresh = False  # objects not yet returned by poll
+        _log.info('detection process pid={} started with {} shared frame slots'.format(self._process.pid, slots))
+
+    def submit(self, gray_frame, seq, reset=False):
+        """ copy frame to a free slot and queue it, drop the frame if the worker is still busy """
+        self._reset = self._reset or reset
+        self._collect()
+        if not self._free:
+            return False
+        slot = self._free.pop()
+        np.copyto(self._frames[slot], gray_frame)
+        self._jobs.put((slot, seq, self._reset, self._tuning))
+        self._reset = False
+        self._tuning = None
+        return True
+
+    def tune(self, threshold_value, min_detect_area, learning_rate, dilate_iterations=2):
+        """ new detection parameters, sent with next frame """
+        self._tuning = (threshold_value, min_detect_area, dilate_iterations, learning_rate)
+
+    def poll(self):
+        """ collect finished detections without blocking, return the newest ones or None when none finished
+        since last poll (last result kept on self.objects, never returned twice)
+        """
+        self._collect()
+        objects, self._fresh = (self.objects if self._fresh else None), False
+        return objects
+
+    def _collect(self):
+        while True:
+            try:
+                slot, seq, objects = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._free.append(slot)
+            if seq > self.seq:
+                self.seq = seq
+                self.objects = objects
+                self._fresh = True
+
+    def close(self):
+        self._jobs.put(None)
+        self._process.join(timeout=1.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        del self._frames
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+        _log.debug('detection process closed')
+
+
+def main():
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG)
+    background = np.zeros((480, 800), dtype=np.uint8)
+    worker = DetectorWorker(background.shape, 60, 3000)
+    worker.submit(background, 0)
+    frame = background.copy()
+    frame[100:300, 200:400] = 255
+    while worker.seq < 0:
+        worker.poll()
+    while not worker.submit(frame, 1):
+        pass
+    while worker.seq < 1:
+        worker.poll()
+    print('{} objects found'.format(len(worker.objects)))
+    worker.close()
+
+
+if __name__ == '__main__':
+    main()
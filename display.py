@@ -55,7 +55,8 @@ class Display:
             raise ValueError('no active window')
 
     def __del__(self):
-        cv2.destroyAllWindows()
+        if self._display:
+            cv2.destroyAllWindows()
 
 
 def main():
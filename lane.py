@@ -0,0 +1,266 @@
+"""One belt (lane): camera, detection, beam counting and its own sampling stats"""
+
+import collections
+import datetime
+import logging
+import os
+import threading
+import time
+
+import camera
+import config
+import detector
+import logger
+import stats
+import timing
+import tracker
+
+log = logging.getLogger(__name__)
+_hot = logger.HotPath(log)
+
+SELECTED_MAX = 8  # selected bag frames waiting for review, oldest dropped (App shows one per bag_select)
+
+
+def lane_sections(camera_data, display_data, random_data, lanes_data):
+    """ [(name, camera_data, display_data, random_data)], lane section keys override the shared sections """
+    lanes = []
+    for n, (name, lane_data) in enumerate(lanes_data):
+        lane_random = dict(random_data, **lane_data)
+        if n and random_data.get('store_file') and 'store_file' not in lane_data:
+            root, ext = os.path.splitext(random_data['store_file'])  # one event store per lane
+            lane_random['store_file'] = '{}.{}{}'.format(root, name.lower(), ext)
+        lanes.append((name, dict(camera_data, **lane_data), dict(display_data, **lane_data), lane_random))
+    return lanes
+
+
+class Lane:
+    """ Count bags crossing the beam of one camera, inline or on its own thread """
+
+    def __init__(self, name, camera_data, display_data, random_data, source=None, timings=None, overrides=(),
+                 keep_counted=False):
+        self.name = name
+        self.overrides = set(overrides)  # keys of own lane section, not changed by [CAMERA] / [DISPLAY] tuning
+        self._keep_counted = keep_counted  # copy the frame of each counted bag (archived by App)
+        self.timings = timings or timing.Timings(enabled=False)
+        self.cam = camera.Camera(camera_data, source, self.timings, warmup_thread=source is None)
+        self._detect_rate = timing.Rate(camera_data.get('detect_fps', 0))  # 0 = every captured frame
+        self.stats = stats.Stats(random_data)
+        self.lock = threading.Lock()  # stats and counting state, shared with App on threaded lanes
+        self.start_time = self._now()
+        self._time_min_delta = datetime.timedelta(seconds=display_data['time_min_delta'])
+        self.beam_position = list(display_data['beam_position'])  # x1, y1, x2, y2
+        self._beam_dead_zone = display_data['beam_dead_zone']
+        self.cam.gate_region(self.beam_position)
+        self._tracker = None
+        if display_data.get('tracker', False):
+            self._tracker = tracker.CentroidTracker(self.beam_position,
+                                                    display_data.get('track_max_distance', 80),
+                                                    display_data.get('track_max_missed', 5))
+        self._detection_seq = -1
+        self._ids = []
+        self.mark = False
+        self.result = (detector.NO_OBJECTS, [], [])  # (objects, centers, ids) of last frame
+        self.bags = collections.deque()  # (counter, frame or None) of counted bags not yet seen by App
+        self.selected = collections.deque(maxlen=SELECTED_MAX)  # (counter, frame) of bags selected for review
+        self.failed = False
+        self._running = False
+        self._thread = None
+
+    @property
+    def beam_ready(self):
+        """ time min delta has passed since last bag """
+        return (self.start_time + self._time_min_delta) < self._now()
+
+    def _now(self):
+        """ time of current frame (video time on replay), wall clock before the first frame """
+        if self.cam.frame_time is None:
+            return datetime.datetime.now()
+        return datetime.datetime.fromtimestamp(self.cam.frame_time)
+
+    def step(self):
+        """ detect objects on next frame, count the ones passing the beam; False when not due (detect_fps) """
+        if not self._detect_rate.due():
+            return False
+        objects = self.cam.objects
+        with self.timings.stage('count'):
+            with self.lock:
+                self.result = self._count(objects)
+                if self.stats.is_selected():
+                    if len(self.selected) == SELECTED_MAX:
+                        log.warning('lane {} review queue full, bag {} not shown'.format(self.name,
+                                                                                        self.selected[0][0]))
+                    self.selected.append((self.stats.counter, self._keep(self.cam.frame)))
+        return True
+
+    def _count(self, objects):
+        centers = list(zip(objects['cx'].tolist(), objects['cy'].tolist()))          # objects center (x,y)
+        if self._tracker:
+            if self.cam.detection_seq != self._detection_seq:                           # new detection results
+                self._detection_seq = self.cam.detection_seq
+                self._ids = self._tracker.update(centers)
+                for _ in self._tracker.crossed:                                         # tracks crossing the beam
+                    self._new_bag()
+            return objects, centers, self._ids
+        for centro in centers:
+            # test if time as passed from last detection
+            if self.beam_ready:
+                # test if center of object is before beam position
+                if self.beam_position[1] - self._beam_dead_zone <= centro[1] <= self.beam_position[3]\
+                        and self.beam_position[0] <= centro[0] <= self.beam_position[2]:
+                    self.mark = True
+                # test if center of object is before beam position
+                if self.mark and self.beam_position[1] <= centro[1] <= self.beam_position[3] + self._beam_dead_zone\
+                        and self.beam_position[0] <= centro[0] <= self.beam_position[2]:
+                    self._new_bag()
+        if not self.beam_ready:
+            self.mark = False
+        return objects, centers, range(1, len(centers) + 1)
+
+    def _new_bag(self):
+        self.stats.inc_counter()
+        if _hot.debug:
+            log.debug('new bag detected on %s. id=%03d ', self.name, self.stats.counter)
+        self.start_time = self._now()
+        self.bags.append((self.stats.counter, self._keep(self.cam.frame) if self._keep_counted else None))
+
+    @staticmethod
+    def _keep(frame):
+        """ frames kept for later are copied, camera display frames are reused (buffer_pool) """
+        return None if frame is None else frame.copy()
+
+    def tune(self, name, value):
+        """ change a tuning value (config.TUNABLE) while running """
+        with self.lock:
+            if name == 'beam_position':
+                self.beam_position = list(value)
+                self.cam.gate_region(self.beam_position)
+                if self._tracker:
+                    self._tracker.tune(beam_position=self.beam_position)
+            elif name == 'beam_dead_zone':
+                self._beam_dead_zone = value
+            elif name == 'time_min_delta':
+                self._time_min_delta = datetime.timedelta(seconds=value)
+            elif name == 'track_max_distance':
+                if self._tracker:
+                    self._tracker.tune(max_distance=value)
+            elif name == 'track_max_missed':
+                if self._tracker:
+                    self._tracker.tune(max_missed=value)
+            else:
+                self.cam.tune(name, value)
+        log.info('lane {} tuned {} = {}'.format(self.name, name, value))
+
+    def inc_ack(self):
+        with self.lock:
+            self.stats.inc_ack()
+
+    def start(self):
+        """ run capture, detection and counting on own thread """
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='lane-{}'.format(self.name), daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        try:
+            while self._running:
+                if not self.step():
+                    time.sleep(self._detect_rate.remaining())
+                    continue
+                self.timings.tick()
+                if not self.cam.new_frame:
+                    time.sleep(0.002)  # wait for next camera frame
+        except (Exception, SystemExit) as ex:
+            log.error('lane {} stopped: {}'.format(self.name, ex))
+            self.failed = True
+
+    def close(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        self.cam.close()
+        self.stats.close()
+
+
+class Totals:
+    """ Stats of all lanes combined (read only, plus reset) """
+
+    def __init__(self, lanes):
+        self._lanes = lanes
+        self.windows = lanes[0].stats.windows
+
+    def _sum(self, name):
+        total = 0
+        for lane in self._lanes:
+            with lane.lock:
+                total += getattr(lane.stats, name)
+        return total
+
+    def _sum_windows(self, name):
+        totals = collections.OrderedDict()
+        for lane in self._lanes:
+            with lane.lock:
+                counts = getattr(lane.stats, name)
+            for window, value in counts.items():
+                totals[window] = totals.get(window, 0) + value
+        return totals
+
+    @property
+    def counter(self):
+        return self._sum('counter')
+
+    @property
+    def sampled(self):
+        return self._sum('sampled')
+
+    @property
+    def ack(self):
+        return self._sum('ack')
+
+    @property
+    def loop_sample(self):
+        return self._sum('loop_sample')
+
+    @property
+    def percentage(self):
+        try:
+            return round((self.sampled / self.counter) * 100, 1)
+        except ZeroDivisionError:
+            return 0.0
+
+    @property
+    def counter_by_time(self):
+        return self._sum_windows('counter_by_time')
+
+    @property
+    def selected_by_time(self):
+        return self._sum_windows('selected_by_time')
+
+    @property
+    def first_counter(self):
+        first = []
+        for lane in self._lanes:
+            with lane.lock:
+                first.append(lane.stats.first_counter)
+        return min(first)
+
+    def reset(self):
+        for lane in self._lanes:
+            with lane.lock:
+                lane.stats.reset()
+
+
+if __name__ == '__main__':
+    # simple explore test
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG)
+    config.init('anacase.ini')
+    settings = config.validate()
+    lanes = [Lane(name, *data) for name, *data in lane_sections(settings['CAMERA'], settings['DISPLAY'],
+                                                                 dict(settings['STATS'], store_file=''),
+                                                                 [('CAMERA', {})])]
+    for lane in lanes:
+        lane.start()
+    time.sleep(10)
+    print([(lane.name, lane.stats.counter, lane.timings.fps) for lane in lanes])
+    for lane in lanes:
+        lane.close()
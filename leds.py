@@ -1,6 +1,6 @@
 import platform
-import datetime
 import logging
+import threading
 import time
 
 log = logging.getLogger(__name__)
@@ -8,73 +8,96 @@ log = logging.getLogger(__name__)
 MACHINE = platform.machine()
 RASPI = ["armv7l"]
 
-if MACHINE in RASPI:
-    from gpiozero import LED
-
 
 class Leds:
-    """ LED's manager, control _led_red and _led_green led """
+    """ LED's manager, control _led_red and _led_green led
+
+    with a scheduler gpio writes and timeouts run on the scheduler thread,
+    without it clear_leds() must be polled
+    """
 
-    def __init__(self, led_param):
-        if MACHINE in RASPI:
-            self._led_green = LED(int(led_param['green_gpio']))
-            self._led_red = LED(int(led_param['red_gpio']))
+    def __init__(self, led_param, gpio=True, scheduler=None):
+        self._gpio = gpio and MACHINE in RASPI
+        if self._gpio:
+            from gpiozero import LED  # imported only when used, slow to load
+            self._led_green = LED(led_param['green_gpio'])
+            self._led_red = LED(led_param['red_gpio'])
             log.info('activate led module on platform {}'.format(MACHINE))
         else:
-            log.warning('no support for leds on platform {}'.format(MACHINE))
+            log.warning('no support for leds on platform {} (gpio={})'.format(MACHINE, gpio))
 
-        self._green_timeout = float(led_param['green_timeout'])
-        self._red_timeout = float(led_param['red_timeout'])
-        self._green_datetime = datetime.datetime.now()
-        self._red_datetime = datetime.datetime.now()
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._green_timeout = led_param['green_timeout']
+        self._red_timeout = led_param['red_timeout']
+        self._green_off = time.monotonic()  # deadlines
+        self._red_off = time.monotonic()
         self._red_active = False
         self._green_active = False
         self.activate_green()
         self.activate_red()
 
+    def _write(self, led, name, state):
+        if self._gpio:
+            try:
+                if state:
+                    getattr(self, led).on()
+                else:
+                    getattr(self, led).off()
+            except:
+                log.warning('{} led {}gpio fail on [{}]'.format(name, '' if state else 'off ', getattr(self, led)))
+
+    def _switch(self, led, name, state):
+        """ gpio write now, or on scheduler thread """
+        if self._scheduler:
+            self._scheduler.post(self._write, led, name, state)
+        else:
+            self._write(led, name, state)
+
     def activate_red(self):
-        if not self._red_active:
-            log.debug('red led on')
-            self._red_active = True
-            self._red_datetime = datetime.datetime.now()
-            if MACHINE in RASPI:
-                try:
-                    self._led_red.on()
-                except:
-                    log.warning('red led gpio fail on [{}]'.format(self._led_red))
-        return self._red_active
+        with self._lock:
+            if not self._red_active:
+                log.debug('red led on')
+                self._red_active = True
+                self._red_off = time.monotonic() + self._red_timeout
+                self._switch('_led_red', 'red', True)
+                if self._scheduler:
+                    self._scheduler.call_at(self._red_off, self._clear_red)
+            return self._red_active
 
     def activate_green(self):
-        if not self._green_active and not self._red_active:
-            log.debug('green led on')
-            self._green_active = True
-            self._green_datetime = datetime.datetime.now()
-            if MACHINE in RASPI:
-                try:
-                    self._led_green.on()
-                except:
-                    log.warning('green led gpio fail on [{}]'.format(self._led_green))
-        return self._green_active
+        with self._lock:
+            if not self._green_active and not self._red_active:
+                log.debug('green led on')
+                self._green_active = True
+                self._green_off = time.monotonic() + self._green_timeout
+                self._switch('_led_green', 'green', True)
+                if self._scheduler:
+                    self._scheduler.call_at(self._green_off, self._clear_green)
+            return self._green_active
+
+    def _clear_green(self):
+        with self._lock:
+            if self._green_active:
+                log.debug('green led off')
+                self._green_active = False
+                self._write('_led_green', 'green', False)
+
+    def _clear_red(self):
+        with self._lock:
+            if self._red_active:
+                log.debug('red led off')
+                self._red_active = False
+                self._write('_led_red', 'red', False)
 
     def clear_leds(self):
-        timeout_green = self._green_datetime + datetime.timedelta(seconds=self._green_timeout)
-        if self._green_active and (timeout_green < datetime.datetime.now()):
-            log.debug('green led off')
-            self._green_active = False
-            if MACHINE in RASPI:
-                try:
-                    self._led_green.off()
-                except:
-                    log.warning('green led off gpio fail on [{}]'.format(self._led_green))
-        timeout_red = self._red_datetime + datetime.timedelta(seconds=self._red_timeout)
-        if self._red_active and (timeout_red < datetime.datetime.now()):
-            log.debug('red led off')
-            self._red_active = False
-            if MACHINE in RASPI:
-                try:
-                    self._led_red.off()
-                except:
-                    log.warning('red led off gpio fail on [{}]'.format(self._led_red))
+        """ turn off leds after timeout (polled when there is no scheduler) """
+        if not self._scheduler:
+            now = time.monotonic()
+            if self._green_active and self._green_off < now:
+                self._clear_green()
+            if self._red_active and self._red_off < now:
+                self._clear_red()
         return [self._red_active, self._green_active]
 
 
@@ -82,7 +105,7 @@ if __name__ == "__main__":
     # simple explore test
     logging.basicConfig()
     logging.getLogger().setLevel(logging.DEBUG)
-    led_data = {'red_gpio': '20', 'red_timeout': '2', 'green_gpio': '21', 'green_timeout': '3'}
+    led_data = {'red_gpio': 20, 'red_timeout': 2.0, 'green_gpio': 21, 'green_timeout': 3.0}
     led = Leds(led_data)
     led.activate_green()
     time.sleep(1)
@@ -1,25 +1,110 @@
-__version__ = '1.0.0'
+__version__ = '1.1.0'
 
+import atexit
+import json
 import logging
+import logging.handlers
 import platform
+import queue
 
+_FORMAT = '%(asctime)s %(name)s\t%(levelname)s\t %(message)s'
+_listener = None  # QueueListener writing records on its own thread
+_hot_paths = []
 
-def setup(log_file, mode='a'):
-    """start logging to file, write version and platform"""
-    logging.basicConfig(filename=log_file,
-                        format='%(asctime)s %(name)s\t%(levelname)s\t %(message)s',
-                        filemode=mode,  # w = write / a = append
-                        level=logging.INFO)
+
+class JsonFormatter(logging.Formatter):
+    """one json object per line"""
+
+    def format(self, record):
+        line = {'time': round(record.created, 3),
+                'name': record.name,
+                'level': record.levelname,
+                'message': record.getMessage()}
+        if record.exc_info:
+            line['exc'] = self.formatException(record.exc_info)
+        return json.dumps(line)
+
+
+class HotPath:
+    """level flags of a logger for per frame code, refreshed by level(): 'if hot.debug: log.debug(...)'"""
+
+    def __init__(self, log):
+        self._log = log
+        self.refresh()
+        _hot_paths.append(self)
+
+    def refresh(self):
+        self.debug = self._log.isEnabledFor(logging.DEBUG)
+        self.info = self._log.isEnabledFor(logging.INFO)
+
+
+def _file_handler(log_file, mode, rotate, max_bytes, backup_count, when):
+    if rotate == 'size':
+        return logging.handlers.RotatingFileHandler(log_file, mode, max_bytes, backup_count)
+    if rotate == 'time':
+        return logging.handlers.TimedRotatingFileHandler(log_file, when, backupCount=backup_count)
+    if rotate:
+        raise ValueError('invalid log rotation "{}"'.format(rotate))
+    return logging.FileHandler(log_file, mode)
+
+
+def setup(log_file, mode='a', queued=False, rotate='', max_bytes=1048576, backup_count=5, when='midnight',
+          json_lines=False):
+    """start logging to file (replacing previous setup), write version and platform
+    queued: records go through a queue, file written by a listener thread
+    rotate: '' (single file), 'size' (max_bytes) or 'time' (when, ex: midnight), keeping backup_count files
+    """
+    global _listener
+    handler = _file_handler(log_file, mode, rotate, max_bytes, backup_count, when)  # w = write / a = append
+    handler.setFormatter(JsonFormatter() if json_lines else logging.Formatter(_FORMAT))
+    root = logging.getLogger()
+    if _listener:
+        _listener.stop()
+        _listener = None
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+        old.close()
+    if queued:
+        records = queue.Queue(-1)
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        handler = logging.handlers.QueueHandler(records)
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
     logging.info("starting logger on platform {}".format(platform.machine()))
 
 
+def options(global_data):
+    """setup() keyword arguments from typed [GLOBAL] section"""
+    return {'queued': global_data.get('log_queue', False),
+            'rotate': global_data.get('log_rotate', ''),
+            'max_bytes': global_data.get('log_max_bytes', 1048576),
+            'backup_count': global_data.get('log_backup_count', 5),
+            'when': global_data.get('log_when', 'midnight'),
+            'json_lines': global_data.get('log_json', False)}
+
+
 def level(log_type):
     logging.getLogger().setLevel(logging.INFO)
     logging.info('changing log level to {}'.format(log_type))
     logging.getLogger().setLevel(log_type)
+    for hot in _hot_paths:
+        hot.refresh()
+
+
+def stop():
+    """flush queued records (at exit)"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop)
 
 
 if __name__ == '__main__':
-    setup('logger.log')
+    setup('logger.log', queued=True, rotate='size', max_bytes=4096, backup_count=2)
     level(logging.DEBUG)
-    logging.info('*tester'*8)
+    for n in range(100):
+        logging.info('*tester %d', n)
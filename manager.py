@@ -1,13 +1,20 @@
 import datetime
 import cv2
 import logging
+import signal
 import sys
+import time
 
+import archive
+import compositor
 import display
-import camera
 import buzzer
+import lane
 import leds
-import stats
+import metrics
+import report
+import scheduler
+import timing
 
 # colors
 white_color = (255, 255, 255)
@@ -20,182 +27,348 @@ beacon_color = (0, 255, 0)
 light_color = (238, 255, 170)
 low_color = (102, 128, 0)
 
+# text styles (font, scale, color, thickness) drawn in order
+data_style = ((cv2.FONT_HERSHEY_DUPLEX, 1.2, black_color, 3), (cv2.FONT_HERSHEY_DUPLEX, 1.2, white_color, 1))
+label_style = ((cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1),)
+value_style = ((cv2.FONT_HERSHEY_DUPLEX, 1.4, white_color, 1),)
+
 log = logging.getLogger(__name__)
 
 
 class App:
     """ Manage raspi APP """
 
-    def __init__(self, camera_data, display_data, led_data, buzzer_data, random_data, version, port):
+    def __init__(self, camera_data, display_data, led_data, buzzer_data, random_data, version, port,
+                 window=True, gpio=True, source=None, headless=False, metrics_data=None, lanes_data=None,
+                 archive_data=None, config_watcher=None, report_data=None):
         log.info('starting APP version "{}"'.format(version))
+        startup = timing.Startup()
         try:
-            self.display = display.Display()
-            self.cam = camera.Camera(camera_data)
-            self._led_manager = leds.Leds(led_data)
-            self._buzzer = buzzer.Buzzer(buzzer_data)
-            self._stats = stats.Stats(random_data)
+            self._diagnostics = display_data.get('diagnostics', False)
+            self.timings = timing.Timings(display_data.get('timing_samples', 1000), self._diagnostics)
+            self._timing_dumper = timing.Dumper(self.timings, display_data.get('timing_file', ''),
+                                                display_data.get('timing_interval', 60.0))
+            lanes_data = lanes_data or [('CAMERA', {})]
+            self._archive_counted = bool(archive_data and archive_data.get('enabled', False) and
+                                         archive_data.get('counted', False))  # lanes keep counted bag frames
+            self._lanes = []
+            for n, (name, lane_camera, lane_display, lane_random) in enumerate(
+                    lane.lane_sections(camera_data, display_data, random_data, lanes_data)):
+                timings = self.timings if len(lanes_data) == 1 else timing.Prefixed(self.timings, '{}:'.format(n + 1))
+                self._lanes.append(lane.Lane(name, lane_camera, lane_display, lane_random, source, timings,
+                                             lanes_data[n][1], self._archive_counted))
+            self._stats = lane.Totals(self._lanes)
+            startup.step('lanes')  # cameras warm up on their own threads from here
+            self._headless = headless
+            self.display = None if headless else display.Display()  # no HighGUI at all when headless
+            self._scheduler = scheduler.Scheduler()  # led / buzzer timeouts off the frame loop
+            self._led_manager = leds.Leds(led_data, gpio, self._scheduler)
+            self._buzzer = buzzer.Buzzer(buzzer_data, gpio, self._scheduler)
+            startup.step('gpio')
+            self._window = window and not headless
+            self._running = True
             self._software_version = version
-            self._start_time = datetime.datetime.now()
-            self._time_min_delta = datetime.timedelta(seconds=float(display_data['time_min_delta']))
-            self._beam_position = list(int(val) for val in display_data['beam_position'].split(','))  # x1, y1, x2, y2
-            self._beam_dead_zone = int(display_data['beam_dead_zone'])
-            self._height = int(display_data['image_height'])
-            self._width = int(display_data['image_width'])
-            self._bag_select = float(display_data['bag_select'])
+            self._height = display_data['image_height']
+            self._width = display_data['image_width']
+            self._bag_select = display_data['bag_select']
+            self._ui_rate = timing.Rate(display_data.get('display_fps', 0))  # overlay + imshow, 0 = every frame
+            self._stepped = False
             self._image_template = display_data['image_template']
             self._image_bag = display_data['image_bag']
+            self._compositor = None  # overlay never drawn headless: no assets, layers or frame buffers
+            if not headless:
+                self._compositor = compositor.Compositor(self._width, self._height, self._image_template,
+                                                         camera_data.get('buffer_pool', False))
+                self._data_layer = self._compositor.layer(roi=(0, 380, self._width, self._height))
+                self._stats_layer = self._compositor.layer()
+                self._diag_layer = self._compositor.layer()
+                self._status_layer = self._compositor.layer()
+                startup.step('compositor')
             self._port = port
+            self._up_time = time.time()
+            self._metrics = None
+            if metrics_data and metrics_data.get('enabled', False):
+                try:
+                    self._metrics = metrics.MetricsServer(metrics_data.get('bind', '0.0.0.0'),
+                                                          metrics_data.get('port', 8080))
+                except OSError as ex:  # port in use, bad bind address: counting goes on without endpoint
+                    log.error('metrics endpoint not started {}'.format(ex))
+                self._metrics_interval = metrics_data.get('interval', 1.0)
+                self._metrics_next = 0.0
+            self._config_watcher = config_watcher
+            self._archive = archive.from_config(archive_data)
+            self._report = report.from_config(report_data)
+            if self._report:
+                for ln in self._lanes:
+                    ln.stats.subscribe(self._report.listener(ln.name))
+            startup.step('services')
             self._bag_datetime = datetime.datetime.now()
-            self._mode_name = ['RUN', 'VIEW']
+            if len(self._lanes) == 1:
+                self._mode_name = ['RUN', 'VIEW']
+            else:
+                self._mode_name = ['RUN'] + ['VIEW{}'.format(n + 1) for n in range(len(self._lanes))]
             self._mode_active = 0
             self._frame = None
             self._freeze = None
             self._alarm = False
+            self._alarm_lane = None
             self._stats_active = False
-            self._scanner = 0
+            self._diag_active = False
+            self._scanner = 0  # scanner line offset, 0 = off
+            self._scanner_start = 0.0
             self._ack = False
-            self.mark = False
         except ValueError as ex:
             msg = 'error reading camera_data {}. Aborting!'.format(ex)
             log.error(msg)
             sys.exit(msg)
 
+        if self._compositor:
+            self._draw_labels()
+
+        if len(self._lanes) > 1:
+            log.info('{} lanes: {}'.format(len(self._lanes), ', '.join(ln.name for ln in self._lanes)))
+            for ln in self._lanes:
+                ln.start()
+
+        if self._headless:
+            log.info('headless mode, stop with SIGTERM / SIGINT')
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
         # start display
-        self.display.window = 'ANACASE {}'.format(self._software_version)
-        self.display.add_window_properties(cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-        cv2.setMouseCallback(self.display.window, self._mouse_clicks)
+        if self._window:
+            self.display.window = 'ANACASE {}'.format(self._software_version)
+            self.display.add_window_properties(cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+            cv2.setMouseCallback(self.display.window, self._mouse_clicks)
+        startup.step('window')
+        self._startup = startup
+        self._ready = False
+        log.info('startup {}'.format(startup))
+
+    def _draw_labels(self):
+        """draw static labels (blended once on background)"""
+        labels = self._compositor.layer(static=True)
+        labels.clear('labels')
+        labels.put_text('bag counter', (50, 412), cv2.FONT_HERSHEY_PLAIN, 1, light_color, 1)
+        labels.put_text('bag selected', (170, 412), cv2.FONT_HERSHEY_PLAIN, 1, light_color, 1)
+        labels.put_text('selected %', (290, 412), cv2.FONT_HERSHEY_PLAIN, 1, light_color, 1)
+        labels.put_text('mode', (410, 412), cv2.FONT_HERSHEY_PLAIN, 1, light_color, 1)
+        labels.put_text('time', (730, 412), cv2.FONT_HERSHEY_PLAIN, 1, light_color, 1)
+        labels.put_text('v{}'.format(self._software_version), (700, 472), cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1)
+
+    @property
+    def stats(self):
+        """totals of all lanes"""
+        return self._stats
+
+    @property
+    def cam(self):
+        """camera of lane on view (first lane on RUN mode)"""
+        return self._view_lane.cam
+
+    @property
+    def ready(self):
+        """all cameras open and warmed up"""
+        return all(ln.cam.ready.is_set() for ln in self._lanes)
+
+    @property
+    def _view_lane(self):
+        return self._lanes[max(0, self._mode_active - 1) if len(self._lanes) > 1 else 0]
 
     def draw_data(self):
         """draw data on display"""
-        cv2.putText(self._frame, 'bag counter', (50, 412),
-                    cv2.FONT_HERSHEY_PLAIN, 1, light_color, 1)
-        cv2.putText(self._frame, '{:04d}'.format(self._stats.counter), (50, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, black_color, 3)
-        cv2.putText(self._frame, '{:04d}'.format(self._stats.counter), (50, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, white_color, 1)
-        cv2.putText(self._frame, 'bag selected', (170, 412),
-                    cv2.FONT_HERSHEY_PLAIN, 1, light_color, 1)
-        cv2.putText(self._frame, '{:04d}'.format(self._stats.sampled), (170, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, black_color, 3)
-        cv2.putText(self._frame, '{:04d}'.format(self._stats.sampled), (170, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, white_color, 1)
-        cv2.putText(self._frame, 'selected %', (290, 412),
-                    cv2.FONT_HERSHEY_PLAIN, 1, light_color, 1)
-        cv2.putText(self._frame, '{:4.1f}'.format(self._stats.percentage), (290, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, black_color, 3)
-        cv2.putText(self._frame, '{:4.1f}'.format(self._stats.percentage), (290, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, white_color, 1)
-        cv2.putText(self._frame, 'mode', (410, 412),
-                    cv2.FONT_HERSHEY_PLAIN, 1,light_color, 1)
-        cv2.putText(self._frame, self._mode_name[self._mode_active], (410, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, black_color, 3)
-        cv2.putText(self._frame, self._mode_name[self._mode_active], (410, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, white_color, 1)
-        cv2.putText(self._frame, 'time', (730, 412),
-                    cv2.FONT_HERSHEY_PLAIN, 1, light_color, 1)
-        cv2.putText(self._frame, datetime.datetime.now().strftime("%H:%M:%S"), (600, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, black_color, 3)
-        cv2.putText(self._frame, datetime.datetime.now().strftime("%H:%M:%S"), (600, 446),
-                    cv2.FONT_HERSHEY_DUPLEX, 1.2, white_color, 1)
-        cv2.putText(self._frame, 'v{}'.format(self._software_version), (700, 472),
-                    cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1)
-
-    def compute_img(self):
-        """See if objects pass beam"""
-        self._frame = cv2.imread(self._image_template, cv2.IMREAD_ANYCOLOR)             # read background image
+        data = ('{:04d}'.format(self._stats.counter),
+                '{:04d}'.format(self._stats.sampled),
+                '{:4.1f}'.format(self._stats.percentage),
+                self._mode_name[self._mode_active],
+                datetime.datetime.now().strftime("%H:%M:%S"))
+        for n, (text, x) in enumerate(zip(data, (50, 170, 290, 410, 600))):  # redraw only changed values
+            self._data_layer.put_field(n, text, (x, 446), data_style)
+        self._data_layer.apply(self._frame)
+
+    def count_objects(self):
+        """detect and count on inline lane, then pick up bags counted by all lanes"""
+        if len(self._lanes) == 1:
+            self._stepped = self._lanes[0].step()
+        for ln in self._lanes:
+            while ln.bags:
+                counter, frame = ln.bags.popleft()
+                self._new_bag()
+                if self._archive_counted:
+                    self._archive.submit(frame, ln.name, 'counted', counter, copied=True)
+        return self._view_lane.result
+
+    def compute_img(self, render=True):
+        """See if objects pass beam and draw them (render: UI refresh due)"""
+        objects, centers, ids = self.count_objects()
+        if self._headless or not render:                                                # nothing to draw
+            return
+        with self.timings.stage('draw'):
+            self._draw(objects, centers, ids)
+
+    def _draw(self, objects, centers, ids):
         if self._mode_active:                                                           # VIEW MODE
-            self._frame = cv2.add(self._frame, self.cam.frame)                          # add camera live view
-            if (self._start_time + self._time_min_delta) < datetime.datetime.now():     # test if timeout
-                cv2.line(self._frame, (self._beam_position[0], self._beam_position[1]),  # draw green line threshold
-                         (self._beam_position[2], self._beam_position[3]), green_color, 2)
+            view = self._view_lane
+            beam = view.beam_position
+            self._frame = self._compositor.compose(view.cam.frame)                      # background + live view
+            if view.beam_ready:                                                         # test if timeout
+                cv2.line(self._frame, (beam[0], beam[1]), (beam[2], beam[3]), green_color, 2)  # green line threshold
             else:
-                cv2.line(self._frame, (self._beam_position[0], self._beam_position[1]),  # draw red line threshold
-                         (self._beam_position[2], self._beam_position[3]), red_color, 2)
-        self.draw_data()                                                                # draw info text
-        for id_, obj in enumerate(self.cam.objects, 1):
-            M = cv2.moments(obj)
-            centro = (int(M['m10'] / M['m00']), int(M['m01'] / M['m00']))               # calc contour center (x,y)
-            if self._mode_active:                                                       # VIEW MODE
-                cv2.line(self._frame, centro, centro, green_color, 3)                   # draw contours centroid
-                (x, y, w, h) = cv2.boundingRect(obj)
-                cv2.rectangle(self._frame, (x, y), (x + w, y + h), green_color, 1)      # draw contours in objects
+                cv2.line(self._frame, (beam[0], beam[1]), (beam[2], beam[3]), red_color, 2)  # red line threshold
+            boxes = zip(objects['x'].tolist(), objects['y'].tolist(), objects['w'].tolist(), objects['h'].tolist())
+            for id_, (x, y, w, h), centro in zip(ids, boxes, centers):
+                cv2.line(self._frame, centro, centro, green_color, 3)                   # draw objects centroid
+                cv2.rectangle(self._frame, (x, y), (x + w, y + h), green_color, 1)      # draw objects box
                 cv2.putText(self._frame, str(id_), centro, cv2.FONT_HERSHEY_PLAIN, 1, green_color, 1)
-            # test if time as passed from last detection
-            if (self._start_time + self._time_min_delta) < datetime.datetime.now():
-                # test if center of object is before beam position
-                if self._beam_position[1] - self._beam_dead_zone <= centro[1] <= self._beam_position[3]\
-                        and self._beam_position[0] <= centro[0] <= self._beam_position[2]:
-                    self.mark = True
-                # test if center of object is before beam position
-                if self.mark and self._beam_position[1] <= centro[1] <= self._beam_position[3] + self._beam_dead_zone\
-                        and self._beam_position[0] <= centro[0] <= self._beam_position[2]:
-                    self._stats.inc_counter()
-                    log.debug("new bag detected. id={:03d} ".format(self._stats.counter))
-                    self._start_time = datetime.datetime.now()
-                    self._led_manager.activate_green()
-                    self._scanner = 1
-
-            if (self._start_time + self._time_min_delta) > datetime.datetime.now():
-                self.mark = False
-                if self._scanner > 0:
-                    try:
-                        bag = cv2.imread(self._image_bag)
-                        self._frame = cv2.add(self._frame, bag)
-                    except cv2.error:
-                        log.error('error loading image "{}"'.format(self._image_bag))
-                    self._frame = cv2.line(self._frame, (270, 200 + self._scanner), (440, 200 + self._scanner),
-                                           green_color, 2)
-                    self._scanner += 10
-                if self._scanner > 100:
-                    self._scanner = 0
+        else:
+            self._frame = self._compositor.compose()                                    # cached background
+        if not self._ready:                                                             # warming up screen
+            text = 'warming up camera' + '.' * (int(self._startup.elapsed) % 4)
+            if self._status_layer.changed(text):
+                self._status_layer.clear(text)
+                self._status_layer.put_text(text, (250, 240), cv2.FONT_HERSHEY_DUPLEX, 1.0, white_color, 1)
+            self._status_layer.apply(self._frame)
+        self.draw_data()                                                                # draw info text
+        if self._scanner > 0:                                                           # scanner animation
+            # moves with time, not with redraws (display_fps): 200 px/s, 10 px per frame at 20 fps
+            self._scanner = 1 + int((time.monotonic() - self._scanner_start) * 200)
+        if self._scanner > 100:
+            self._scanner = 0
+        if self._scanner > 0:
+            bag = self._compositor.image(self._image_bag)
+            if bag is not None:
+                self._frame = cv2.add(self._frame, bag, dst=self._frame)
+            self._frame = cv2.line(self._frame, (270, 200 + self._scanner), (440, 200 + self._scanner),
+                                   green_color, 2)
+
+    def _new_bag(self):
+        """bag counted by a lane, start scanner animation"""
+        self._led_manager.activate_green()
+        self._scanner = 1
+        self._scanner_start = time.monotonic()
 
     def show_stats(self):
-        if self._stats_active:
-            t = self._stats.counter_by_time
-            cv2.putText(self._frame, 'bag counter on last 5/15/60 min.', (50, 90),
-                        cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1)
-            cv2.putText(self._frame, '{:04d}/{:04d}/{:04d}'.format(t['min5'], t['min15'], t['min60']), (50, 130),
-                        cv2.FONT_HERSHEY_DUPLEX, 1.4, white_color, 1)
-            t = self._stats.selected_by_time
-            cv2.putText(self._frame, 'bag selected on last 5/15/60 min.', (50, 170),
-                        cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1)
-            cv2.putText(self._frame, '{:04d}/{:04d}/{:04d}'.format(t['min5'], t['min15'], t['min60']), (50, 210),
-                        cv2.FONT_HERSHEY_DUPLEX, 1.4, white_color, 1)
-            cv2.putText(self._frame, 'first bag seen on', (50, 250),
-                        cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1)
-            cv2.putText(self._frame, self._stats.first_counter.strftime("%d/%m %H:%M:%S"), (50, 290),
-                        cv2.FONT_HERSHEY_DUPLEX, 1.4, white_color, 1)
-            cv2.putText(self._frame, 'operator ack counter', (50, 330),
-                        cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1)
-            cv2.putText(self._frame, '{:04d}'.format(self._stats.ack), (50, 370),
-                        cv2.FONT_HERSHEY_DUPLEX, 1.4, white_color, 1)
-            cv2.putText(self._frame, 'id', (400, 330),
-                        cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1)
-            cv2.putText(self._frame, '{}'.format(self._port), (400, 370),
-                        cv2.FONT_HERSHEY_DUPLEX, 1.4, white_color, 1)
-            cv2.putText(self._frame, 'v{}'.format(self._software_version), (700, 472),
-                        cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1)
+        if self._stats_active and not self._headless:
+            counter = self._stats.counter_by_time
+            selected = self._stats.selected_by_time
+            data = ('/'.join('{:04d}'.format(counter['min{}'.format(w)]) for w in self._stats.windows),
+                    '/'.join('{:04d}'.format(selected['min{}'.format(w)]) for w in self._stats.windows),
+                    self._stats.first_counter.strftime("%d/%m %H:%M:%S"),
+                    '{:04d}'.format(self._stats.ack))
+            if self._stats_layer.changed(data):  # redraw only values that changed
+                self._stats_layer.key = data
+                windows = '/'.join(str(w) for w in self._stats.windows)
+                fields = (('bag counter on last {} min.'.format(windows), (50, 90), label_style),
+                          (data[0], (50, 130), value_style),
+                          ('bag selected on last {} min.'.format(windows), (50, 170), label_style),
+                          (data[1], (50, 210), value_style),
+                          ('first bag seen on', (50, 250), label_style),
+                          (data[2], (50, 290), value_style),
+                          ('operator ack counter', (50, 330), label_style),
+                          (data[3], (50, 370), value_style),
+                          ('id', (400, 330), label_style),
+                          ('{}'.format(self._port), (400, 370), value_style),
+                          ('v{}'.format(self._software_version), (700, 472), label_style))
+                for n, (text, org, style) in enumerate(fields):
+                    self._stats_layer.put_field(n, text, org, style)
+            self._stats_layer.apply(self._frame)
+
+    def show_diagnostics(self):
+        """draw stage latencies page"""
+        if self._diag_active and not self._headless:
+            now = int(time.time())
+            if self._diag_layer.changed(now):  # refresh once per second
+                self._diag_layer.clear(now)
+                self._diag_layer.put_text('stage latency p50/p95/p99 ms - {:.1f} fps'.format(self.timings.fps),
+                                          (50, 90), cv2.FONT_HERSHEY_PLAIN, 1.2, low_color, 1)
+                for row, stage in enumerate(self.timings.stages[:9]):
+                    y = 125 + row * 28
+                    self._diag_layer.put_text(stage.name, (50, y), cv2.FONT_HERSHEY_PLAIN, 1.4, white_color, 1)
+                    for x, value in zip((220, 300, 380), stage.percentiles(50, 95, 99)):
+                        self._diag_layer.put_text('{:6.1f}'.format(value), (x, y), cv2.FONT_HERSHEY_PLAIN, 1.4,
+                                                  white_color, 1)
+            self._diag_layer.apply(self._frame)
 
     def case_for_review(self):
         """Detect if object is for review"""
-        if self._stats.is_selected() and not self._alarm:
+        selected = next((ln for ln in self._lanes if ln.selected), None)
+        if selected and not self._alarm:
             self._bag_datetime = datetime.datetime.now()
             self._alarm = True
-            self._freeze = self.cam.frame
+            self._alarm_lane = selected
+            counter, self._freeze = selected.selected.popleft()
+            if self._archive:
+                self._archive.submit(self._freeze, selected.name, 'selected', counter, copied=True)  # read only
             self._led_manager.activate_red()
             self._buzzer.activate_buzzer()
-        if self._alarm:
-            self._frame = cv2.add(self._frame, self._freeze)
-            self._frame = cv2.rectangle(self._frame, (385, 36), (515, 62), red_color, -1)
-            self._frame = cv2.putText(self._frame, 'SNAPSHOT', (400, 54), cv2.FONT_HERSHEY_DUPLEX, 0.6, white_color)
         timeout = self._bag_datetime + datetime.timedelta(seconds=self._bag_select)  # clear image after timeout
         if self._alarm and (timeout < datetime.datetime.now()):
-            log.debug('reset review alarm at {}'.format(datetime.datetime.now()))
+            log.debug('reset review alarm at %s', datetime.datetime.now())
             self._alarm = None
         if self._ack and self._alarm:
             self._alarm = None
             self._ack = False
-            self._stats.inc_ack()
+            self._alarm_lane.inc_ack()
+
+    def _draw_review(self):
+        """selected bag snapshot over frame"""
+        if self._alarm and not self._headless:
+            self._frame = cv2.add(self._frame, self._freeze, dst=self._frame)
+            self._frame = cv2.rectangle(self._frame, (385, 36), (515, 62), red_color, -1)
+            self._frame = cv2.putText(self._frame, 'SNAPSHOT', (400, 54), cv2.FONT_HERSHEY_DUPLEX, 0.6, white_color)
+
+    def status(self):
+        """snapshot of counters and pipeline health (new dict)"""
+        now = time.time()
+        timings = self.timings.summary()
+        lanes = {}
+        for ln in self._lanes:
+            with ln.lock:
+                lanes[ln.name] = {'counter': ln.stats.counter, 'sampled': ln.stats.sampled, 'ack': ln.stats.ack}
+            lanes[ln.name].update({
+                'fps': round(ln.timings.fps, 1),
+                'frame_age_seconds': round(now - ln.cam.frame_time, 3) if ln.cam.frame_time else -1,
+                'detection_lag_frames': ln.cam.frame_seq - ln.cam.detection_seq})
+        return {'device': self._port,
+                'version': self._software_version,
+                'time': round(now, 3),
+                'uptime_seconds': round(now - self._up_time, 1),
+                'ready': self._ready,
+                'counter': self._stats.counter,
+                'sampled': self._stats.sampled,
+                'percentage': self._stats.percentage,
+                'ack': self._stats.ack,
+                'loop_sample': self._stats.loop_sample,
+                'counter_by_time': self._stats.counter_by_time,
+                'selected_by_time': self._stats.selected_by_time,
+                'first_counter': self._stats.first_counter.isoformat(),
+                'fps': timings['fps'],
+                'frame_age_seconds': max(val['frame_age_seconds'] for val in lanes.values()),
+                'detection_lag_frames': max(val['detection_lag_frames'] for val in lanes.values()),
+                'lanes': lanes,
+                'archive_written': self._archive.written if self._archive else 0,
+                'archive_dropped': self._archive.dropped if self._archive else 0,
+                'report_rows': self._report.written if self._report else 0,
+                'stages': dict((name, {'p50_ms': val['p50_ms'], 'p95_ms': val['p95_ms'], 'p99_ms': val['p99_ms']})
+                               for name, val in timings['stages'].items())}
+
+    def _publish_status(self):
+        if self._metrics and time.time() >= self._metrics_next:
+            self._metrics_next = time.time() + self._metrics_interval
+            self._metrics.publish(self.status())
+
+    def _tune(self):
+        """apply config changes queued by the watcher: lane own section, or [CAMERA] / [DISPLAY] if not overridden"""
+        if not self._config_watcher:
+            return
+        while not self._config_watcher.changes.empty():
+            section, name, value = self._config_watcher.changes.get_nowait()
+            for ln in self._lanes:
+                if section == ln.name or (section in ('CAMERA', 'DISPLAY') and name not in ln.overrides):
+                    try:
+                        ln.tune(name, value)
+                    except ValueError as ex:
+                        log.error('tuning lane {} failed: {}'.format(ln.name, ex))
 
     @staticmethod
     def _wait_keypress():
@@ -212,23 +385,27 @@ class App:
         menu = {'mode': (23, 80), 'cal': (64, 150), 'reset': (184, 240),
                 'stats': (253, 285), 'quit': (300, 360)}
         if event == cv2.EVENT_LBUTTONDOWN:
-            log.debug('mouse clicked at {}x{}'.format(x, y))
+            log.debug('mouse clicked at %sx%s', x, y)
             if x >= 600:
                 if menu['mode'][0] < y < menu['mode'][1]:
                     self._mode_active += 1
                     if self._mode_active >= len(self._mode_name):
                         self._mode_active = 0
-                    log.debug('mode selected "{}"'.format(self._mode_name[self._mode_active]))
+                    log.debug('mode selected "%s"', self._mode_name[self._mode_active])
                 elif menu['cal'][0] < y < menu['cal'][1]:
-                    self.cam.first_frame = None
+                    for ln in self._lanes:
+                        ln.cam.recalibrate()
                     log.debug('click on calibration')
                 elif menu['reset'][0] < y < menu['reset'][1]:
                     log.debug('click on reset')
                     self._stats.reset()
                 elif menu['stats'][0] < y < menu['stats'][1]:
                     log.debug('click on stats')
-                    if self._stats_active:
+                    if self._stats_active:  # stats -> diagnostics (if enabled) -> off
                         self._stats_active = False
+                        self._diag_active = self._diagnostics
+                    elif self._diag_active:
+                        self._diag_active = False
                     else:
                         self._stats_active = True
                 elif menu['quit'][0] < y < menu['quit'][1]:
@@ -238,15 +415,60 @@ class App:
                 self._ack = True
 
     def run(self):
-        self.compute_img()
-        self.case_for_review()
-        self.show_stats()
-        self._led_manager.clear_leds()
-        self._buzzer.stop_buzzer()
-        self.display.update(self._frame)
-        return App._wait_keypress()
+        if not self._ready and self.ready:
+            self._ready = True
+            log.info('ready {:.2f}s after start'.format(self._startup.elapsed))
+        render = not self._headless and self._ui_rate.due()  # detection every frame, overlay at display_fps
+        self.compute_img(render)
+        with self.timings.stage('review'):
+            self.case_for_review()
+            if render:
+                self._draw_review()
+        if render:
+            with self.timings.stage('stats'):
+                self.show_stats()
+                self.show_diagnostics()
+        self.timings.tick()
+        self._tune()
+        self._publish_status()
+        for ln in self._lanes:
+            if ln.failed:
+                log.error('lane {} failed. Quiting!'.format(ln.name))
+                return False
+        if not self._window or not render:
+            if (self._headless or self._window) and self._idle:
+                time.sleep(0.002)  # no waitKey to pace the loop, wait for next camera frame
+            return self._running
+        with self.timings.stage('display'):
+            self.display.update(self._frame)
+        with self.timings.stage('waitkey'):
+            return App._wait_keypress() and self._running
+
+    @property
+    def _idle(self):
+        """nothing new on this loop: lanes on own threads, or inline lane waiting for a frame / detect_fps"""
+        return len(self._lanes) > 1 or not self._stepped or not self.cam.new_frame
+
+    def _stop(self, signum, frame):
+        log.info('signal {} received. Quiting!'.format(signum))
+        self._running = False
+
+    def release(self):
+        """stop lanes and release cameras, stores and endpoint"""
+        for ln in self._lanes:
+            ln.close()
+        self._scheduler.close()
+        self._timing_dumper.close()
+        if self._config_watcher:
+            self._config_watcher.stop()
+        if self._archive:
+            self._archive.close()
+        if self._report:
+            self._report.close()
+        if self._metrics:
+            self._metrics.close()
 
     def close(self):
-        self.cam.close()
+        self.release()
         log.info('ending APP')
         sys.exit(0)
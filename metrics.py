@@ -0,0 +1,109 @@
+"""Status / metrics http endpoint (prometheus text and json), served from a snapshot"""
+
+import json
+import logging
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+log = logging.getLogger(__name__)
+
+
+def _escape(value):
+    """ label value escaped as the exposition format requires (backslash, double quote, line feed) """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus(snapshot):
+    """ snapshot dict as prometheus text exposition format """
+    device = snapshot.get('device', '')
+    lines = ['# TYPE anacase_info gauge',
+             'anacase_info{{device="{}",version="{}"}} 1'.format(_escape(device), _escape(snapshot.get('version', '')))]
+
+    def gauge(name, value, **labels):
+        labels['device'] = device
+        text = ','.join('{}="{}"'.format(key, _escape(val)) for key, val in sorted(labels.items()))
+        lines.append('anacase_{}{{{}}} {}'.format(name, text, int(value) if isinstance(value, bool) else value))
+
+    for name in ('ready', 'counter', 'sampled', 'ack', 'loop_sample', 'uptime_seconds', 'fps', 'frame_age_seconds',
+                 'detection_lag_frames', 'archive_written', 'archive_dropped', 'report_rows'):
+        if name in snapshot:
+            lines.append('# TYPE anacase_{} gauge'.format(name))
+            gauge(name, snapshot[name])
+    for name in ('counter_by_time', 'selected_by_time'):
+        lines.append('# TYPE anacase_{} gauge'.format(name))
+        for window, value in sorted(snapshot.get(name, {}).items()):
+            gauge(name, value, window=window)
+    lanes = snapshot.get('lanes', {})
+    for name in ('counter', 'sampled', 'ack', 'fps', 'frame_age_seconds', 'detection_lag_frames'):
+        if lanes:
+            lines.append('# TYPE anacase_lane_{} gauge'.format(name))
+        for lane, values in sorted(lanes.items()):
+            gauge('lane_' + name, values[name], lane=lane)
+    lines.append('# TYPE anacase_stage_latency_ms gauge')
+    for stage, values in snapshot.get('stages', {}).items():
+        for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+            gauge('stage_latency_ms', values[key], stage=stage, quantile=quantile)
+    return '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        snapshot = self.server.snapshot  # never touch App state, only the published snapshot
+        if self.path.split('?')[0] == '/metrics':
+            self._reply(prometheus(snapshot), 'text/plain; version=0.0.4')
+        elif self.path.split('?')[0] in ('/', '/status', '/status.json'):
+            self._reply(json.dumps(snapshot), 'application/json')
+        else:
+            self.send_error(404)
+
+    def _reply(self, text, content_type):
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        log.debug('%s - ' + fmt, self.address_string(), *args)
+
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MetricsServer:
+    """ Serve the last published snapshot on its own thread """
+
+    def __init__(self, bind='0.0.0.0', port=8080):
+        self._server = _Server((bind, port), _Handler)
+        self._server.snapshot = {}
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+        log.info('metrics endpoint on http://{}:{}/metrics'.format(bind, self._server.server_address[1]))
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def publish(self, snapshot):
+        """ replace snapshot (a new dict, never modified after publish) """
+        self._server.snapshot = snapshot
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        log.debug('metrics endpoint closed')
+
+
+if __name__ == '__main__':
+    # simple explore test
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG)
+    server = MetricsServer('127.0.0.1', 8080)
+    server.publish({'device': 'TEST', 'version': '0', 'counter': 1, 'counter_by_time': {'min5': 1}})
+    input('http://127.0.0.1:8080/metrics - press enter to quit')
+    server.close()
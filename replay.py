@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+"""
+ ANACASE replay benchmark
+ ========================
+
+ Feed a recorded video (or image sequence, ex: frames/img_%04d.png) through
+ Camera and App without display or GPIO, as fast as possible, and report
+ frames/sec, per stage latency and bag count against a ground truth file.
+ Time based counting (time_min_delta) follows the video timestamps, not the replay speed.
+
+
+ usage: ./replay.py video.mp4 [-config anacase.ini] [-truth truth.txt] [-output report.json] [-headless]
+
+ ground truth file: number of bags in video (plain text) or json {"count": n}
+"""
+
+import argparse as ap
+import json
+import logging
+import time
+
+import config
+import logger
+import manager
+
+_configfile_ = 'anacase.ini'
+_logfile_ = 'replay.log'
+
+
+def get_start_arguments():
+    parser = ap.ArgumentParser(description='anacase - replay recorded video and measure performance')
+    parser.add_argument('source', help='video file or image sequence pattern')
+    parser.add_argument('-config', metavar='config_file', default=_configfile_, help='configuration file')
+    parser.add_argument('-logger', metavar='log_file', default=_logfile_, help='logger file')
+    parser.add_argument('-truth', metavar='truth_file', help='ground truth bag count')
+    parser.add_argument('-output', metavar='report_file', help='write report as json')
+    parser.add_argument('-frames', metavar='n', type=int, default=0, help='stop after n frames')
+    parser.add_argument('-realtime', action='store_true', help='pace frames at camera_fps, as a live camera')
+    parser.add_argument('-headless', action='store_true', help='skip overlay drawing, as headless mode')
+    return parser.parse_args()
+
+
+def read_truth(file_name):
+    with open(file_name) as f:
+        text = f.read().strip()
+    try:
+        return int(text)
+    except ValueError:
+        return int(json.loads(text)['count'])
+
+
+def replay(app, max_frames=0, frame_interval=0.0):
+    """ run app over all source frames, return report dict """
+    start = time.perf_counter()
+    frames = 0
+    try:
+        while not max_frames or frames < max_frames:
+            with app.timings.stage('frame'):
+                app.run()
+            frames += 1
+            if frame_interval:
+                time.sleep(max(0.0, start + frames * frame_interval - time.perf_counter()))
+    except EOFError:
+        pass
+    elapsed = time.perf_counter() - start
+    report = app.timings.summary()
+    report.update({'frames': frames, 'seconds': round(elapsed, 3),
+                   'fps': round(frames / elapsed, 1) if elapsed else 0.0})
+    return report
+
+
+def main():
+    args = get_start_arguments()
+    logger.setup(args.logger, 'w')
+    config.init(args.config)
+    settings = config.validate()
+    version = settings['GLOBAL']['version']
+    logger.setup(args.logger, **logger.options(settings['GLOBAL']))
+    logger.level(settings['GLOBAL']['log_level'])
+    camera_data = dict(settings['CAMERA'], camera_delay=0, camera_threaded=False)
+    random_data = dict(settings['STATS'], store_file='')  # never touch production store
+    # all samples kept for percentiles, no periodic dump
+    display_data = dict(settings['DISPLAY'], diagnostics=True, timing_samples=0, timing_file='')
+    app = manager.App(camera_data=camera_data,
+                      display_data=display_data,
+                      led_data=settings['LED'],
+                      buzzer_data=settings['BUZZER'],
+                      random_data=random_data,
+                      version=version,
+                      port='REPLAY',
+                      window=False, gpio=False, source=args.source, headless=args.headless)
+    interval = 1.0 / camera_data['camera_fps'] if args.realtime else 0.0
+    report = replay(app, args.frames, interval)
+    report['source'] = args.source
+    report['version'] = version
+    report['counted'] = app.stats.counter
+    if args.truth:
+        report['expected'] = read_truth(args.truth)
+        report['error'] = report['counted'] - report['expected']
+    app.release()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    logging.info('replay finished {} frames at {} fps'.format(report['frames'], report['fps']))
+
+
+if __name__ == "__main__":
+    main()
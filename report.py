@@ -0,0 +1,171 @@
+"""Throughput reports: minute, hour and shift totals of counted, selected and acked bags, appended to csv / parquet"""
+
+import csv
+import datetime
+import logging
+import os
+import threading
+import time
+
+import store
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, parquet reports only
+    pyarrow = None
+
+log = logging.getLogger(__name__)
+
+FIELDS = ('start', 'end', 'lane', 'counted', 'selected', 'acked')
+PERIODS = ('minute', 'hour', 'shift')
+_COLUMN = {store.COUNT: 0, store.SELECT: 1, store.ACK: 2}
+_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def _minute(when):
+    start = when.replace(second=0, microsecond=0)
+    return start, start + datetime.timedelta(minutes=1)
+
+
+def _hour(when):
+    start = when.replace(minute=0, second=0, microsecond=0)
+    return start, start + datetime.timedelta(hours=1)
+
+
+class Report:
+    """ Aggregates updated per event (O(1)), finished periods appended in bulk by a writer thread
+
+    one file per period and day of period start (ex: hour-20240131.csv), periods without events have no row;
+    rows of the same period and lane add up (partial period written at stop, continued after restart);
+    parquet files are readable once closed: minute and hour files after midnight, shift files once the last shift
+    started that day has ended, all files at stop
+    """
+
+    def __init__(self, folder, shifts=((6, 0), (14, 0), (22, 0)), file_format='csv', interval=60.0):
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError('invalid report format "{}"'.format(file_format))
+        if file_format == 'parquet' and pyarrow is None:
+            log.error('parquet reports need pyarrow, writing csv')
+            file_format = 'csv'
+        self._folder = folder
+        self._shifts = list(shifts) or [(0, 0)]
+        self._format = file_format
+        self._interval = interval
+        os.makedirs(folder, exist_ok=True)
+        self._bounds = {period: (None, None) for period in PERIODS}  # current (start, end) of each period
+        self._open = {period: {} for period in PERIODS}  # (start, end, lane): [counted, selected, acked]
+        self._writers = {}  # parquet file: (last period end, writer), closed once no more rows can come
+        self._lock = threading.Lock()
+        self.written = 0
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='report', daemon=True)
+        self._thread.start()
+        log.info('reports on "{}" ({}) shifts {}'.format(folder, file_format, ', '.join(
+            '{:02d}:{:02d}'.format(*shift) for shift in self._shifts)))
+
+    def _shift(self, when):
+        day = when.date()
+        starts = [datetime.datetime.combine(day + datetime.timedelta(days=delta), datetime.time(*shift))
+                  for delta in (-1, 0, 1) for shift in self._shifts]
+        start = max(start for start in starts if start <= when)
+        return start, min(end for end in starts if end > start)
+
+    def _last_end(self, period, day):
+        """ end of the last period starting on day, its file gets no more rows after that """
+        midnight = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time())
+        if period != 'shift':
+            return midnight
+        return self._shift(midnight - datetime.timedelta(microseconds=1))[1]
+
+    def listener(self, lane):
+        """ Stats.subscribe callback for the events of lane """
+        return lambda kind, ts: self.add(lane, kind, ts)
+
+    def add(self, lane, kind, ts=None):
+        when = datetime.datetime.fromtimestamp(time.time() if ts is None else ts)
+        column = _COLUMN[kind]
+        with self._lock:
+            for period, bounds in (('minute', _minute), ('hour', _hour), ('shift', self._shift)):
+                start, end = self._bounds[period]
+                if start is None or not start <= when < end:
+                    start, end = self._bounds[period] = bounds(when)
+                key = (start, end, lane)
+                row = self._open[period].get(key)
+                if row is None:
+                    row = self._open[period][key] = [0, 0, 0]
+                row[column] += 1
+
+    def _loop(self):
+        while not self._stopping.wait(self._interval):
+            self.flush()
+
+    def flush(self, final=False):
+        """ append finished periods (all when final) """
+        now = datetime.datetime.now()
+        closed = {}  # (period, day): rows
+        with self._lock:
+            for period, rows in self._open.items():
+                for key in [key for key in rows if final or key[1] <= now]:
+                    start, end, lane = key
+                    closed.setdefault((period, start.date()), []).append(
+                        (start.strftime(_TIME_FORMAT), end.strftime(_TIME_FORMAT), lane) + tuple(rows.pop(key)))
+        for (period, day), rows in sorted(closed.items()):
+            path = os.path.join(self._folder, '{}-{}.{}'.format(period, day.strftime('%Y%m%d'), self._format))
+            try:
+                self._write(path, period, day, sorted(rows))
+                self.written += len(rows)
+            except (OSError, ValueError) as ex:
+                log.error('error writing report {} {}, {} rows lost'.format(path, ex, len(rows)))
+        for path in [path for path, (end, _) in self._writers.items() if final or end <= now]:
+            self._writers.pop(path)[1].close()
+
+    def _write(self, path, period, day, rows):
+        if self._format == 'csv':
+            new = not os.path.exists(path)
+            with open(path, 'a', newline='') as f:
+                writer = csv.writer(f)
+                if new:
+                    writer.writerow(FIELDS)
+                writer.writerows(rows)
+            return
+        table = pyarrow.table({name: [row[n] for row in rows] for n, name in enumerate(FIELDS)})
+        if path not in self._writers:
+            file_name = path
+            if os.path.exists(path):  # restarted, previous file is complete, continue on a new one
+                file_name = path.replace('.parquet', '-{}.parquet'.format(int(time.time())))
+            self._writers[path] = (self._last_end(period, day),
+                                   pyarrow.parquet.ParquetWriter(file_name, table.schema))
+        self._writers[path][1].write_table(table)  # one row group per flush
+
+    def close(self):
+        """ stop writer, append open periods (partial) """
+        self._stopping.set()
+        self._thread.join(timeout=self._interval + 5.0)
+        self.flush(final=True)
+        log.debug('reports closed, {} rows written'.format(self.written))
+
+
+def from_config(report_data):
+    """ Report from typed [REPORT] section, None when disabled """
+    if not report_data or not report_data.get('enabled', False):
+        return None
+    return Report(report_data.get('folder', 'reports'),
+                  report_data.get('shifts', [(6, 0), (14, 0), (22, 0)]),
+                  report_data.get('format', 'csv'),
+                  report_data.get('interval', 60.0))
+
+
+if __name__ == '__main__':
+    # simple explore test
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG)
+    report = Report('reports', interval=1.0)
+    now = time.time()
+    for n in range(5000):
+        ts = now - 86400 + n * 17.3
+        report.add('CAMERA', store.COUNT, ts)
+        if n % 10 == 0:
+            report.add('CAMERA', store.SELECT, ts)
+    report.close()
+    print('{} rows written'.format(report.written))
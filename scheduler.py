@@ -0,0 +1,77 @@
+"""Run timed actions (led / buzzer on-off, gpio writes) on own thread, away from the frame loop"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """ Heap of (deadline, action), one worker thread sleeping until next deadline """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()  # keeps order of equal deadlines, never compares actions
+        self._cancelled = set()
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def call_at(self, deadline, action, *args):
+        """ run action(*args) at time.monotonic() deadline, return handle for cancel """
+        with self._condition:
+            handle = next(self._seq)
+            heapq.heappush(self._heap, (deadline, handle, action, args))
+            self._condition.notify()
+        return handle
+
+    def call_later(self, delay, action, *args):
+        return self.call_at(time.monotonic() + delay, action, *args)
+
+    def post(self, action, *args):
+        """ run action(*args) as soon as possible """
+        return self.call_at(0.0, action, *args)
+
+    def cancel(self, handle):
+        with self._condition:
+            if any(entry[1] == handle for entry in self._heap):
+                self._cancelled.add(handle)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while self._running and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if not self._running:
+                    return
+                deadline, handle, action, args = heapq.heappop(self._heap)
+                if handle in self._cancelled:
+                    self._cancelled.discard(handle)
+                    continue
+            try:
+                action(*args)
+            except Exception as ex:
+                log.error('scheduled action {} failed: {}'.format(getattr(action, '__name__', action), ex))
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join(timeout=1.0)
+
+
+if __name__ == '__main__':
+    # simple explore test
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG)
+    scheduler = Scheduler()
+    start = time.monotonic()
+    for delay in (0.3, 0.1, 0.2):
+        scheduler.call_later(delay, lambda d: print('{} -> {:.3f}'.format(d, time.monotonic() - start)), delay)
+    scheduler.cancel(scheduler.call_later(0.15, print, 'cancelled'))
+    time.sleep(0.5)
+    scheduler.close()
@@ -1,91 +1,207 @@
 import logging
 import random
 import datetime
+import threading
+import time
+
+import store
 
 log = logging.getLogger(__name__)
 
 
+class SampleSet:
+    """ Random sample of k case numbers in 1..n, kept in a bitmap with O(1) membership """
+
+    def __init__(self, size, total):
+        self.size = size
+        self._bits = bytearray((size >> 3) + 1)
+        self._len = 0
+        # Robert Floyd's algorithm: exactly k draws, no rejection loop
+        rnd = random.random
+        for j in range(size - total + 1, size + 1):
+            luck = int(rnd() * j) + 1
+            if luck in self:
+                luck = j
+            self._bits[luck >> 3] |= 1 << (luck & 7)
+        self._len = total
+
+    @classmethod
+    def from_bitmap(cls, size, bitmap):
+        """ rebuild a saved sample """
+        sample = cls(size, 0)
+        sample._bits[:len(bitmap)] = bitmap
+        sample._len = bin(int.from_bytes(sample._bits, 'little')).count('1')
+        return sample
+
+    @property
+    def bitmap(self):
+        return bytes(self._bits)
+
+    def __contains__(self, case):
+        return 0 < case <= self.size and bool(self._bits[case >> 3] & (1 << (case & 7)))
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        """ selected cases in ascending order """
+        for index, byte in enumerate(self._bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield (index << 3) | bit
+
+    def discard(self, case):
+        if case in self:
+            self._bits[case >> 3] &= ~(1 << (case & 7)) & 0xFF
+            self._len -= 1
+
+
+class RollingCounter:
+    """ Events counted on a ring of time buckets, with running totals per window (fixed memory) """
+
+    def __init__(self, windows, bucket_seconds=60):
+        self.windows = list(windows)  # minutes
+        self._bucket_seconds = bucket_seconds
+        self._spans = [max(1, int(window * 60 // bucket_seconds)) for window in self.windows]
+        self._ring = [0] * max(self._spans)
+        self._totals = [0] * len(self.windows)
+        self._current = None  # index of newest bucket
+
+    def _advance(self, now):
+        index = int(now // self._bucket_seconds)
+        if self._current is None or index - self._current >= len(self._ring):
+            self._ring = [0] * len(self._ring)
+            self._totals = [0] * len(self._totals)
+            self._current = index
+        size = len(self._ring)
+        while self._current < index:
+            self._current += 1
+            for i, span in enumerate(self._spans):  # bucket leaving each window
+                self._totals[i] -= self._ring[(self._current - span) % size]
+            self._ring[self._current % size] = 0
+
+    def add(self, now=None):
+        self._advance(time.time() if now is None else now)
+        self._ring[self._current % len(self._ring)] += 1
+        for i in range(len(self._totals)):
+            self._totals[i] += 1
+
+    def counts(self, now=None):
+        """ {'min5': n, ...} events on each window """
+        self._advance(time.time() if now is None else now)
+        return dict(('min{}'.format(window), total) for window, total in zip(self.windows, self._totals))
+
+
 class Stats:
 
     def __init__(self, random_param):
-        self.percentage_sample = int(random_param['percentage_sample'])
+        self.percentage_sample = random_param['percentage_sample']
         if self.percentage_sample > 100:
             log.warning('percentage sample value error "{}"'.format(self.percentage_sample))
             raise ValueError('percentage sample value error')
-        self.loop_sample = int(random_param['loop_sample'])
-        self._case_random = []
+        self.loop_sample = random_param['loop_sample']
+        self._case_random = None
+        self._next_thread = None  # builds the sample of next cycle while this one runs
+        self._next_sample = []
         self.counter = 0
         self._ack = 0
-        self._time_counter = []
-        self._time_selected = []
+        self.windows = list(random_param.get('windows', [5, 15, 60]))
+        self._bucket_seconds = random_param.get('window_bucket', 60)
+        self._time_counter = RollingCounter(self.windows, self._bucket_seconds)
+        self._time_selected = RollingCounter(self.windows, self._bucket_seconds)
+        self._first_counter = None
+        self._store = None
+        self._listeners = []  # callables (kind, ts) of count / select / ack events, kept across cycles
 
         self._total = int(self.loop_sample * self.percentage_sample / 100)
+        if random_param.get('store_file'):
+            self._store = store.EventStore(random_param['store_file'], random_param.get('store_interval', 1.0))
+            if self._restore():
+                self._prepare_next()
+                return
         self._get_random_sample()
 
+    def _restore(self):
+        """ rebuild counters, remaining sample and rolling windows from event store """
+        state = self._store.load(since=time.time() - max(self.windows) * 60)
+        if not state or (state['loop_sample'], state['total']) != (self.loop_sample, self._total):
+            log.info('no compatible cycle on event store, starting new one')
+            return False
+        self._case_random = SampleSet.from_bitmap(self.loop_sample, state['sample'])
+        for case in state['selected']:
+            self._case_random.discard(case)
+        self.counter = state['counter']
+        self._ack = state['ack']
+        if state['first']:
+            self._first_counter = datetime.datetime.fromtimestamp(state['first'])
+        for ts in state['counts']:
+            self._time_counter.add(now=ts)
+        for ts in state['selections']:
+            self._time_selected.add(now=ts)
+        log.info('restored cycle counter={} selected={} ack={}'.format(self.counter, self.sampled, self._ack))
+        return True
+
     def _get_random_sample(self):
-        """ generate random case samples """
-        log.info('starting generating new random set {}%'.format(self.percentage_sample, self.loop_sample))
-        self._case_random =[]
-        while len(self._case_random) < self._total:
-            luck = random.randrange(self.loop_sample) + 1
-            if luck not in self._case_random:
-                self._case_random.append(luck)
-            self._case_random.sort()
-        log.debug('{}/{} random numbers generated {}'.format(len(self._case_random), self.loop_sample, self._case_random))
+        """ random case samples of new cycle, built ahead on a thread (first cycle built here) """
+        if self._next_thread:
+            self._next_thread.join()  # long done unless the cycle was very short
+            self._case_random = self._next_sample.pop()
+        else:
+            log.info('starting generating new random set {}% of {}'.format(self.percentage_sample,
+                                                                            self.loop_sample))
+            self._case_random = SampleSet(self.loop_sample, self._total)
+        if self._store:
+            self._store.new_cycle(self.loop_sample, self._total, self._case_random.bitmap)
+        log.debug('{}/{} random numbers generated'.format(len(self._case_random), self.loop_sample))
+        self._prepare_next()
+
+    def _prepare_next(self):
+        """ build next cycle sample off the frame loop, reset() only swaps it in """
+        self._next_thread = threading.Thread(target=self._build_next, name='stats-sample', daemon=True)
+        self._next_thread.start()
+
+    def _build_next(self):
+        self._next_sample.append(SampleSet(self.loop_sample, self._total))
 
     def is_selected(self):
         if self.counter in self._case_random:
-            log.info('case id={} select for review '.format(self.counter))
-            self._case_random.remove(self.counter)
-            self._time_selected.append(datetime.datetime.now())
+            log.info('case id=%s select for review ', self.counter)
+            self._case_random.discard(self.counter)
+            self._time_selected.add()
+            self._event(store.SELECT)
             return True
 
     def inc_counter(self):
-        if self.counter < self.loop_sample:
-            self._time_counter.append(datetime.datetime.now())
-            self.counter += 1
-        else:
+        if self.counter >= self.loop_sample:  # bag is the first one of the new cycle, never lost
+            log.info('sample cycle of {} complete, starting new cycle'.format(self.loop_sample))
             self.reset()
+        self._time_counter.add()
+        if self._first_counter is None:
+            self._first_counter = datetime.datetime.now()
+        self.counter += 1
+        self._event(store.COUNT)
 
     def reset(self):
         self.counter = 0
         self._ack = 0
         self._get_random_sample()
-        self._time_counter = []
-        self._time_selected = []
+        self._time_counter = RollingCounter(self.windows, self._bucket_seconds)
+        self._time_selected = RollingCounter(self.windows, self._bucket_seconds)
+        self._first_counter = None
 
     @property
     def counter_by_time(self):
-        min5 = 0
-        min15 = 0
-        min60 = 0
-        for t in self._time_counter:
-            if datetime.datetime.now() - t < datetime.timedelta(minutes=5):
-                min5 += 1
-            if datetime.datetime.now() - t < datetime.timedelta(minutes=15):
-                min15 += 1
-            if datetime.datetime.now() - t < datetime.timedelta(minutes=60):
-                min60 += 1
-        return {'min5': min5, 'min15': min15, 'min60': min60}
+        return self._time_counter.counts()
 
     @property
     def selected_by_time(self):
-        min5 = 0
-        min15 = 0
-        min60 = 0
-        for t in self._time_selected:
-            if datetime.datetime.now() - t < datetime.timedelta(minutes=5):
-                min5 += 1
-            if datetime.datetime.now() - t < datetime.timedelta(minutes=15):
-                min15 += 1
-            if datetime.datetime.now() - t < datetime.timedelta(minutes=60):
-                min60 += 1
-        return {'min5': min5, 'min15': min15, 'min60': min60}
+        return self._time_selected.counts()
 
     @property
     def first_counter(self):
-        if self._time_counter:
-            return self._time_counter[0]
+        if self._first_counter:
+            return self._first_counter
         else:
             return datetime.datetime.now()
 
@@ -98,16 +214,12 @@ class Stats:
 
     @property
     def percentage_by_time(self):
-        min60_sel = 0
-        min60_cnt = 0
-        for t in self._time_selected:
-            if datetime.datetime.now() - t < datetime.timedelta(minutes=60):
-                min60_sel += 1
-        for t in self._time_counter:
-            if datetime.datetime.now() - t < datetime.timedelta(minutes=60):
-                min60_cnt += 1
-        if min60_cnt:
-            return round((min60_sel / min60_cnt) * 100, 1)
+        """ selected percentage on largest window """
+        window = 'min{}'.format(max(self.windows))
+        min_sel = self.selected_by_time[window]
+        min_cnt = self.counter_by_time[window]
+        if min_cnt:
+            return round((min_sel / min_cnt) * 100, 1)
         else:
             return 0
 
@@ -122,13 +234,29 @@ class Stats:
     def inc_ack(self):
         if self.counter < self.loop_sample:
             self._ack += 1
+            self._event(store.ACK)
+
+    def subscribe(self, listener):
+        """ listener(kind, ts) called on each event (store.COUNT, SELECT, ACK) """
+        self._listeners.append(listener)
+
+    def _event(self, kind):
+        ts = time.time()
+        if self._store:
+            self._store.append(kind, self.counter, ts)
+        for listener in self._listeners:
+            listener(kind, ts)
+
+    def close(self):
+        if self._store:
+            self._store.close()
 
 
 if __name__ == '__main__':
     # simple explore test
     logging.basicConfig()
     logging.getLogger().setLevel(logging.DEBUG)
-    random_data = {'percentage_sample': '100', 'loop_sample': '10'}
+    random_data = {'percentage_sample': 100, 'loop_sample': 10}
     stats = Stats(random_data)
     for n in range(20):
         print('counter: {}\tselected: {}\tpercentage: {}'.format(stats.counter, stats.sampled, stats.percentage))
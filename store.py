@@ -0,0 +1,129 @@
+"""Durable event store for Stats (sqlite on WAL mode, written by a background thread)"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+COUNT = 1
+SELECT = 2
+ACK = 3
+
+_SCHEMA = ('CREATE TABLE IF NOT EXISTS cycle (id INTEGER PRIMARY KEY, started REAL, loop_sample INTEGER, '
+           'total INTEGER, sample BLOB)',
+           'CREATE TABLE IF NOT EXISTS event (cycle INTEGER, ts REAL, kind INTEGER, counter INTEGER)',
+           'CREATE INDEX IF NOT EXISTS event_cycle ON event (cycle, kind, ts)')
+
+
+def _connect(file_name):
+    db = sqlite3.connect(file_name, timeout=10.0)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')  # WAL stays consistent on power cut, fsync only on checkpoint
+    for sql in _SCHEMA:
+        db.execute(sql)
+    db.commit()
+    return db
+
+
+class EventStore:
+    """ Append count/select/ack events to sqlite without blocking the caller """
+
+    def __init__(self, file_name, batch_interval=1.0):
+        self._file_name = file_name
+        self._batch_interval = batch_interval
+        self._queue = queue.Queue()
+        db = _connect(file_name)
+        self.cycle = db.execute('SELECT COALESCE(MAX(id), 0) FROM cycle').fetchone()[0]
+        db.close()
+        self._writer = threading.Thread(target=self._write_loop, name='event-store', daemon=True)
+        self._writer.start()
+        log.info('event store "{}" opened on cycle {}'.format(file_name, self.cycle))
+
+    def load(self, since):
+        """ state of the last cycle, or None; events timestamps only after 'since' """
+        db = _connect(self._file_name)
+        try:
+            row = db.execute('SELECT id, loop_sample, total, sample FROM cycle ORDER BY id DESC LIMIT 1').fetchone()
+            if row is None:
+                return None
+            cycle, loop_sample, total, sample = row
+
+            def column(sql, *args):
+                return [value for (value,) in db.execute(sql, (cycle,) + args)]
+
+            state = {'cycle': cycle, 'loop_sample': loop_sample, 'total': total, 'sample': sample,
+                     'counter': column('SELECT COALESCE(MAX(counter), 0) FROM event WHERE cycle=? AND kind=?',
+                                       COUNT)[0],
+                     'ack': column('SELECT COUNT(*) FROM event WHERE cycle=? AND kind=?', ACK)[0],
+                     'first': column('SELECT MIN(ts) FROM event WHERE cycle=? AND kind=?', COUNT)[0],
+                     'selected': column('SELECT counter FROM event WHERE cycle=? AND kind=?', SELECT),
+                     'counts': column('SELECT ts FROM event WHERE cycle=? AND kind=? AND ts>? ORDER BY ts',
+                                      COUNT, since),
+                     'selections': column('SELECT ts FROM event WHERE cycle=? AND kind=? AND ts>? ORDER BY ts',
+                                          SELECT, since)}
+            log.info('event store loaded cycle {} with counter={}'.format(cycle, state['counter']))
+            return state
+        finally:
+            db.close()
+
+    def new_cycle(self, loop_sample, total, sample):
+        """ start a new sample cycle, sample is the bitmap of selected cases """
+        self.cycle += 1
+        self._queue.put(('cycle', (self.cycle, time.time(), loop_sample, total, sample)))
+
+    def append(self, kind, counter, ts=None):
+        self._queue.put(('event', (self.cycle, time.time() if ts is None else ts, kind, counter)))
+
+    def _write_loop(self):
+        db = _connect(self._file_name)
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self._batch_interval)]
+            except queue.Empty:
+                continue
+            time.sleep(self._batch_interval)  # let events pile up, one commit per batch
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = []
+            try:
+                with db:
+                    for item in batch:
+                        if item is None:
+                            running = False
+                        elif item[0] == 'event':
+                            events.append(item[1])
+                        else:
+                            db.executemany('INSERT INTO event VALUES (?, ?, ?, ?)', events)
+                            events = []
+                            db.execute('INSERT INTO cycle VALUES (?, ?, ?, ?, ?)', item[1])
+                            # keep only current and previous cycle events
+                            db.execute('DELETE FROM event WHERE cycle < ?', (item[1][0] - 1,))
+                            db.execute('DELETE FROM cycle WHERE id < ?', (item[1][0] - 1,))
+                    db.executemany('INSERT INTO event VALUES (?, ?, ?, ?)', events)
+            except sqlite3.Error as ex:
+                log.error('event store write error {}, {} items lost'.format(ex, len(batch)))
+        db.close()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(timeout=self._batch_interval + 5.0)
+        log.debug('event store closed')
+
+
+if __name__ == '__main__':
+    # simple explore test
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG)
+    s = EventStore('store.db', batch_interval=0.1)
+    s.new_cycle(10, 10, bytes(2))
+    for n in range(1, 6):
+        s.append(COUNT, n)
+    s.close()
+    print(EventStore('store.db').load(since=0))
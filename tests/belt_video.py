@@ -0,0 +1,19 @@
+"""Synthetic belt videos for tests: bags (white boxes) moving down over a dark belt"""
+
+import cv2
+import numpy as np
+
+
+def write(path, frames=60, width=320, height=240, bag_every=30, bag_size=(60, 40), speed=12):
+    """ write a video where a new bag enters from the top every bag_every frames, return path """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 20, (width, height))
+    bag_width, bag_height = bag_size
+    x = (width - bag_width) // 2
+    for n in range(frames):
+        frame = np.full((height, width, 3), 30, np.uint8)
+        if n >= bag_every // 2:  # empty belt first, background reference
+            y = ((n - bag_every // 2) % bag_every) * speed - bag_height
+            frame[max(0, y):max(0, y + bag_height), x:x + bag_width] = 220
+        writer.write(frame)
+    writer.release()
+    return path
@@ -0,0 +1,15 @@
+"""Config sections shared by the tests: one 320x240 lane, beam across the middle of the belt videos"""
+
+import os
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CAMERA_DATA = {'camera_id': 0, 'camera_delay': 0, 'camera_width': 320, 'camera_height': 240,
+               'camera_fps': 20, 'camera_resize_width': 320, 'camera_resize_height': 240,
+               'gaussian_blur_value': 5, 'min_detect_area': 500, 'threshold_value': 60}
+DISPLAY_DATA = {'image_width': 320, 'image_height': 240, 'window_title': 'TEST',
+                'beam_position': [0, 100, 320, 140], 'beam_dead_zone': 2, 'time_min_delta': 1.0,
+                'bag_select': 10.0, 'display_fps': 0, 'image_template': os.path.join(ROOT, 'background.png'),
+                'image_bag': os.path.join(ROOT, 'bag.png')}
+LED_DATA = {'red_gpio': 20, 'green_gpio': 21, 'green_timeout': 0.5, 'red_timeout': 5.0}
+BUZZER_DATA = {'timeout': 1.5}
+RANDOM_DATA = {'percentage_sample': 100, 'loop_sample': 9999}
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import archive
+
+
+class TestArchiveMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_write(self):
+        snapshots = archive.Archive(self.folder.name)
+        frame = np.zeros((48, 80, 3), np.uint8)
+        self.assertTrue(snapshots.submit(frame, 'CAMERA', 'selected', 7))
+        frame[:] = 255  # archived copy is not changed
+        snapshots.close()
+        files = os.listdir(self.folder.name)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith('_camera_selected_000007.jpg'))
+        self.assertEqual(snapshots.written, 1)
+
+    def test_quota(self):
+        snapshots = archive.Archive(self.folder.name, quota_mb=0.05)
+        for n in range(10):
+            snapshots.submit(np.random.randint(0, 255, (120, 160, 3), np.uint8), 'CAMERA', 'counted', n)
+        snapshots.close()
+        self.assertLessEqual(snapshots.used, 0.05 * 1024 * 1024)
+        self.assertEqual(sum(os.path.getsize(os.path.join(self.folder.name, name))
+                             for name in os.listdir(self.folder.name)), snapshots.used)
+        self.assertEqual(archive.Archive(self.folder.name).used, snapshots.used)  # rescanned on start
+
+    def test_queue_full(self):
+        snapshots = archive.Archive(self.folder.name, workers=0, queue_size=1)
+        frame = np.zeros((48, 80, 3), np.uint8)
+        self.assertTrue(snapshots.submit(frame, 'CAMERA', 'selected', 1))
+        self.assertFalse(snapshots.submit(frame, 'CAMERA', 'selected', 2))
+        self.assertEqual(snapshots.dropped, 1)
+
+    def test_copied(self):
+        snapshots = archive.Archive(self.folder.name, workers=0)
+        frame = np.zeros((48, 80, 3), np.uint8)
+        snapshots.submit(frame, 'CAMERA', 'counted', 1, copied=True)  # already a copy, queued as is
+        snapshots.submit(frame, 'CAMERA', 'selected', 2)
+        self.assertIs(snapshots._queue.get_nowait()[1], frame)
+        self.assertIsNot(snapshots._queue.get_nowait()[1], frame)
+
+    def test_disabled(self):
+        self.assertIsNone(archive.from_config({'enabled': False}))
+        self.assertIsNone(archive.from_config(None))
@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+import numpy as np
+import background
+
+SHAPE = (48, 64)
+
+
+class HeldBackground(background.Background):
+    """ median computed only once released """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def _compute_median(self, samples):
+        self.release.wait(2.0)
+        super()._compute_median(samples)
+
+
+def frame(value, box=None, box_value=200):
+    image = np.full(SHAPE, value, np.uint8)
+    if box:
+        image[box[1]:box[3], box[0]:box[2]] = box_value
+    return image
+
+
+class TestBackgroundMethods(unittest.TestCase):
+
+    def wait_median(self, model):
+        end = time.monotonic() + 2.0
+        while model._median is None and time.monotonic() < end:
+            time.sleep(0.005)
+        self.assertIsNotNone(model._median)
+
+    def test_invalid_model(self):
+        with self.assertRaises(ValueError):
+            background.Background('knn')
+
+    def test_static(self):
+        model = background.Background('static', learning_rate=0.5)
+        model.apply(frame(50), 20)
+        delta, thresh = model.apply(frame(50, (10, 10, 30, 30)), 20)
+        self.assertEqual(delta[20, 20], 150)
+        self.assertEqual(np.count_nonzero(thresh), 20 * 20)
+        for _ in range(5):  # never learns
+            model.apply(frame(60), 20)
+        self.assertEqual(model._reference[0, 0], 50)
+
+    def test_median_recalibrate(self):
+        model = HeldBackground('static', median_frames=3)
+        model.release.set()
+        for _ in range(3):
+            model.apply(frame(50), 20)
+        self.wait_median(model)
+        model.apply(frame(50), 20)
+        model.release.clear()
+        model.recalibrate()
+        for _ in range(4):  # collected, median computing on its thread: old reference kept meanwhile
+            delta, thresh = model.apply(frame(80), 20)
+            self.assertEqual(delta[0, 0], 30)
+            self.assertIsNone(model._median)
+        model.release.set()
+        self.wait_median(model)
+        delta, thresh = model.apply(frame(80), 20)  # swapped on next frame
+        self.assertEqual(np.count_nonzero(delta), 0)
+        self.assertEqual(model._reference[0, 0], 80)
+
+    def test_median_ignores_passing_object(self):
+        model = background.Background('static', median_frames=3)
+        model.apply(frame(50, (0, 0, 20, 20)), 20)  # bag on first frame only
+        model.apply(frame(50), 20)
+        model.apply(frame(50), 20)
+        self.wait_median(model)
+        delta, thresh = model.apply(frame(50), 20)
+        self.assertEqual(np.count_nonzero(thresh), 0)
+
+    def test_average_masked(self):
+        model = background.Background('average', learning_rate=0.5)
+        model.apply(frame(50), 20)
+        for _ in range(10):  # light change everywhere, bag standing still
+            model.apply(frame(60, (10, 10, 30, 30)), 20)
+        self.assertAlmostEqual(float(model._average[0, 0]), 60.0, delta=0.5)
+        self.assertAlmostEqual(float(model._average[20, 20]), 50.0, delta=0.5)  # bag never learned
+        delta, thresh = model.apply(frame(60, (10, 10, 30, 30)), 20)
+        self.assertEqual(np.count_nonzero(thresh), 20 * 20)
+
+    def test_average_fixed(self):
+        model = background.Background('average', learning_rate=0.0)
+        model.apply(frame(50), 20)
+        for _ in range(5):
+            model.apply(frame(60), 20)
+        self.assertEqual(float(model._average[0, 0]), 50.0)
+
+    def test_mog2(self):
+        model = background.Background('mog2')
+        rng = np.random.default_rng(1)
+        for _ in range(30):
+            model.apply(np.clip(frame(50) + rng.integers(0, 3, SHAPE), 0, 255).astype(np.uint8), 20)
+        delta, thresh = model.apply(frame(50, (10, 10, 30, 30)), 20)
+        self.assertEqual(np.count_nonzero(thresh[10:30, 10:30]), 20 * 20)
+        self.assertEqual(np.count_nonzero(thresh[35:, 35:]), 0)
+        model.recalibrate()
+        self.assertIsNone(model._mog2)  # learned again from next frames
+
+
+if __name__ == '__main__':
+    unittest.main()
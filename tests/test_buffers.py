@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+import background
+import buffers
+import detector
+
+
+class TestBuffersMethods(unittest.TestCase):
+
+    def test_reused(self):
+        pool = buffers.BufferPool()
+        first = pool.get('gray', (48, 64))
+        self.assertIs(pool.get('gray', (48, 64)), first)
+        self.assertIsNot(pool.get('gray', (48, 32)), first)  # new shape reallocates
+        self.assertEqual(pool.get('labels', (48, 32), np.uint16).dtype, np.uint16)
+
+    def test_ring(self):
+        pool = buffers.BufferPool()
+        ring = [pool.next('display', (4, 4, 3), 3) for _ in range(4)]
+        self.assertIsNot(ring[0], ring[1])
+        self.assertIsNot(ring[1], ring[2])
+        self.assertIs(ring[0], ring[3])
+        self.assertEqual(pool.nbytes, 3 * 4 * 4 * 3)
+
+    def test_disabled(self):
+        pool = buffers.BufferPool(enabled=False)
+        self.assertIsNone(pool.get('gray', (48, 64)))
+        self.assertIsNone(pool.next('display', (48, 64, 3)))
+        self.assertEqual(pool.nbytes, 0)
+
+    def test_detect_same_result(self):
+        empty = np.zeros((120, 160), np.uint8)
+        frame = empty.copy()
+        frame[40:80, 60:100] = 255
+        results = []
+        for enabled in (False, True):
+            model = background.Background('average', 0.01, buffer_pool=enabled)
+            pool = buffers.BufferPool(enabled)
+            detector.detect(model, empty, 60, 100, pool)
+            results.append(detector.detect(model, frame, 60, 100, pool)[2])
+        np.testing.assert_array_equal(results[0], results[1])
+        self.assertEqual(len(results[1]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
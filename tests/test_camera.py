@@ -0,0 +1,253 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+import numpy as np
+import belt_video
+import camera
+import detector
+from fixtures import CAMERA_DATA
+
+
+class FakeCapture:
+    """ numbered frames, blocks on read while hold is set """
+
+    def __init__(self, frames=1000, delay=0.005, shape=(4, 4, 3)):
+        self.frames = frames
+        self.delay = delay
+        self.shape = shape
+        self.read_count = 0
+        self.released = False
+        self.hold = threading.Event()
+
+    def read(self, image=None):
+        while self.hold.is_set():
+            time.sleep(0.01)
+        time.sleep(self.delay)
+        self.read_count += 1
+        if self.read_count > self.frames:
+            return False, None
+        return True, np.full(self.shape, self.read_count % 256, np.uint8)
+
+    def set(self, *args):
+        return True
+
+    def release(self):
+        self.released = True
+
+
+class TestMotionGateMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.gate = camera.MotionGate(threshold=4.0, hold=2, refresh=100)
+        self.empty = np.full((120, 160), 50, np.uint8)
+
+    def test_idle(self):
+        self.assertTrue(self.gate.check(self.empty))  # first frame is the reference
+        results = [self.gate.check(self.empty) for _ in range(5)]
+        self.assertEqual(results, [True, True, False, False, False])  # hold frames then closed
+
+    def test_motion_with_hold(self):
+        for _ in range(5):
+            self.gate.check(self.empty)
+        moving = self.empty.copy()
+        moving[30:90, 40:100] = 200
+        self.assertTrue(self.gate.check(moving))
+        self.assertGreater(self.gate.level, 4.0)
+        self.assertEqual([self.gate.check(self.empty) for _ in range(3)], [True, True, False])
+
+    def test_region(self):
+        self.gate.set_region(0, 0, 40, 40)
+        for _ in range(5):
+            self.gate.check(self.empty)
+        moving = self.empty.copy()
+        moving[60:120, 100:160] = 200  # outside gate region
+        self.assertFalse(self.gate.check(moving))
+
+    def test_refresh(self):
+        gate = camera.MotionGate(threshold=4.0, hold=0, refresh=3)
+        self.assertEqual([gate.check(self.empty) for _ in range(6)], [True, False, False, True, False, False])
+
+
+class TestFrameGrabberMethods(unittest.TestCase):
+
+    def test_ring(self):
+        capture = FakeCapture(frames=20, delay=0)
+        grabber = camera.FrameGrabber(capture, 4)
+        grabber.start()
+        grabber.join(timeout=2.0)
+        self.assertTrue(grabber.failed)  # end of frames
+        self.assertEqual(len(grabber._ring), 4)  # only newest frames kept
+        seq, _, frame = grabber.latest()
+        self.assertEqual((seq, frame[0, 0, 0]), (20, 20))
+
+    def test_stop_release(self):
+        capture = FakeCapture()
+        grabber = camera.FrameGrabber(capture, 2)
+        grabber.start()
+        self.assertTrue(grabber.stop(release=True))
+        self.assertTrue(capture.released)
+
+    def test_release_after_read(self):
+        capture = FakeCapture()
+        grabber = camera.FrameGrabber(capture, 2)
+        grabber.start()
+        capture.hold.set()  # read in progress
+        time.sleep(0.05)
+        self.assertFalse(grabber.stop(release=True))
+        self.assertFalse(capture.released)  # never released under a running read
+        capture.hold.clear()
+        grabber.join(timeout=2.0)
+        self.assertTrue(capture.released)
+
+
+class TestCameraMethods(unittest.TestCase):
+
+    def test_threaded(self):
+        capture = FakeCapture(shape=(240, 320, 3))
+        with unittest.mock.patch('cv2.VideoCapture', lambda *args: capture):
+            cam = camera.Camera(dict(CAMERA_DATA, camera_threaded=True, camera_buffer_size=2))
+        try:
+            seen = set()
+            for _ in range(20):
+                cam.objects
+                seen.add(cam.frame_seq)
+                time.sleep(0.005)
+            self.assertGreater(len(seen), 1)  # newest frames taken from the grabber ring
+            self.assertEqual(cam.frame.shape, (240, 320, 3))
+        finally:
+            cam.close()
+        self.assertTrue(capture.released)
+
+    def test_threaded_detect_once(self):
+        capture = FakeCapture(frames=20, delay=0.05, shape=(240, 320, 3))  # slower than the detection loop
+        with unittest.mock.patch('cv2.VideoCapture', lambda *args: capture):
+            cam = camera.Camera(dict(CAMERA_DATA, camera_threaded=True, camera_buffer_size=2))
+        try:
+            with unittest.mock.patch('detector.detect', wraps=detector.detect) as detect:
+                seen = set()
+                while not cam._grabber.failed:  # until end of frames
+                    objects = cam.objects
+                    if cam.new_frame:
+                        seen.add(cam.frame_seq)
+                    else:
+                        self.assertIs(objects, detector.NO_OBJECTS)
+                    time.sleep(0.002)
+            self.assertGreater(len(seen), 10)
+            self.assertEqual(detect.call_count, len(seen))  # one detection per captured frame
+            self.assertEqual(cam.detection_seq, max(seen))
+        finally:
+            cam.close()
+
+    def test_warmup_ready(self):
+        capture = FakeCapture(shape=(240, 320, 3))
+        capture.hold.set()  # sensor still warming up, first read blocks
+        with unittest.mock.patch('cv2.VideoCapture', lambda *args: capture):
+            cam = camera.Camera(CAMERA_DATA, warmup_thread=True)
+        try:
+            objects = cam.objects  # App keeps running meanwhile
+            self.assertIs(objects, detector.NO_OBJECTS)
+            self.assertFalse(cam.new_frame)
+            self.assertFalse(cam.ready.is_set())
+            capture.hold.clear()
+            self.assertTrue(cam.ready.wait(2.0))
+            cam.objects
+            self.assertTrue(cam.new_frame)
+        finally:
+            cam.close()
+        self.assertTrue(capture.released)
+
+    def test_warmup_failed(self):
+        class BrokenCamera(camera.Camera):
+            def _open(self, *args):
+                raise TypeError('unexpected driver error')
+
+        cam = BrokenCamera(CAMERA_DATA, warmup_thread=True)
+        cam._warmup.join(timeout=2.0)
+        self.assertIn('unexpected driver error', cam._failed)
+        with self.assertRaises(SystemExit):
+            cam.objects
+        cam.close()
+
+    def test_release_after_warmup(self):
+        capture = FakeCapture(shape=(240, 320, 3))
+        capture.hold.set()
+        with unittest.mock.patch('cv2.VideoCapture', lambda *args: capture):
+            cam = camera.Camera(CAMERA_DATA, warmup_thread=True)
+        cam._closing.set()  # close() gave up waiting on the warmup
+        self.assertFalse(capture.released)  # never released under the warmup read
+        capture.hold.clear()
+        cam._warmup.join(timeout=2.0)
+        self.assertTrue(capture.released)  # released by the warmup thread
+        cam.close()  # nothing left to release
+
+
+class TestProcessingMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.video = belt_video.write(os.path.join(cls.folder.name, 'belt.avi'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def detections(self, camera_data):
+        """ objects of every frame of the belt video """
+        cam = camera.Camera(camera_data, self.video)
+        found = []
+        try:
+            while True:
+                found.append(cam.objects)
+        except EOFError:
+            pass
+        finally:
+            cam.close()
+        return found
+
+    def test_set_processing(self):
+        cam = camera.Camera(dict(CAMERA_DATA, process_roi=[0, 40, 320, 240], process_scale=0.5), self.video)
+        cam.close()
+        self.assertEqual(cam._capture_roi, (slice(40, 240), slice(0, 320)))
+        self.assertEqual(cam._process_size, (160, 100))
+        self.assertEqual(cam._process_blur, 3)
+        self.assertEqual(cam._process_dilate, 1)
+        self.assertEqual(cam._process_min_area, 125)
+
+    def test_tune(self):
+        cam = camera.Camera(dict(CAMERA_DATA, process_scale=0.5, detect_process=True), self.video)
+        try:
+            cam.tune('min_detect_area', 800)
+            cam.tune('threshold_value', 40)
+            self.assertEqual(cam._process_min_area, 200)
+            if cam._worker:  # detection process tuned with processed image values
+                self.assertEqual(cam._worker._tuning, (40, 200, 1, 0.0))
+            with self.assertRaises(ValueError):
+                cam.tune('camera_fps', 10)
+        finally:
+            cam.close()
+
+    def test_to_display(self):
+        cam = camera.Camera(dict(CAMERA_DATA, process_roi=[0, 40, 320, 240], process_scale=0.5), self.video)
+        cam.close()
+        objects = np.array([(100, 10, 20, 5, 15, 10, 10)], detector.OBJECT_DTYPE)
+        self.assertEqual(cam._to_display(objects).tolist(), [(400, 20, 80, 10, 70, 20, 20)])
+        self.assertEqual(len(cam._to_display(detector.NO_OBJECTS)), 0)
+
+    def test_scaled_matches_full(self):
+        full = self.detections(CAMERA_DATA)
+        scaled = self.detections(dict(CAMERA_DATA, process_roi=[0, 40, 320, 240], process_scale=0.5))
+        self.assertEqual(len(full), len(scaled))
+        compared = 0
+        for expected, objects in zip(full, scaled):
+            if len(expected) != 1 or expected['y'][0] < 40 or expected['y'][0] + expected['h'][0] > 236:
+                continue  # bag not fully inside the processed region
+            self.assertEqual(len(objects), 1)
+            self.assertLessEqual(abs(int(objects['cx'][0]) - int(expected['cx'][0])), 2)
+            self.assertLessEqual(abs(int(objects['cy'][0]) - int(expected['cy'][0])), 2)
+            self.assertAlmostEqual(objects['area'][0] / expected['area'][0], 1.0, delta=0.15)
+            compared += 1
+        self.assertGreater(compared, 5)
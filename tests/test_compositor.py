@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+import cv2
+import numpy as np
+import compositor
+
+
+class TestCompositorMethods(unittest.TestCase):
+
+    def test_sprite_same_as_put_text(self):
+        direct = compositor.Layer(200, 80)
+        cached = compositor.Layer(200, 80, sprites=compositor.TextSprites())
+        for layer in (direct, cached):
+            layer.put_text('12:34:56', (5, 50), cv2.FONT_HERSHEY_DUPLEX, 1.2, (0, 0, 0), 3)
+            layer.put_text('12:34:56', (5, 50), cv2.FONT_HERSHEY_DUPLEX, 1.2, (255, 255, 255), 1)
+        frames = [layer.apply(np.full((80, 200, 3), 90, np.uint8)) for layer in (direct, cached)]
+        np.testing.assert_array_equal(frames[0], frames[1])
+
+    def test_clipped(self):
+        direct = compositor.Layer(60, 30)
+        cached = compositor.Layer(60, 30, sprites=compositor.TextSprites())
+        for layer in (direct, cached):
+            layer.put_text('clipped', (-10, 10), cv2.FONT_HERSHEY_PLAIN, 1.5, (255, 0, 0), 2)
+        np.testing.assert_array_equal(direct.image, cached.image)
+
+    def test_lru(self):
+        sprites = compositor.TextSprites(max_size=2)
+        first = sprites.get('a', cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255))
+        sprites.get('b', cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255))
+        self.assertIs(sprites.get('a', cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255)), first)
+        sprites.get('c', cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255))  # evicts b, least recently used
+        self.assertEqual(len(sprites), 2)
+        self.assertIs(sprites.get('a', cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255)), first)
+        self.assertEqual((sprites.hits, sprites.misses), (2, 3))
+
+    def test_field(self):
+        layer = compositor.Layer(300, 60, sprites=compositor.TextSprites())
+        style = ((cv2.FONT_HERSHEY_DUPLEX, 1.2, (255, 255, 255), 1),)
+        layer.put_field(0, '0001', (10, 40), style)
+        layer.put_field(1, '0002', (150, 40), style)
+        second = layer.image[:, 140:].copy()
+        layer.put_field(0, '0011', (10, 40), style)
+        expected = compositor.Layer(300, 60)
+        expected.put_text('0011', (10, 40), *style[0])
+        expected.put_text('0002', (150, 40), *style[0])
+        np.testing.assert_array_equal(layer.image, expected.image)
+        np.testing.assert_array_equal(layer.image[:, 140:], second)
+
+
+class TestComposeMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.background = os.path.join(self.folder.name, 'background.png')
+        cv2.imwrite(self.background, np.full((40, 80, 3), 50, np.uint8))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def compositor(self, buffer_pool=False):
+        comp = compositor.Compositor(80, 40, self.background, buffer_pool)
+        self.labels = comp.layer(static=True)
+        self.labels.put_text('label', (2, 20), cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255))
+        return comp
+
+    def test_static_base(self):
+        comp = self.compositor()
+        with unittest.mock.patch.object(self.labels, 'apply', wraps=self.labels.apply) as apply:
+            first = comp.compose()
+            second = comp.compose()
+        self.assertEqual(apply.call_count, 1)  # blended once into the base
+        self.assertIsNot(first, second)  # callers draw on their own frame
+        np.testing.assert_array_equal(first, second)
+        expected = self.labels.apply(np.full((40, 80, 3), 50, np.uint8))
+        np.testing.assert_array_equal(first, expected)
+
+    def test_live(self):
+        comp = self.compositor()
+        live = np.full((40, 80, 3), 100, np.uint8)
+        frame = comp.compose(live)
+        expected = self.labels.apply(np.full((40, 80, 3), 150, np.uint8))  # background + live, labels on top
+        np.testing.assert_array_equal(frame, expected)
+        np.testing.assert_array_equal(live, 100)
+
+    def test_pooled_frames(self):
+        comp = self.compositor(buffer_pool=True)
+        frames = [comp.compose() for _ in range(3)]
+        self.assertIsNot(frames[0], frames[1])  # ring of 2, the displayed frame is never overwritten
+        self.assertIs(frames[0], frames[2])
+        np.testing.assert_array_equal(frames[1], frames[2])
+
+    def test_asset_cache(self):
+        with unittest.mock.patch('cv2.imread', wraps=cv2.imread) as imread:
+            comp = compositor.Compositor(40, 20, self.background)
+            self.assertEqual(comp.image(self.background).shape, (20, 40, 3))  # resized to display
+            self.assertIs(comp.image(self.background), comp._background)
+            missing = os.path.join(self.folder.name, 'missing.png')
+            with self.assertLogs('compositor', 'ERROR'):
+                self.assertIsNone(comp.image(missing))
+            self.assertIsNone(comp.image(missing))
+        self.assertEqual(imread.call_count, 2)  # each file decoded once
+
+
+if __name__ == '__main__':
+    unittest.main()
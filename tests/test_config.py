@@ -1,3 +1,7 @@
+import configparser
+import os
+import tempfile
+import time
 import unittest
 import config
 
@@ -25,6 +29,57 @@ class TestConfigMethods(unittest.TestCase):
         self.assertEqual(config.key['author'], 'César Freire')
         self.assertEqual(eval(config.key['version']), 1.0)
 
+    def test_as_bool(self):
+        self.assertTrue(config.as_bool('yes'))
+        self.assertTrue(config.as_bool('On'))
+        self.assertFalse(config.as_bool('no'))
+        self.assertFalse(config.as_bool('0'))
+        self.assertRaises(ValueError, config.as_bool, 'maybe')
+
+    def test_parse(self):
+        typed = config.parse('CAMERA', {'camera_id': '1', 'process_roi': '', 'process_scale': '0.5',
+                                        'background_model': ' mog2 ', 'motion_gate': 'yes'})
+        self.assertEqual(typed, {'camera_id': 1, 'process_roi': [], 'process_scale': 0.5, 'background_model': 'mog2',
+                                 'motion_gate': True})
+        self.assertEqual(config.parse('LANE2', {'beam_position': '1,2,3,4'}), {'beam_position': [1, 2, 3, 4]})
+        for key, value in (('process_scale', '0'), ('process_scale', '1.5'), ('background_model', 'median')):
+            self.assertRaises(ValueError, config.parse, 'CAMERA', {key: value})
+
+    def test_validate(self):
+        parser = configparser.RawConfigParser()
+        parser.read_string('[GLOBAL]\nlanes = LANE2\n[DISPLAY]\nbeam_position = 1, 2, 3, 4\ntracker = yes\n'
+                           '[LANE2]\nthreshold_value = 40\n')
+        typed = config.validate(parser)
+        self.assertEqual(typed['DISPLAY']['beam_position'], [1, 2, 3, 4])
+        self.assertIs(typed['DISPLAY']['tracker'], True)
+        self.assertEqual(typed['LANE2']['threshold_value'], 40)
+
+    def test_validate_errors(self):
+        parser = configparser.RawConfigParser()
+        parser.read_string('[GLOBAL]\nlanes = LANE3\n[DISPLAY]\nbeam_position = 1, 2, 3\n'
+                           '[STATS]\npercentage_sample = 200\n')
+        with self.assertRaises(ValueError) as raised:
+            config.validate(parser)
+        for error in ('beam_position', 'percentage_sample', 'LANE3'):  # all errors reported at once
+            self.assertIn(error, str(raised.exception))
+
+    def test_watcher(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, 'anacase.ini')
+            with open(file_name, 'w') as f:
+                f.write('[CAMERA]\nthreshold_value = 60\ncamera_id = 0\n')
+            watcher = config.Watcher(file_name)
+            self.assertEqual(watcher.poll(), 0)
+            with open(file_name, 'w') as f:
+                f.write('[CAMERA]\nthreshold_value = 45\ncamera_id = 1\n')  # camera_id needs restart
+            os.utime(file_name, (time.time() + 1, time.time() + 1))
+            self.assertEqual(watcher.poll(), 1)
+            self.assertEqual(watcher.changes.get_nowait(), ('CAMERA', 'threshold_value', 45))
+            with open(file_name, 'w') as f:
+                f.write('[CAMERA]\nthreshold_value = xx\n')  # invalid change is ignored
+            os.utime(file_name, (time.time() + 2, time.time() + 2))
+            self.assertEqual(watcher.poll(), 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,99 @@
+import time
+import unittest
+import numpy as np
+import background
+import detector
+
+
+def wait_result(worker, timeout=10.0):
+    """ poll worker until a new result arrives, None on timeout """
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        objects = worker.poll()
+        if objects is not None:
+            return objects
+        time.sleep(0.01)
+    return None
+
+
+class TestDetectMethods(unittest.TestCase):
+
+    def test_objects(self):
+        model = background.Background('static')
+        empty = np.zeros((120, 160), np.uint8)
+        detector.detect(model, empty, 60, 100)
+        frame = empty.copy()
+        frame[20:60, 30:70] = 255  # object
+        frame[100:102, 150:152] = 255  # noise, smaller than min area
+        objects = detector.detect(model, frame, 60, 100)[2]
+        self.assertEqual(objects.dtype, detector.OBJECT_DTYPE)
+        self.assertEqual(len(objects), 1)
+        self.assertEqual((objects['cx'][0], objects['cy'][0]), (49, 39))
+        self.assertLessEqual(objects['x'][0], 30)
+        self.assertGreaterEqual(objects['w'][0], 40)
+        self.assertGreater(objects['area'][0], 1600)
+
+    def test_nested(self):
+        model = background.Background('static')
+        empty = np.zeros((120, 160), np.uint8)
+        detector.detect(model, empty, 60, 100)
+        frame = empty.copy()
+        frame[10:110, 20:140] = 255  # bag outline (ring) with an object inside
+        frame[20:100, 30:130] = 0
+        frame[40:80, 60:100] = 255
+        objects = detector.detect(model, frame, 60, 100)[2]
+        self.assertEqual(len(objects), 1)  # inner blob is part of the outer one, as outer contours were
+        self.assertEqual(objects['area'][0], 104 * 124)  # pixel count of the filled, dilated outline
+
+    def test_empty(self):
+        model = background.Background('static')
+        empty = np.zeros((120, 160), np.uint8)
+        self.assertEqual(len(detector.detect(model, empty, 60, 100)[2]), 0)
+
+
+@unittest.skipIf(detector.shared_memory is None, 'needs python 3.8 shared memory')
+class TestDetectorWorkerMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.empty = np.zeros((120, 160), np.uint8)
+        self.frame = self.empty.copy()
+        self.frame[20:60, 30:70] = 255
+        self.worker = detector.DetectorWorker(self.empty.shape, 60, 100, {'model': 'static'})
+
+    def tearDown(self):
+        self.worker.close()
+
+    def test_round_trip(self):
+        self.assertIsNone(self.worker.poll())
+        self.assertTrue(self.worker.submit(self.empty, 0))
+        self.assertEqual(len(wait_result(self.worker)), 0)
+        self.assertTrue(self.worker.submit(self.frame, 1))
+        objects = wait_result(self.worker)
+        self.assertEqual(self.worker.seq, 1)
+        self.assertEqual(objects.dtype, detector.OBJECT_DTYPE)
+        self.assertEqual(len(objects), 1)
+        self.assertEqual((objects['cx'][0], objects['cy'][0]), (49, 39))
+        self.assertIsNone(self.worker.poll())  # result returned only once
+
+    def test_reset_kept_while_busy(self):
+        self.worker.submit(self.empty, 0)
+        wait_result(self.worker)
+        free, self.worker._free = self.worker._free, []  # every slot busy
+        self.assertFalse(self.worker.submit(self.frame, 1, reset=True))
+        self.worker._free = free
+        self.assertTrue(self.worker.submit(self.frame, 2))  # reset sent with this frame
+        self.assertEqual(len(wait_result(self.worker)), 0)  # frame became the new reference
+
+    def test_tune(self):
+        self.worker.submit(self.empty, 0)
+        wait_result(self.worker)
+        self.worker.tune(60, 2000, 0.0)  # bag is 1600 px
+        self.worker.submit(self.frame, 1)
+        self.assertEqual(len(wait_result(self.worker)), 0)
+        self.worker.tune(60, 100, 0.0)
+        self.worker.submit(self.frame, 2)
+        self.assertEqual(len(wait_result(self.worker)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import threading
+import types
+import unittest
+import belt_video
+import lane
+import stats
+from fixtures import CAMERA_DATA, DISPLAY_DATA
+
+
+class TestLaneSections(unittest.TestCase):
+
+    def test_single_lane(self):
+        (name, camera_data, display_data, random_data), = lane.lane_sections(
+            {'camera_id': 0}, {'beam_position': [1, 2, 3, 4]}, {'store_file': 'anacase.db'}, [('CAMERA', {})])
+        self.assertEqual(name, 'CAMERA')
+        self.assertEqual(camera_data['camera_id'], 0)
+        self.assertEqual(random_data['store_file'], 'anacase.db')
+
+    def test_lane_override(self):
+        lanes = lane.lane_sections({'camera_id': 0, 'camera_fps': 30}, {'beam_position': [1, 2, 3, 4]},
+                                   {'store_file': 'anacase.db'},
+                                   [('CAMERA', {}), ('LANE2', {'camera_id': 1, 'beam_position': [5, 6, 7, 8]})])
+        name, camera_data, display_data, random_data = lanes[1]
+        self.assertEqual(name, 'LANE2')
+        self.assertEqual(camera_data['camera_id'], 1)
+        self.assertEqual(camera_data['camera_fps'], 30)
+        self.assertEqual(display_data['beam_position'], [5, 6, 7, 8])
+        self.assertEqual(random_data['store_file'], 'anacase.lane2.db')  # never share the event store
+        self.assertEqual(lanes[0][1]['camera_id'], 0)
+
+
+class TestTotalsMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.lanes = [types.SimpleNamespace(stats=stats.Stats({'percentage_sample': 100, 'loop_sample': 10}),
+                                            lock=threading.Lock()) for _ in range(2)]
+        self.totals = lane.Totals(self.lanes)
+
+    def test_combined(self):
+        for _ in range(3):
+            self.lanes[0].stats.inc_counter()
+            self.lanes[0].stats.is_selected()
+        self.lanes[1].stats.inc_counter()
+        self.assertEqual(self.totals.counter, 4)
+        self.assertEqual(self.totals.sampled, 3)
+        self.assertEqual(self.totals.percentage, 75.0)
+        self.assertEqual(self.totals.loop_sample, 20)
+        self.assertEqual(self.totals.counter_by_time['min5'], 4)
+        self.assertEqual(self.totals.selected_by_time['min60'], 3)
+
+    def test_reset(self):
+        self.lanes[1].stats.inc_counter()
+        self.totals.reset()
+        self.assertEqual(self.totals.counter, 0)
+
+    def test_first_counter_locked(self):
+        for ln in self.lanes:
+            ln.stats.inc_counter()
+        result = []
+        with self.lanes[1].lock:  # lane thread counting
+            reader = threading.Thread(target=lambda: result.append(self.totals.first_counter))
+            reader.start()
+            reader.join(timeout=0.05)
+            self.assertEqual(result, [])
+        reader.join(timeout=1.0)
+        self.assertEqual(result, [min(ln.stats.first_counter for ln in self.lanes)])
+
+
+class TestLaneMethods(unittest.TestCase):
+
+    def test_selected_bounded(self):
+        with tempfile.TemporaryDirectory() as folder:
+            video = belt_video.write(os.path.join(folder, 'belt.avi'), frames=330)  # 11 bags
+            ln = lane.Lane('CAMERA', CAMERA_DATA, dict(DISPLAY_DATA, time_min_delta=0.5),
+                           {'percentage_sample': 100, 'loop_sample': 99}, video)
+            try:
+                with self.assertLogs('lane', 'WARNING'):
+                    while True:
+                        ln.step()
+            except EOFError:
+                pass
+            finally:
+                ln.close()
+        self.assertEqual(ln.stats.counter, 11)
+        self.assertEqual([counter for counter, _ in ln.selected], list(range(4, 12)))  # oldest dropped
+
+    def test_tune_beam(self):
+        with tempfile.TemporaryDirectory() as folder:
+            video = belt_video.write(os.path.join(folder, 'belt.avi'))
+            ln = lane.Lane('CAMERA', dict(CAMERA_DATA, motion_gate=True, motion_gate_margin=10),
+                           dict(DISPLAY_DATA, tracker=True), {'percentage_sample': 0, 'loop_sample': 99}, video)
+            ln.close()
+        self.assertEqual(ln.cam._gate._region, (slice(90, 150), slice(0, 320)))
+        ln.tune('beam_position', [20, 50, 300, 60])
+        self.assertEqual(ln.beam_position, [20, 50, 300, 60])
+        self.assertEqual(ln._tracker._beam, ((20, 50), (300, 60)))  # counting segment
+        self.assertEqual(ln.cam._gate._region, (slice(40, 70), slice(10, 310)))  # motion gate follows the beam
+        ln.tune('time_min_delta', 2.5)
+        self.assertEqual(ln._time_min_delta.total_seconds(), 2.5)
+        with self.assertRaises(ValueError):
+            ln.tune('camera_id', 1)
+
+    def test_keep_counted(self):
+        with tempfile.TemporaryDirectory() as folder:
+            video = belt_video.write(os.path.join(folder, 'belt.avi'), frames=90)
+            for keep in (False, True):
+                ln = lane.Lane('CAMERA', CAMERA_DATA, DISPLAY_DATA, {'percentage_sample': 0, 'loop_sample': 99},
+                               video, keep_counted=keep)
+                try:
+                    while True:
+                        ln.step()
+                except EOFError:
+                    pass
+                finally:
+                    ln.close()
+                self.assertEqual([counter for counter, _ in ln.bags], [1, 2, 3])
+                frames = [frame for _, frame in ln.bags]
+                if keep:  # own copies, display frames are reused
+                    self.assertTrue(all(frame.shape == (240, 320, 3) for frame in frames))
+                    self.assertIsNot(frames[-1], ln.cam.frame)
+                else:  # nobody archives counted bags: no frame copy
+                    self.assertEqual(frames, [None, None, None])
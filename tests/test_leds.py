@@ -7,7 +7,7 @@ import logging
 class TestLedMethods(unittest.TestCase):
 
     def setUp(self):
-        led_data = {'red_gpio': '20', 'red_timeout': '2', 'green_gpio': '21', 'green_timeout': '3'}
+        led_data = {'red_gpio': 20, 'red_timeout': 2, 'green_gpio': 21, 'green_timeout': 3}
         self.led = leds.Leds(led_data)
 
     def test_activate_green_led(self):
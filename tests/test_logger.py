@@ -0,0 +1,45 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+import logger
+
+
+class TestLoggerMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.folder.name, 'test.log')
+
+    def tearDown(self):
+        logger.setup(os.devnull)
+        self.folder.cleanup()
+
+    def test_queued_json(self):
+        logger.setup(self.file, queued=True, json_lines=True)
+        logging.getLogger('test').warning('value %d', 42)
+        logger.stop()  # flush queue
+        with open(self.file) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(lines[-1]['message'], 'value 42')
+        self.assertEqual(lines[-1]['name'], 'test')
+
+    def test_size_rotation(self):
+        logger.setup(self.file, rotate='size', max_bytes=1000, backup_count=2)
+        for n in range(100):
+            logging.info('line %d', n)
+        self.assertTrue(os.path.exists(self.file + '.1'))
+        self.assertTrue(os.path.exists(self.file + '.2'))
+        self.assertFalse(os.path.exists(self.file + '.3'))
+
+    def test_hot_path(self):
+        hot = logger.HotPath(logging.getLogger('test.hot'))
+        logger.level('INFO')
+        self.assertFalse(hot.debug)
+        logger.level('DEBUG')
+        self.assertTrue(hot.debug)
+
+    def test_invalid_rotation(self):
+        with self.assertRaises(ValueError):
+            logger.setup(self.file, rotate='weekly')
@@ -0,0 +1,173 @@
+import os
+import queue
+import tempfile
+import time
+import types
+import unittest
+import unittest.mock
+import belt_video
+import manager
+import metrics
+from fixtures import CAMERA_DATA, DISPLAY_DATA, LED_DATA, BUZZER_DATA, RANDOM_DATA
+
+
+class TestHeadlessMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.video = belt_video.write(os.path.join(cls.folder.name, 'belt.avi'), frames=90)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def test_no_display(self):
+        with unittest.mock.patch('display.Display', side_effect=AssertionError('display built')), \
+                unittest.mock.patch('compositor.Compositor', side_effect=AssertionError('compositor built')):
+            app = manager.App(CAMERA_DATA, DISPLAY_DATA, LED_DATA, BUZZER_DATA, RANDOM_DATA, 'test', 'TEST',
+                              gpio=False, source=self.video, headless=True)
+        try:
+            self.assertIsNone(app.display)
+            with self.assertRaises(EOFError):
+                while app.run():
+                    pass
+            self.assertEqual(app.stats.counter, 3)
+            self.assertEqual(app.stats.sampled, 3)  # selected bags reviewed without drawing
+        finally:
+            app.release()
+
+    def test_status_fps(self):
+        app = manager.App(CAMERA_DATA, dict(DISPLAY_DATA, diagnostics=False), LED_DATA, BUZZER_DATA, RANDOM_DATA,
+                          'test', 'TEST', gpio=False, source=self.video, headless=True)
+        try:
+            for _ in range(10):
+                app.run()
+            status = app.status()
+        finally:
+            app.release()
+        self.assertGreater(status['fps'], 0.0)  # measured without diagnostics
+        self.assertGreater(status['lanes']['CAMERA']['fps'], 0.0)
+        self.assertEqual(status['stages'], {})
+
+    def test_metrics_port_in_use(self):
+        server = metrics.MetricsServer('127.0.0.1', 0)
+        try:
+            app = manager.App(CAMERA_DATA, DISPLAY_DATA, LED_DATA, BUZZER_DATA, RANDOM_DATA, 'test', 'TEST',
+                              gpio=False, source=self.video, headless=True,
+                              metrics_data={'enabled': True, 'bind': '127.0.0.1', 'port': server.port})
+            try:
+                self.assertIsNone(app._metrics)  # logged, app runs without endpoint
+                self.assertTrue(app.run())
+            finally:
+                app.release()
+        finally:
+            server.close()
+
+
+class TestDisplayRateMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.video = belt_video.write(os.path.join(cls.folder.name, 'belt.avi'), frames=600)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def test_display_fps(self):
+        with unittest.mock.patch('manager.display.Display') as display, \
+                unittest.mock.patch('cv2.setMouseCallback'), \
+                unittest.mock.patch('cv2.waitKey', return_value=-1):
+            app = manager.App(CAMERA_DATA, dict(DISPLAY_DATA, display_fps=10), LED_DATA, BUZZER_DATA, RANDOM_DATA,
+                              'test', 'TEST', gpio=False, source=self.video)
+            ln = app._lanes[0]
+            step = ln.step
+            steps = []
+            ln.step = lambda: steps.append(1) or step()
+            loops = 0
+            start = time.monotonic()
+            try:
+                while time.monotonic() - start < 1.0:
+                    loops += 1
+                    self.assertTrue(app.run())
+            except EOFError:
+                pass
+            finally:
+                elapsed = time.monotonic() - start
+                app.release()
+        self.assertEqual(len(steps), loops)  # detection and counting on every loop
+        updates = display.return_value.update.call_count
+        self.assertGreater(loops, updates)
+        self.assertAlmostEqual(updates, elapsed * 10, delta=2)  # overlay and imshow at display_fps
+
+    def test_scanner_time_based(self):
+        with unittest.mock.patch('manager.display.Display'), unittest.mock.patch('cv2.setMouseCallback'):
+            app = manager.App(CAMERA_DATA, DISPLAY_DATA, LED_DATA, BUZZER_DATA, RANDOM_DATA, 'test', 'TEST',
+                              gpio=False, source=self.video)
+        try:
+            app._new_bag()
+            app._scanner_start -= 0.25  # 50 px after 0.25s, whatever the number of redraws
+            app._draw(*app._view_lane.result)
+            self.assertEqual(app._scanner, 51)
+            app._scanner_start -= 0.3
+            app._draw(*app._view_lane.result)
+            self.assertEqual(app._scanner, 0)  # 100 px done
+        finally:
+            app.release()
+
+
+
+class TestTuneMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.video = belt_video.write(os.path.join(cls.folder.name, 'belt.avi'), frames=600)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def setUp(self):
+        self.watcher = types.SimpleNamespace(changes=queue.Queue(), stop=lambda: None)  # config.Watcher not polling
+        lanes_data = [('CAMERA', {}), ('LANE2', {'threshold_value': 80, 'beam_position': [0, 60, 320, 80]})]
+        self.app = manager.App(CAMERA_DATA, DISPLAY_DATA, LED_DATA, BUZZER_DATA, RANDOM_DATA, 'test', 'TEST',
+                               gpio=False, source=self.video, headless=True, lanes_data=lanes_data,
+                               config_watcher=self.watcher)
+        self.first, self.second = self.app._lanes
+
+    def tearDown(self):
+        self.app.release()
+
+    def tune(self, *changes):
+        for change in changes:
+            self.watcher.changes.put(change)
+        self.app._tune()
+        self.assertTrue(self.watcher.changes.empty())
+
+    def test_shared_section(self):
+        self.tune(('CAMERA', 'threshold_value', 70), ('DISPLAY', 'beam_position', [0, 120, 320, 130]),
+                  ('DISPLAY', 'time_min_delta', 2.0))
+        self.assertEqual(self.first.cam._threshold_value, 70)
+        self.assertEqual(self.second.cam._threshold_value, 80)  # own [LANE2] value kept
+        self.assertEqual(self.first.beam_position, [0, 120, 320, 130])
+        self.assertEqual(self.second.beam_position, [0, 60, 320, 80])
+        self.assertEqual([ln._time_min_delta.total_seconds() for ln in self.app._lanes], [2.0, 2.0])
+
+    def test_lane_section(self):
+        self.tune(('LANE2', 'threshold_value', 90), ('LANE2', 'min_detect_area', 900))
+        self.assertEqual((self.second.cam._threshold_value, self.second.cam._min_detect_area), (90, 900))
+        self.assertEqual((self.first.cam._threshold_value, self.first.cam._min_detect_area), (60, 500))
+
+    def test_not_tunable(self):
+        with self.assertLogs('manager', 'ERROR') as logs:
+            self.tune(('CAMERA', 'camera_fps', 10), ('CAMERA', 'threshold_value', 70))
+        self.assertEqual(len(logs.output), 2)  # one per lane, app keeps running
+        self.assertIn('camera_fps', logs.output[0])
+        self.assertEqual(self.first.cam._threshold_value, 70)  # next changes still applied
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import json
+import urllib.request
+import unittest
+import metrics
+
+
+class TestMetricsMethods(unittest.TestCase):
+
+    def test_prometheus(self):
+        text = metrics.prometheus({'device': 'CAM1', 'version': '1.5', 'counter': 7, 'ready': True,
+                                   'counter_by_time': {'min5': 3}})
+        self.assertIn('anacase_counter{device="CAM1"} 7', text)
+        self.assertIn('anacase_ready{device="CAM1"} 1', text)
+        self.assertIn('anacase_counter_by_time{device="CAM1",window="min5"} 3', text)
+
+    def test_escape_labels(self):
+        text = metrics.prometheus({'device': 'a"b\\c\nd', 'version': '1', 'counter': 1})
+        self.assertIn('anacase_counter{device="a\\"b\\\\c\\nd"} 1', text)
+        for line in text.splitlines():  # label line feed never breaks a sample line
+            self.assertTrue(line.startswith(('# ', 'anacase_')), line)
+
+    def test_server(self):
+        server = metrics.MetricsServer('127.0.0.1', 0)
+        try:
+            server.publish({'device': 'CAM1', 'counter': 2})
+            url = 'http://127.0.0.1:{}/'.format(server.port)
+            with urllib.request.urlopen(url + 'status') as reply:
+                self.assertEqual(json.loads(reply.read().decode())['counter'], 2)
+            with urllib.request.urlopen(url + 'metrics') as reply:
+                self.assertIn('anacase_counter{device="CAM1"} 2', reply.read().decode())
+        finally:
+            server.close()
+
+    def test_port_in_use(self):
+        server = metrics.MetricsServer('127.0.0.1', 0)
+        try:
+            with self.assertRaises(OSError):
+                metrics.MetricsServer('127.0.0.1', server.port)
+        finally:
+            server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
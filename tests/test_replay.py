@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+import belt_video
+import manager
+import replay
+from fixtures import CAMERA_DATA, DISPLAY_DATA, LED_DATA, BUZZER_DATA, RANDOM_DATA
+
+
+class TestReplayMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        # 4 bags 1.5s apart (video time), crossing the beam in a few frames
+        cls.video = belt_video.write(os.path.join(cls.folder.name, 'belt.avi'), frames=135)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def run_replay(self, **display_data):
+        app = manager.App(CAMERA_DATA, dict(DISPLAY_DATA, diagnostics=True, timing_samples=0, **display_data),
+                          LED_DATA, BUZZER_DATA, dict(RANDOM_DATA, percentage_sample=10), 'test', 'REPLAY',
+                          window=False, gpio=False, source=self.video, headless=True)
+        try:
+            report = replay.replay(app)
+            return report, app.stats.counter
+        finally:
+            app.release()
+
+    def test_count_video_time(self):
+        report, counted = self.run_replay()  # much faster than 20 fps, time_min_delta on video time
+        self.assertEqual(report['frames'], 134)
+        self.assertEqual(counted, 4)
+
+    def test_count_tracker(self):
+        self.assertEqual(self.run_replay(tracker=True)[1], 4)
+
+    def test_read_truth(self):
+        path = os.path.join(self.folder.name, 'truth.txt')
+        for text in ('7\n', '{"count": 7}'):
+            with open(path, 'w') as f:
+                f.write(text)
+            self.assertEqual(replay.read_truth(path), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
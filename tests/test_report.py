@@ -0,0 +1,100 @@
+import csv
+import datetime
+import os
+import tempfile
+import time
+import unittest
+import report
+import stats
+import store
+
+
+class TestReportMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def rows(self, period, day):
+        with open(os.path.join(self.folder.name, '{}-{}.csv'.format(period, day.strftime('%Y%m%d')))) as f:
+            return list(csv.DictReader(f))
+
+    def test_periods(self):
+        reports = report.Report(self.folder.name, shifts=[(6, 0), (14, 0), (22, 0)], interval=60)
+        start = datetime.datetime(2024, 1, 31, 13, 58)
+        for n in range(5):  # 13:58, 13:59, 14:00, 14:01, 14:02
+            ts = (start + datetime.timedelta(minutes=n, seconds=10)).timestamp()
+            reports.add('CAMERA', store.COUNT, ts)
+            reports.add('LANE2', store.COUNT, ts)
+        reports.add('CAMERA', store.SELECT, ts)
+        reports.add('CAMERA', store.ACK, ts)
+        reports.flush()  # all periods finished
+        day = start.date()
+        self.assertEqual(len(self.rows('minute', day)), 10)
+        hours = [(row['start'], row['lane'], row['counted']) for row in self.rows('hour', day)]
+        self.assertEqual(hours, [('2024-01-31 13:00', 'CAMERA', '2'), ('2024-01-31 13:00', 'LANE2', '2'),
+                                 ('2024-01-31 14:00', 'CAMERA', '3'), ('2024-01-31 14:00', 'LANE2', '3')])
+        shift = self.rows('shift', day)[2]
+        self.assertEqual((shift['start'], shift['end'], shift['lane']), ('2024-01-31 14:00', '2024-01-31 22:00',
+                                                                         'CAMERA'))
+        self.assertEqual((shift['counted'], shift['selected'], shift['acked']), ('3', '1', '1'))
+        reports.close()
+        self.assertEqual(reports.written, 10 + 4 + 4)
+
+    def test_night_shift(self):
+        reports = report.Report(self.folder.name, shifts=[(22, 0), (6, 0)], interval=60)
+        reports.add('CAMERA', store.COUNT, datetime.datetime(2024, 2, 1, 3, 0).timestamp())
+        reports.close()
+        shift = self.rows('shift', datetime.date(2024, 1, 31))[0]  # file of shift start day
+        self.assertEqual((shift['start'], shift['end']), ('2024-01-31 22:00', '2024-02-01 06:00'))
+
+    def test_open_periods_on_close(self):
+        reports = report.Report(self.folder.name, interval=60)
+        reports.add('CAMERA', store.COUNT, time.time() + 3600)  # still open at flush, whatever the clock
+        reports.flush()
+        self.assertEqual(reports.written, 0)  # current minute still open
+        reports.close()
+        self.assertEqual(reports.written, 3)
+
+    def test_last_end(self):
+        reports = report.Report(self.folder.name, shifts=[(6, 0), (14, 0), (22, 0)], interval=60)
+        reports.close()
+        day = datetime.date(2024, 1, 31)
+        midnight = datetime.datetime(2024, 2, 1, 0, 0)
+        self.assertEqual(reports._last_end('minute', day), midnight)
+        self.assertEqual(reports._last_end('hour', day), midnight)
+        self.assertEqual(reports._last_end('shift', day), datetime.datetime(2024, 2, 1, 6, 0))  # night shift
+        day_shifts = report.Report(self.folder.name, shifts=[(6, 0), (18, 0)], interval=60)
+        day_shifts.close()
+        self.assertEqual(day_shifts._last_end('shift', day), datetime.datetime(2024, 2, 1, 6, 0))
+
+    @unittest.skipIf(report.pyarrow is None, 'parquet reports need pyarrow')
+    def test_parquet_closed_after_day(self):
+        reports = report.Report(self.folder.name, file_format='parquet', interval=60)
+        yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+        reports.add('CAMERA', store.COUNT, yesterday.replace(hour=12).timestamp())
+        reports.flush()
+        name = '{{}}-{}.parquet'.format(yesterday.strftime('%Y%m%d'))
+        for period in ('minute', 'hour'):  # readable the next day, without stopping
+            path = os.path.join(self.folder.name, name.format(period))
+            self.assertNotIn(path, reports._writers)
+            self.assertEqual(report.pyarrow.parquet.read_table(path).column('counted').to_pylist(), [1])
+        reports.close()
+        self.assertEqual(reports._writers, {})
+
+    def test_stats_cycle_reset(self):
+        reports = report.Report(self.folder.name, interval=60)
+        when = datetime.datetime(2024, 1, 31, 10, 30)
+        st = stats.Stats({'percentage_sample': 0, 'loop_sample': 3})
+        st.subscribe(lambda kind, ts: reports.add('CAMERA', kind, when.timestamp()))  # fixed time, no midnight
+        for _ in range(4):  # 4th bag starts a new cycle, still reported
+            st.inc_counter()
+        reports.close()
+        self.assertEqual(st.counter, 1)
+        self.assertEqual(sum(int(row['counted']) for row in self.rows('hour', when.date())), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import time
+import unittest
+import leds
+import scheduler
+
+
+class TestSchedulerMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = scheduler.Scheduler()
+
+    def tearDown(self):
+        self.scheduler.close()
+
+    def test_order(self):
+        done = []
+        for delay in (0.06, 0.02, 0.04):
+            self.scheduler.call_later(delay, done.append, delay)
+        self.scheduler.post(done.append, 0)
+        time.sleep(0.15)
+        self.assertEqual(done, [0, 0.02, 0.04, 0.06])
+
+    def test_cancel(self):
+        done = []
+        handle = self.scheduler.call_later(0.02, done.append, 1)
+        self.scheduler.cancel(handle)
+        time.sleep(0.05)
+        self.assertEqual(done, [])
+
+    def test_failed_action(self):
+        done = []
+        self.scheduler.post(lambda: 1 / 0)
+        self.scheduler.call_later(0.01, done.append, 1)
+        time.sleep(0.05)
+        self.assertEqual(done, [1])
+
+    def test_leds_timeout(self):
+        led_data = {'red_gpio': 20, 'red_timeout': 0.1, 'green_gpio': 21, 'green_timeout': 0.05}
+        led = leds.Leds(led_data, gpio=False, scheduler=self.scheduler)
+        self.assertEqual(led.clear_leds(), [True, True])  # red, green
+        time.sleep(0.075)
+        self.assertEqual(led.clear_leds(), [True, False])  # turned off without polling
+        time.sleep(0.05)
+        self.assertEqual(led.clear_leds(), [False, False])
+        self.assertTrue(led.activate_green())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+import stats
+
+
+class TestSampleSetMethods(unittest.TestCase):
+
+    def test_sample_size(self):
+        sample = stats.SampleSet(1000, 100)
+        self.assertEqual(len(sample), 100)
+        self.assertEqual(len(list(sample)), 100)
+        self.assertTrue(all(1 <= case <= 1000 for case in sample))
+
+    def test_full_sample(self):
+        sample = stats.SampleSet(10, 10)
+        self.assertEqual(list(sample), list(range(1, 11)))
+        self.assertNotIn(0, sample)
+        self.assertNotIn(11, sample)
+
+    def test_discard(self):
+        sample = stats.SampleSet(10, 10)
+        sample.discard(5)
+        sample.discard(5)
+        self.assertNotIn(5, sample)
+        self.assertEqual(len(sample), 9)
+
+
+class TestRollingCounterMethods(unittest.TestCase):
+
+    def test_windows(self):
+        rolling = stats.RollingCounter([5, 15, 60], bucket_seconds=60)
+        rolling.add(now=0)
+        rolling.add(now=10 * 60)
+        rolling.add(now=14 * 60)
+        self.assertEqual(rolling.counts(now=14 * 60), {'min5': 2, 'min15': 3, 'min60': 3})
+        self.assertEqual(rolling.counts(now=16 * 60), {'min5': 1, 'min15': 2, 'min60': 3})
+        self.assertEqual(rolling.counts(now=19 * 60), {'min5': 0, 'min15': 2, 'min60': 3})
+        self.assertEqual(rolling.counts(now=60 * 60), {'min5': 0, 'min15': 0, 'min60': 2})
+
+    def test_idle_gap(self):
+        rolling = stats.RollingCounter([5], bucket_seconds=10)
+        rolling.add(now=0)
+        self.assertEqual(rolling.counts(now=3600 * 24), {'min5': 0})
+        rolling.add(now=3600 * 24)
+        self.assertEqual(rolling.counts(now=3600 * 24 + 1), {'min5': 1})
+
+
+class TestStatsMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = stats.Stats({'percentage_sample': 100, 'loop_sample': 10})
+
+    def test_selected(self):
+        for _ in range(10):
+            self.stats.inc_counter()
+            self.assertTrue(self.stats.is_selected())
+            self.assertFalse(self.stats.is_selected())  # only once per case
+        self.assertEqual(self.stats.sampled, 10)
+        self.assertEqual(self.stats.percentage, 100.0)
+
+    def test_by_time(self):
+        self.stats.inc_counter()
+        self.stats.is_selected()
+        self.assertEqual(self.stats.counter_by_time, {'min5': 1, 'min15': 1, 'min60': 1})
+        self.assertEqual(self.stats.selected_by_time, {'min5': 1, 'min15': 1, 'min60': 1})
+        self.assertEqual(self.stats.percentage_by_time, 100.0)
+
+    def test_reset(self):
+        for _ in range(11):
+            self.stats.inc_counter()
+        self.assertEqual(self.stats.counter, 1)  # 11th bag counted on the new cycle
+        self.assertEqual(self.stats.sampled, 0)
+        self.assertEqual(self.stats.counter_by_time['min5'], 1)
+
+    def test_next_sample_ahead(self):
+        st = stats.Stats({'percentage_sample': 10, 'loop_sample': 10 ** 5})
+        st._next_thread.join(timeout=5.0)
+        prepared = st._next_sample[0]
+        st.reset()
+        self.assertIs(st._case_random, prepared)  # swapped in, not built on reset
+        self.assertEqual(len(st._case_random), 10 ** 4)
+        st._next_thread.join(timeout=5.0)
+        self.assertIsNot(st._next_sample[0], prepared)  # following cycle on its way
+
+
+class TestStatsStoreMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.random_data = {'percentage_sample': 50, 'loop_sample': 100, 'store_interval': 0.01,
+                            'store_file': os.path.join(self.folder.name, 'test.db')}
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_restore(self):
+        first = stats.Stats(self.random_data)
+        for _ in range(30):
+            first.inc_counter()
+            first.is_selected()
+        first.inc_ack()
+        first.close()
+        second = stats.Stats(self.random_data)
+        self.assertEqual(second.counter, 30)
+        self.assertEqual(second.sampled, first.sampled)
+        self.assertEqual(second.ack, 1)
+        self.assertEqual(second.counter_by_time, first.counter_by_time)
+        self.assertEqual(second.selected_by_time, first.selected_by_time)
+        self.assertEqual(list(second._case_random), list(first._case_random))
+        second.close()
+
+    def test_restore_after_reset(self):
+        first = stats.Stats(self.random_data)
+        for _ in range(5):
+            first.inc_counter()
+        first.reset()
+        first.inc_counter()
+        first.close()
+        second = stats.Stats(self.random_data)
+        self.assertEqual(second.counter, 1)
+        self.assertEqual(list(second._case_random), list(first._case_random))
+        second.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
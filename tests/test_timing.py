@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import timing
+
+
+class TestTimingMethods(unittest.TestCase):
+
+    def test_rate(self):
+        rate = timing.Rate(20)
+        self.assertTrue(rate.due())
+        self.assertFalse(rate.due())
+        self.assertGreater(rate.remaining(), 0.0)
+        time.sleep(rate.remaining())
+        self.assertTrue(rate.due())
+
+    def test_rate_late(self):
+        rate = timing.Rate(50)
+        rate.due()
+        time.sleep(0.1)  # five periods late, due once then back on period
+        self.assertTrue(rate.due())
+        self.assertFalse(rate.due())
+
+    def test_rate_off(self):
+        rate = timing.Rate(0)
+        self.assertTrue(all(rate.due() for _ in range(10)))
+        self.assertEqual(rate.remaining(), 0.0)
+
+
+class TestTimingsMethods(unittest.TestCase):
+
+    def test_stage_threads(self):
+        timings = timing.Timings()
+        stages = []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            stages.append(timings.stage('detect'))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(map(id, stages))), 1)
+        self.assertEqual(len(timings.stages), 1)
+
+    def test_disabled_fps(self):
+        timings = timing.Timings(enabled=False)
+        lane = timing.Prefixed(timings, '1:')
+        for _ in range(5):
+            with timings.stage('detect'):
+                time.sleep(0.01)
+            timings.tick()
+            lane.tick()
+        self.assertGreater(timings.fps, 0.0)  # frame rate without diagnostics
+        self.assertGreater(lane.fps, 0.0)
+        self.assertEqual(timings.summary()['stages'], {})
+
+
+class TestDumperMethods(unittest.TestCase):
+
+    def test_background_dump(self):
+        timings = timing.Timings()
+        with timings.stage('detect'):
+            pass
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'timing.log')
+            dumper = timing.Dumper(timings, path, interval=0.02)
+            self.assertIn('timing-dumper', [thread.name for thread in threading.enumerate()])
+            time.sleep(0.1)
+            dumper.close()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertGreater(len(lines), 1)
+        self.assertEqual(lines[0]['stages']['detect']['count'], 1)
+
+    def test_disabled(self):
+        dumper = timing.Dumper(timing.Timings(), '', interval=0.01)
+        self.assertIsNone(dumper._thread)
+        dumper.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import tracker
+
+
+class TestTrackerMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = tracker.CentroidTracker((220, 220, 480, 280), max_distance=50, max_missed=2)
+
+    def test_segments_cross(self):
+        self.assertTrue(tracker.segments_cross((300, 200), (300, 300), (220, 220), (480, 280)))
+        self.assertFalse(tracker.segments_cross((300, 100), (300, 200), (220, 220), (480, 280)))
+        self.assertFalse(tracker.segments_cross((100, 200), (100, 300), (220, 220), (480, 280)))
+        self.assertTrue(tracker.segments_cross((220, 200), (220, 220), (220, 220), (480, 280)))  # touch
+
+    def test_stable_ids(self):
+        first = self.tracker.update([(300, 100), (400, 100)])
+        second = self.tracker.update([(410, 120), (305, 120)])
+        self.assertEqual(second, [first[1], first[0]])
+
+    def test_count_once(self):
+        crossed = 0
+        for y in range(150, 350, 20):
+            self.tracker.update([(300, y)])
+            crossed += len(self.tracker.crossed)
+        for y in range(350, 150, -20):  # moving back does not count again
+            self.tracker.update([(300, y)])
+            crossed += len(self.tracker.crossed)
+        self.assertEqual(crossed, 1)
+
+    def test_close_objects(self):
+        crossed = 0
+        for y in range(150, 350, 20):
+            self.tracker.update([(300, y), (300, y - 70)])
+            crossed += len(self.tracker.crossed)
+        self.assertEqual(crossed, 2)
+
+    def test_missed(self):
+        first = self.tracker.update([(300, 100)])
+        self.tracker.update([])
+        self.tracker.update([])
+        self.assertEqual(self.tracker.update([(300, 100)]), first)
+        for _ in range(3):
+            self.tracker.update([])
+        self.assertNotEqual(self.tracker.update([(300, 100)]), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+"""Per stage latency measure: rolling percentiles, histograms and frame rate"""
+
+import bisect
+import collections
+import json
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)  # histogram upper bounds, last bucket is +inf
+
+
+class Stage:
+    """ Latencies of one stage: last samples for percentiles, cumulative histogram """
+
+    __slots__ = ('name', 'samples', 'histogram', 'count', 'total', '_start')
+
+    def __init__(self, name, size):
+        self.name = name
+        self.samples = collections.deque(maxlen=size or None)
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._start = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.histogram[bisect.bisect_left(BUCKETS_MS, seconds * 1e3)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.add(time.perf_counter() - self._start)
+
+    def percentiles(self, *points):
+        """ latency (ms) at each percentile point of last samples """
+        samples = sorted(self.samples)
+        if not samples:
+            return [0.0] * len(points)
+        return [samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1e3 for p in points]
+
+
+class _Disabled:
+    """ no-op stage """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_DISABLED = _Disabled()
+
+
+class Timings:
+    """ Named stages measured with 'with timings.stage(name):' (enabled), frame rate always measured """
+
+    def __init__(self, size=1000, enabled=True):
+        self.enabled = enabled
+        self._size = size
+        self._stages = collections.OrderedDict()
+        self._lock = threading.Lock()  # stages created from lane threads
+        self._frames = collections.deque(maxlen=size or None)  # frame timestamps, for fps
+
+    def stage(self, name):
+        if not self.enabled:
+            return _DISABLED
+        stage = self._stages.get(name)
+        if stage is None:
+            with self._lock:
+                stage = self._stages.get(name)
+                if stage is None:
+                    stage = self._stages[name] = Stage(name, self._size)
+        return stage
+
+    def tick(self):
+        """ one frame done """
+        self._frames.append(time.perf_counter())
+
+    @property
+    def fps(self):
+        if len(self._frames) < 2:
+            return 0.0
+        return (len(self._frames) - 1) / (self._frames[-1] - self._frames[0])
+
+    @property
+    def stages(self):
+        with self._lock:
+            return list(self._stages.values())
+
+    def summary(self):
+        """ {'fps': n, 'stages': {name: {p50_ms, p95_ms, p99_ms, mean_ms, count, histogram}}} """
+        stages = collections.OrderedDict()
+        for stage in self.stages:  # copy, stages may be added from lane threads
+            p50, p95, p99 = stage.percentiles(50, 95, 99)
+            stages[stage.name] = {'p50_ms': round(p50, 3), 'p95_ms': round(p95, 3), 'p99_ms': round(p99, 3),
+                                  'mean_ms': round(stage.total / stage.count * 1e3, 3) if stage.count else 0.0,
+                                  'count': stage.count, 'histogram': list(stage.histogram)}
+        return {'fps': round(self.fps, 1), 'stages': stages}
+
+
+class Prefixed:
+    """ View of a Timings for one lane: stage names with a prefix, own frame rate """
+
+    def __init__(self, timings, prefix):
+        self._timings = timings
+        self._prefix = prefix
+        self._frames = collections.deque(maxlen=50)
+
+    def stage(self, name):
+        return self._timings.stage(self._prefix + name)
+
+    def tick(self):
+        self._frames.append(time.perf_counter())
+
+    @property
+    def fps(self):
+        if len(self._frames) < 2:
+            return 0.0
+        return (len(self._frames) - 1) / (self._frames[-1] - self._frames[0])
+
+
+class Rate:
+    """ Target rate: due() is true once per period (fps <= 0: always) """
+
+    def __init__(self, fps=0.0):
+        self.period = 1.0 / fps if fps > 0 else 0.0
+        self._next = 0.0
+
+    def due(self):
+        if not self.period:
+            return True
+        now = time.monotonic()
+        if now < self._next:
+            return False
+        # next period from schedule, restart from now when late by more than a period (no bursts)
+        self._next = self._next + self.period if now - self._next < self.period else now + self.period
+        return True
+
+    def remaining(self):
+        """ seconds until next due """
+        return max(0.0, self._next - time.monotonic()) if self.period else 0.0
+
+
+class Startup:
+    """ Durations of named startup steps """
+
+    def __init__(self):
+        self.started = self._last = time.perf_counter()
+        self.steps = collections.OrderedDict()
+
+    def step(self, name):
+        """ end of step name (since previous step) """
+        now = time.perf_counter()
+        self.steps[name] = now - self._last
+        self._last = now
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def __str__(self):
+        return ', '.join('{} {:.3f}s'.format(name, value) for name, value in self.steps.items()) + \
+            ' - total {:.3f}s'.format(self._last - self.started)
+
+
+class Dumper:
+    """ Append timings summary to a file (json lines) every interval seconds, from its own thread """
+
+    def __init__(self, timings, file_name, interval=60.0):
+        self._timings = timings
+        self._file_name = file_name
+        self._interval = interval
+        self._stopping = threading.Event()
+        self._thread = None
+        if file_name:  # nothing to do on the frame loop, summary and file writes off it
+            self._thread = threading.Thread(target=self._loop, name='timing-dumper', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._stopping.wait(self._interval):
+            self.dump()
+
+    def dump(self):
+        summary = self._timings.summary()
+        summary['time'] = round(time.time(), 3)
+        try:
+            with open(self._file_name, 'a') as f:
+                f.write(json.dumps(summary) + '\n')
+        except OSError as ex:
+            log.error('error writing timings to "{}" {}'.format(self._file_name, ex))
+
+    def close(self):
+        if self._thread:
+            self._stopping.set()
+            self._thread.join(timeout=5.0)
+
+
+if __name__ == '__main__':
+    # simple explore test
+    timings = Timings()
+    for n in range(100):
+        with timings.stage('sleep'):
+            time.sleep(0.001 * (n % 5))
+        timings.tick()
+    print(timings.summary())
@@ -0,0 +1,104 @@
+"""Multi object centroid tracker, count each track once when it crosses the beam"""
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def _side(a, b, p):
+    """ sign of point p relative to line a->b """
+    value = (b[0] - a[0]) * (p[1] - a[1]) - (b[1] - a[1]) * (p[0] - a[0])
+    return (value > 0) - (value < 0)
+
+
+def segments_cross(p1, p2, q1, q2):
+    """ True if segment p1-p2 touches or crosses segment q1-q2 """
+    d1, d2 = _side(q1, q2, p1), _side(q1, q2, p2)
+    d3, d4 = _side(p1, p2, q1), _side(p1, p2, q2)
+    if d1 != d2 and d3 != d4 and (d1 or d2) and (d3 or d4):
+        return True
+
+    def on_segment(a, b, p):
+        return min(a[0], b[0]) <= p[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= p[1] <= max(a[1], b[1])
+
+    return (d1 == 0 and on_segment(q1, q2, p1)) or (d2 == 0 and on_segment(q1, q2, p2)) or \
+           (d3 == 0 and on_segment(p1, p2, q1)) or (d4 == 0 and on_segment(p1, p2, q2))
+
+
+class Track:
+    """ Object seen on consecutive frames """
+
+    __slots__ = ('id', 'centroid', 'missed', 'counted')
+
+    def __init__(self, id_, centroid):
+        self.id = id_
+        self.centroid = centroid
+        self.missed = 0
+        self.counted = False
+
+
+class CentroidTracker:
+    """ Give stable ids to detections by nearest centroid, detect tracks crossing the beam segment """
+
+    def __init__(self, beam_position, max_distance=80, max_missed=5):
+        self._beam = ((beam_position[0], beam_position[1]), (beam_position[2], beam_position[3]))
+        self._max_distance = max_distance
+        self._max_missed = max_missed
+        self._next_id = 1
+        self.tracks = []
+        self.crossed = []
+
+    def tune(self, beam_position=None, max_distance=None, max_missed=None):
+        """ change beam or matching limits, tracks are kept """
+        if beam_position is not None:
+            self._beam = ((beam_position[0], beam_position[1]), (beam_position[2], beam_position[3]))
+        if max_distance is not None:
+            self._max_distance = max_distance
+        if max_missed is not None:
+            self._max_missed = max_missed
+
+    def update(self, centroids):
+        """ match centroids to tracks, return track id of each centroid; crossed tracks are in self.crossed """
+        pairs = sorted(((c[0] - t.centroid[0]) ** 2 + (c[1] - t.centroid[1]) ** 2, i, j)
+                       for i, t in enumerate(self.tracks) for j, c in enumerate(centroids))
+        limit = self._max_distance ** 2
+        matched = dict()  # centroid index -> track
+        used = set()
+        for distance, i, j in pairs:
+            if distance > limit:
+                break
+            if i not in used and j not in matched:
+                used.add(i)
+                matched[j] = self.tracks[i]
+        self.crossed = []
+        for j, track in matched.items():
+            previous, track.centroid, track.missed = track.centroid, centroids[j], 0
+            if not track.counted and segments_cross(previous, track.centroid, *self._beam):
+                track.counted = True
+                self.crossed.append(track)
+                log.debug('track id=%s crossed beam', track.id)
+        for i, track in enumerate(self.tracks):
+            if i not in used:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self._max_missed]
+        ids = []
+        for j, centroid in enumerate(centroids):
+            if j not in matched:
+                matched[j] = Track(self._next_id, centroid)
+                self.tracks.append(matched[j])
+                self._next_id += 1
+            ids.append(matched[j].id)
+        return ids
+
+    def reset(self):
+        self.tracks = []
+        self.crossed = []
+
+
+if __name__ == '__main__':
+    # simple explore test
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG)
+    tracker = CentroidTracker((220, 220, 480, 280))
+    for y in range(100, 400, 20):
+        print(tracker.update([(300, y), (400, y - 60)]), [t.id for t in tracker.crossed])